@@ -1,23 +1,47 @@
+import io
 import os
+import csv
+import json
+import time
+import base64
+import hashlib
+import shutil
+import zipfile
+import tempfile
+import operator
 import logging
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, BrokenExecutor, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, abort
+from flask import Response, stream_with_context, session
+from sqlalchemy import tuple_
+from sqlalchemy.orm import defer
 from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from extensions import db
+import models
 from bridge_processor import BridgeProcessor
+from artifact_store import ArtifactStore
+from preview_tiles import GEOMETRY_EXT, PreviewTiles
+from jobs import JobQueue, QueueFull
+from workers import warm_worker, process_file, generate_file, generate_parameters, process_parameters
+from workers import process_batch_item
 import traceback
 
+try:
+    import fcntl
+except ImportError:  # Windows: sweeps are only serialized within the process
+    fcntl = None
+
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 
-
-class Base(DeclarativeBase):
-    pass
-
-
-db = SQLAlchemy(model_class=Base)
-
 # create the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
@@ -34,9 +58,86 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 app.config["UPLOAD_FOLDER"] = "uploads"
 app.config["GENERATED_FOLDER"] = "generated"
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
+# Let a fronting nginx/Apache deliver downloads from disk (X-Sendfile) instead of the app
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE", "").lower() in ("1", "true", "yes")
+
+# Previews larger than this are shown through the tile endpoint instead of inline
+app.config["PREVIEW_INLINE_LIMIT"] = 256 * 1024
+app.config["PREVIEW_CACHE_SIZE"] = 16
+
+# Tile sources of recent previews by design key, least recently used first; request threads share it
+preview_tiles = OrderedDict()
+preview_tiles_lock = threading.Lock()
+
+# Preview SVGs of persisted designs are stored next to the other design artifacts
+artifact_store = ArtifactStore(app.config["GENERATED_FOLDER"])
+upload_store = ArtifactStore(app.config["UPLOAD_FOLDER"], prefix="upload")
+
+# Storage quotas, applied by a background sweeper; files of pinned designs are never evicted.
+# Least recently downloaded artifacts are evicted first once a folder exceeds its size quota.
+app.config["STORAGE_SWEEP_INTERVAL"] = int(os.environ.get("STORAGE_SWEEP_INTERVAL", 300))
+app.config["GENERATED_MAX_BYTES"] = int(os.environ.get("GENERATED_MAX_BYTES", 2 * 1024**3))
+app.config["GENERATED_MAX_AGE"] = int(os.environ.get("GENERATED_MAX_AGE", 30 * 86400))
+app.config["UPLOADS_MAX_BYTES"] = int(os.environ.get("UPLOADS_MAX_BYTES", 512 * 1024**2))
+app.config["UPLOADS_MAX_AGE"] = int(os.environ.get("UPLOADS_MAX_AGE", 7 * 86400))
+# Drawing variables kept on a persisted design
+required_variables = BridgeProcessor().required_variables
+
+# PNG thumbnails are rendered by the processing jobs, from the geometry they draw
+app.config["THUMBNAIL_SIZE"] = 256
+
+# Uploads are processed as background jobs on a bounded pool of warm worker processes,
+# so CPU-bound drawing scales with cores; beyond MAX_QUEUED_JOBS waiting jobs, uploads are refused
+app.config["JOB_WORKERS"] = int(os.environ.get("JOB_WORKERS", os.cpu_count() or 2))
+app.config["MAX_QUEUED_JOBS"] = int(os.environ.get("MAX_QUEUED_JOBS", 50))
+# The pool is started by init_workers(), not at import. Workers are started from a forkserver where the
+# platform has one (spawned elsewhere, e.g. on Windows), so they never fork a process that already runs
+# threads. Workers report pipeline stages back on progress_channel, a listener thread records them on the jobs.
+app.config["WORKER_START_METHOD"] = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+worker_pool = None
+progress_channel = None
+workers_lock = threading.Lock()
+# Storage sweeper thread, started by init_sweeper()
+sweeper = None
+job_queue = JobQueue(max_workers=app.config["JOB_WORKERS"], max_queued=app.config["MAX_QUEUED_JOBS"])
+app.config["EVENTS_POLL_INTERVAL"] = 0.25
+app.config["EVENTS_KEEPALIVE"] = 15
+# An event stream holds a request thread, so it is closed after this many seconds; clients then poll
+app.config["EVENTS_MAX_DURATION"] = int(os.environ.get("EVENTS_MAX_DURATION", 600))
 
 ALLOWED_EXTENSIONS = {"xlsx", "xls"}
 
+# Batch uploads: a zip of workbooks and/or JSON parameter files, bounded in count and unpacked size
+BATCH_EXTENSIONS = ALLOWED_EXTENSIONS | {"json"}
+app.config["BATCH_MAX_FILES"] = 200
+app.config["BATCH_MAX_UNPACKED_SIZE"] = 256 * 1024 * 1024
+# Unpacked batch folders older than this are left over from a failed request and removed by the sweeper
+app.config["BATCH_STALE_AGE"] = 6 * 3600
+# Batch members bypass the job queue, so all batches together keep at most this many in the worker pool,
+# leaving the other workers to uploads; a batch is refused while no slot is free
+app.config["BATCH_MAX_IN_FLIGHT"] = max(1, app.config["JOB_WORKERS"] // 2)
+batch_slots = threading.BoundedSemaphore(app.config["BATCH_MAX_IN_FLIGHT"])
+# Artifact groups of running batches, kept by the sweeper until the batch response is closed
+batch_pins = Counter()
+batch_pins_lock = threading.Lock()
+# On-demand DXF generation waits for a worker in the request thread: like the job queue, it admits
+# at most MAX_QUEUED_JOBS waiting beyond the busy workers, and gives up after GENERATE_TIMEOUT seconds
+app.config["GENERATE_TIMEOUT"] = int(os.environ.get("GENERATE_TIMEOUT", 120))
+generate_slots = threading.BoundedSemaphore(app.config["JOB_WORKERS"] + app.config["MAX_QUEUED_JOBS"])
+
+# Design history API: page size limits and the promoted variables it can filter on, e.g. ?nspan=ge:10&skew=ne:0
+app.config["DESIGNS_PAGE_SIZE"] = 50
+app.config["DESIGNS_MAX_PAGE_SIZE"] = 200
+DESIGN_FILTERS = ("nspan", "skew", "lbridge")
+FILTER_OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+}
+
 # Ensure upload and generated directories exist
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 os.makedirs(app.config["GENERATED_FOLDER"], exist_ok=True)
@@ -49,6 +150,308 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def has_preview_tiles(design_key):
+    """True if a tiled preview can be served for the design, i.e. its geometry is stored"""
+    return bool(design_key) and os.path.exists(artifact_store.path_for(design_key, GEOMETRY_EXT))
+
+
+def get_preview_tiles(design_key):
+    """Tile source of a design, rebuilt from its stored geometry on a cache miss; None without one.
+
+    The most recently used sources are kept, the least recently used evicted.
+    """
+    with preview_tiles_lock:
+        tiles = preview_tiles.get(design_key)
+        if tiles is not None:
+            preview_tiles.move_to_end(design_key)
+            return tiles
+    if not has_preview_tiles(design_key):
+        return None
+    tiles = PreviewTiles.load(artifact_store.path_for(design_key, GEOMETRY_EXT))
+    artifact_store.touch(artifact_store.filename_for(design_key, GEOMETRY_EXT))
+    with preview_tiles_lock:
+        preview_tiles[design_key] = tiles
+        preview_tiles.move_to_end(design_key)
+        while len(preview_tiles) > app.config["PREVIEW_CACHE_SIZE"]:
+            preview_tiles.popitem(last=False)
+    return tiles
+
+
+def record_progress(channel):
+    """Move stage reports from the worker processes onto their jobs"""
+    while True:
+        try:
+            job_id, info = channel.get()
+            job_queue.record_stage(job_id, info)
+        except Exception as e:
+            app.logger.error(f"Progress listener error: {str(e)}")
+
+
+def start_worker_pool():
+    """A new pool of warm worker processes reporting their progress on progress_channel"""
+    return ProcessPoolExecutor(
+        max_workers=app.config["JOB_WORKERS"],
+        mp_context=multiprocessing.get_context(app.config["WORKER_START_METHOD"]),
+        initializer=warm_worker,
+        initargs=(progress_channel,),
+    )
+
+
+def init_workers():
+    """Start the worker process pool and its progress listener, once per process"""
+    global worker_pool, progress_channel
+    with workers_lock:
+        if worker_pool is not None:
+            return
+        progress_channel = multiprocessing.get_context(app.config["WORKER_START_METHOD"]).Queue()
+        worker_pool = start_worker_pool()
+        job_queue.pool = worker_pool
+        threading.Thread(target=record_progress, args=(progress_channel,), name="progress", daemon=True).start()
+
+
+def restart_workers(broken):
+    """Replace the worker pool once it broke, e.g. when a worker was killed, so later work runs again"""
+    global worker_pool
+    with workers_lock:
+        if worker_pool is not broken:
+            return  # Already replaced
+        app.logger.error("Worker pool broken, starting a new one")
+        worker_pool = start_worker_pool()
+        job_queue.pool = worker_pool
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+job_queue.on_broken = restart_workers
+
+
+def submit_work(fn, *args):
+    """Run `fn(*args)` on the worker pool and return its future; a pool found broken is replaced"""
+    pool = worker_pool
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenExecutor:
+        restart_workers(pool)
+        raise
+
+    def check(done):
+        if not done.cancelled() and isinstance(done.exception(), BrokenExecutor):
+            restart_workers(pool)
+
+    future.add_done_callback(check)
+    return future
+
+
+def init_sweeper():
+    """Start the storage sweeper thread, once per process"""
+    global sweeper
+    with workers_lock:
+        if sweeper is None:
+            sweeper = threading.Thread(target=run_sweeper, name="sweeper", daemon=True)
+            sweeper.start()
+
+
+@app.before_request
+def start_background():
+    """Start the worker pool and the sweeper with the first request rather than as an import side effect"""
+    if worker_pool is None:
+        init_workers()
+    if sweeper is None:
+        init_sweeper()
+
+
+def save_upload(file):
+    """Store an uploaded workbook under the hash of its content, so uploads sharing a name never replace each other"""
+    data = file.read()
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+    return upload_store.save_file(hashlib.sha256(data).hexdigest(), ext, data)
+
+
+def create_design(filename, project_name, upload_filename=None):
+    """Record a newly uploaded design before it is processed; returns its ID"""
+    design = models.BridgeDesign(
+        filename=filename, project_name=project_name, upload_filename=upload_filename, status="processing"
+    )
+    db.session.add(design)
+    db.session.commit()
+    return design.id
+
+
+def store_design(job):
+    """Persist the outcome of an upload job on its BridgeDesign record, with the preview SVG as an artifact"""
+    results = job["result"] or {}
+    timings = job_queue.timings(job)
+    stages = results.get("stages") or job["stages"]
+    timings["stages"] = {stage["stage"]: stage["duration"] for stage in stages}
+    with app.app_context():
+        design = db.session.get(models.BridgeDesign, job["info"]["design_id"])
+        if design is None:
+            return
+        design.timings = json.dumps(timings)
+        design.completed_time = datetime.utcnow()
+        if job["error"] is None and results.get("success"):
+            key = results["design_key"]
+            design.status = "completed"
+            design.design_key = key
+            design.set_parameters(results["variables"], required_variables)
+            design.validation = json.dumps(results["validation"])
+            design.cleanup = json.dumps(results["cleanup"])
+            design.dxf_filename = results["dxf_filename"]
+            design.thumbnail_filename = results.get("thumbnail_filename")
+            if results.get("svg_content"):
+                design.svg_filename = artifact_store.save_file(key, ".svg", results["svg_content"].encode("utf-8"))
+        else:
+            design.status = "failed"
+            design.error_message = job["error"] or results.get("error")
+        db.session.commit()
+
+
+def sweep_storage():
+    """Apply the storage quotas to the generated and upload folders, keeping the files of pinned designs.
+
+    Designs whose artifacts were evicted forget their filenames, so their DXF is generated again on download.
+    """
+    with app.app_context():
+        pinned = db.session.execute(
+            db.select(models.BridgeDesign.design_key, models.BridgeDesign.upload_filename).filter_by(pinned=True)
+        ).all()
+    pinned_artifacts = {artifact_store.group_of(artifact_store.filename_for(key)) for key, _ in pinned if key}
+    with batch_pins_lock:
+        pinned_artifacts.update(batch_pins)
+    evicted = artifact_store.sweep(
+        max_bytes=app.config["GENERATED_MAX_BYTES"], max_age=app.config["GENERATED_MAX_AGE"], pinned=pinned_artifacts
+    )
+    upload_store.sweep(
+        max_bytes=app.config["UPLOADS_MAX_BYTES"],
+        max_age=app.config["UPLOADS_MAX_AGE"],
+        pinned={upload_store.group_of(upload) for _, upload in pinned if upload},
+    )
+    # Folders of batches whose request never cleaned up, e.g. because its process died
+    now = time.time()
+    for entry in os.scandir(app.config["UPLOAD_FOLDER"]):
+        if entry.is_dir() and entry.name.startswith("batch_"):
+            if now - entry.stat().st_mtime > app.config["BATCH_STALE_AGE"]:
+                shutil.rmtree(entry.path, ignore_errors=True)
+    if evicted:
+        with app.app_context():
+            for column, ext in (("dxf_filename", ".dxf"), ("svg_filename", ".svg"), ("thumbnail_filename", ".png")):
+                stored = getattr(models.BridgeDesign, column)
+                db.session.execute(
+                    db.update(models.BridgeDesign)
+                    .where(stored.in_([group + ext for group in evicted]))
+                    .values({column: None})
+                )
+            db.session.commit()
+
+
+@contextmanager
+def storage_lock():
+    """Hold the sweep lock shared by all app processes (e.g. gunicorn workers); yields False if another holds it"""
+    if fcntl is None:
+        yield True
+        return
+    with open(os.path.join(app.config["GENERATED_FOLDER"], ".sweep.lock"), "a") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def run_sweeper():
+    while True:
+        time.sleep(app.config["STORAGE_SWEEP_INTERVAL"])
+        try:
+            with storage_lock() as locked:
+                if locked:
+                    sweep_storage()
+        except Exception as e:
+            app.logger.error(f"Storage sweep error: {str(e)}")
+
+
+def finish_upload(job):
+    """Completion hook of an upload or API job: persist the design"""
+    try:
+        store_design(job)
+    except Exception as e:
+        app.logger.error(f"Could not store design {job['info']['design_id']}: {str(e)}")
+
+
+def wants_json():
+    return request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json"
+
+
+def upload_error(message, status=400):
+    """Report a failed upload: a JSON error for script/fetch clients, otherwise a flash message on the index"""
+    if wants_json():
+        return jsonify({"error": message}), status
+    flash(message, "error")
+    return redirect(url_for("index"))
+
+
+def job_status(job):
+    """JSON-friendly view of a job record"""
+    status = {"id": job["id"], "status": job["status"], "timings": job_queue.timings(job)}
+    status["stage"] = job["stages"][-1] if job["stages"] else None
+    if job["status"] == "failed":
+        status["error"] = job["error"]
+    elif job["status"] == "done":
+        status["success"] = job["result"]["success"]
+        status["error"] = job["result"].get("error")
+        status["results_url"] = url_for("show_results", design_id=job["info"]["design_id"])
+        preview = job["info"].get("preview")
+        if preview is not None and job["result"]["success"]:
+            # Jobs of the JSON API also hand back their artifact and the preview that was asked for
+            result = job["result"]
+            status["artifact_id"] = result["design_key"]
+            status["download_url"] = url_for("download_file", filename=result["dxf_filename"])
+            status["validation"] = result["validation"]
+            status["cleanup"] = result["cleanup"]
+            status["preview"] = None
+            if preview == "svg":
+                status["preview"] = {"format": "svg", "content": result["svg_content"]}
+            elif preview == "json":
+                status["preview"] = {"format": "json", "content": result["geometry"]}
+    return status
+
+
+def stored_job_status(design):
+    """Job status answered from the design record, for jobs queued by another server process.
+
+    Job records live in the process that queued them, so with several server processes the
+    persisted design is the shared source of truth. Stages and inline previews are not stored.
+    """
+    status = {"id": design.job_id, "status": "running", "stage": None}
+    if design.status == "processing":
+        status["timings"] = {
+            "queued": round((datetime.utcnow() - design.upload_time).total_seconds(), 3),
+            "running": 0.0,
+        }
+        return status
+    status["status"] = "done"
+    status["timings"] = design.load("timings")
+    status["success"] = design.status == "completed"
+    status["error"] = design.error_message
+    status["results_url"] = url_for("show_results", design_id=design.id)
+    if design.filename == "api" and status["success"]:
+        status["artifact_id"] = design.design_key
+        if design.dxf_filename:
+            status["download_url"] = url_for("download_file", filename=design.dxf_filename)
+        else:
+            status["download_url"] = url_for("generate_download", design_id=design.id)
+        status["validation"] = design.load("validation")
+        status["cleanup"] = design.load("cleanup")
+    return status
+
+
+def design_for_job(job_id):
+    """The design record of a job, None when no design was queued under that ID"""
+    return db.session.execute(db.select(models.BridgeDesign).where(models.BridgeDesign.job_id == job_id)).scalar()
+
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -58,63 +461,657 @@ def index():
 def upload_file():
     try:
         if "file" not in request.files:
-            flash("No file selected", "error")
-            return redirect(url_for("index"))
+            return upload_error("No file selected")
 
         file = request.files["file"]
         if file.filename == "":
-            flash("No file selected", "error")
-            return redirect(url_for("index"))
+            return upload_error("No file selected")
 
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            file.save(filepath)
+            upload_filename = save_upload(file)
+            filepath = os.path.join(app.config["UPLOAD_FOLDER"], upload_filename)
 
             # Get project name from form
             project_name = request.form.get("project_name", "").strip()
             if not project_name:
                 project_name = "BRIDGE PROJECT"  # Default name
 
-            # Process the bridge design
-            processor = BridgeProcessor()
+            # Queue the bridge design for processing and hand back its job ID right away
+            # Only the preview is built by the job, the DXF is generated on download
+            design_id = create_design(filename, project_name, upload_filename)
             try:
-                results = processor.process_excel_file(filepath, project_name=project_name)
-
-                # Store results in session or database for retrieval
-                # For simplicity, we'll pass directly to results page
-                return render_template("results.html", results=results, filename=filename)
-
-            except Exception as e:
-                app.logger.error(f"Processing error: {str(e)}")
-                app.logger.error(traceback.format_exc())
-                flash(f"Error processing file: {str(e)}", "error")
+                job_id = job_queue.submit(
+                    process_file,
+                    filepath,
+                    project_name,
+                    preview_only=True,
+                    tiles=True,
+                    thumbnail_size=app.config["THUMBNAIL_SIZE"],
+                    on_done=finish_upload,
+                    pass_job_id=True,
+                    info={
+                        "filename": filename,
+                        "filepath": filepath,
+                        "project_name": project_name,
+                        "design_id": design_id,
+                    },
+                )
+            except QueueFull:
+                db.session.delete(db.session.get(models.BridgeDesign, design_id))
+                db.session.commit()
+                if wants_json():
+                    return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "10"}
+                flash("The server is busy processing other designs, please try again shortly", "error")
                 return redirect(url_for("index"))
+            design = db.session.get(models.BridgeDesign, design_id)
+            if design.job_id is None:
+                design.job_id = job_id
+                db.session.commit()
+            if wants_json():
+                return (
+                    jsonify(
+                        {
+                            "job_id": job_id,
+                            "design_id": design_id,
+                            "status_url": url_for("job_detail", job_id=job_id, format="json"),
+                            "events_url": url_for("job_events", job_id=job_id),
+                            "results_url": url_for("show_results", design_id=design_id),
+                        }
+                    ),
+                    202,
+                )
+            return redirect(url_for("job_detail", job_id=job_id))
         else:
-            flash("Invalid file type. Please upload an Excel file (.xlsx or .xls)", "error")
-            return redirect(url_for("index"))
+            return upload_error("Invalid file type. Please upload an Excel file (.xlsx or .xls)")
 
     except Exception as e:
         app.logger.error(f"Upload error: {str(e)}")
-        flash("An error occurred during file upload", "error")
+        return upload_error("An error occurred during file upload", 500)
+
+
+@app.route("/jobs")
+def job_list():
+    """Queue depth, worker usage and timings of recent jobs"""
+    with job_queue.lock:
+        jobs = list(job_queue.jobs.values())
+    return jsonify({"queue": job_queue.stats(), "jobs": [job_status(job) for job in reversed(jobs)]})
+
+
+@app.route("/jobs/<job_id>")
+def job_detail(job_id):
+    """Poll a job: JSON status, a waiting page while it runs, or its results once done"""
+    job = job_queue.get(job_id)
+    design = design_for_job(job_id) if job is None else None
+    if design is not None:
+        # Queued by another server process: answer from the persisted design instead
+        status = stored_job_status(design)
+        if wants_json():
+            return jsonify(status)
+        if status["status"] == "running":
+            return render_template("job.html", job=status, filename=design.filename)
+        return redirect(url_for("show_results", design_id=design.id))
+    if job is None:
+        if wants_json():
+            return jsonify({"id": job_id, "status": "unknown"}), 404
+        flash("Job not found or expired", "error")
+        return redirect(url_for("index"))
+
+    if wants_json():
+        return jsonify(job_status(job))
+
+    if job["status"] in ("queued", "running"):
+        return render_template("job.html", job=job_status(job), filename=job["info"].get("filename"))
+
+    if job["status"] == "failed":
+        flash(f"Error processing file: {job['error']}", "error")
+        return redirect(url_for("index"))
+
+    return redirect(url_for("show_results", design_id=job["info"]["design_id"]))
+
+
+@app.route("/results/<int:design_id>")
+def show_results(design_id):
+    """Render a processed design from its stored record and preview artifact, without reprocessing"""
+    design = db.session.get(models.BridgeDesign, design_id)
+    if design is None:
+        flash("Design not found", "error")
+        return redirect(url_for("index"))
+    if design.status == "processing":
+        # Show the waiting page in place: the job can already read as finished while this record is not yet
+        job = job_queue.get(design.job_id) if design.job_id else None
+        if job is not None:
+            return render_template("job.html", job=job_status(job), filename=design.filename)
+        flash("This design is still being processed", "error")
         return redirect(url_for("index"))
 
+    # A stored design only changes when its DXF is generated, so repeat views are answered with 304
+    has_tiles = has_preview_tiles(design.design_key)
+    completed = design.completed_time.isoformat() if design.completed_time else ""
+    etag = f"design-{design.id}-{design.status}-{design.dxf_filename}-{completed}-{int(has_tiles)}"
+    if request.if_none_match.contains(etag) and not session.get("_flashes"):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    results = {
+        "success": design.status == "completed",
+        "error": design.error_message,
+        "design_id": design.id,
+        "design_key": design.design_key,
+        "variables": design.load("parameters") or {},
+        "validation": design.load("validation"),
+        "cleanup": design.load("cleanup"),
+        "timings": design.load("timings"),
+        "dxf_filename": design.dxf_filename,
+        "svg_content": None,
+    }
+    svg_path = os.path.join(app.config["GENERATED_FOLDER"], design.svg_filename or "")
+    if design.svg_filename and os.path.exists(svg_path):
+        if os.path.getsize(svg_path) > app.config["PREVIEW_INLINE_LIMIT"] and has_tiles:
+            results["tiles_url"] = url_for("preview_tile", design=design.design_key, z=0, x=0, y=0)
+        else:
+            with open(svg_path, encoding="utf-8") as fh:
+                results["svg_content"] = fh.read()
+
+    response = app.make_response(render_template("results.html", results=results, filename=design.filename))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    """Stream a job's pipeline stages as server-sent events, ending with a "done" or "failed" event.
+
+    Streams still open after EVENTS_MAX_DURATION end with a "timeout" event instead. Jobs queued
+    by another server process are followed through their design record, without stage events.
+    """
+    job = job_queue.get(job_id)
+    design = design_for_job(job_id) if job is None else None
+    if job is None and design is None:
+        abort(404)
+
+    def current():
+        """The job's status and the stages reported so far"""
+        if job is not None:
+            return job_status(job), job["stages"]
+        db.session.expire_all()
+        return stored_job_status(db.session.get(models.BridgeDesign, design.id)), []
+
+    def events():
+        sent = 0
+        last_write = time.time()
+        deadline = last_write + app.config["EVENTS_MAX_DURATION"]
+        while True:
+            status, stages = current()
+            while sent < len(stages):
+                yield f"event: stage\ndata: {json.dumps(stages[sent])}\n\n"
+                sent += 1
+                last_write = time.time()
+            if status["status"] in ("done", "failed"):
+                yield f"event: {status['status']}\ndata: {json.dumps(status)}\n\n"
+                return
+            if time.time() > deadline:
+                yield f"event: timeout\ndata: {json.dumps(status)}\n\n"
+                return
+            if time.time() - last_write > app.config["EVENTS_KEEPALIVE"]:
+                yield ": keepalive\n\n"
+                last_write = time.time()
+            time.sleep(app.config["EVENTS_POLL_INTERVAL"])
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def encode_cursor(design):
+    """Opaque keyset cursor pointing just past `design` in (upload_time, id) order"""
+    raw = f"{design.upload_time.isoformat()}|{design.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    upload_time, design_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+    return datetime.fromisoformat(upload_time), int(design_id)
+
+
+def design_summary(design):
+    """JSON-friendly listing entry of a design, linking to its artifacts instead of embedding them"""
+    return {
+        "id": design.id,
+        "filename": design.filename,
+        "project_name": design.project_name,
+        "status": design.status,
+        "error": design.error_message,
+        "upload_time": design.upload_time.isoformat(),
+        "completed_time": design.completed_time.isoformat() if design.completed_time else None,
+        "design_key": design.design_key,
+        "nspan": design.nspan,
+        "skew": design.skew,
+        "lbridge": design.lbridge,
+        "results_url": url_for("show_results", design_id=design.id),
+        "thumbnail_url": url_for("thumbnail", design=design.design_key) if design.design_key else None,
+        "download_url": url_for("download_file", filename=design.dxf_filename) if design.dxf_filename else None,
+        "pinned": design.pinned,
+    }
+
+
+@app.route("/api/designs/<int:design_id>/pin", methods=["POST", "DELETE"])
+def pin_design(design_id):
+    """Pin a design so the storage sweeper keeps its upload and artifacts (DELETE unpins it)"""
+    design = db.session.get(models.BridgeDesign, design_id)
+    if design is None:
+        return jsonify({"error": "Design not found"}), 404
+    design.pinned = request.method == "POST"
+    db.session.commit()
+    return jsonify(design_summary(design))
+
+
+@app.route("/api/storage")
+def storage_metrics():
+    """Bytes stored, files and eviction counts of the generated and upload folders"""
+    return jsonify(
+        {
+            "generated": dict(
+                artifact_store.metrics(),
+                max_bytes=app.config["GENERATED_MAX_BYTES"],
+                max_age=app.config["GENERATED_MAX_AGE"],
+            ),
+            "uploads": dict(
+                upload_store.metrics(), max_bytes=app.config["UPLOADS_MAX_BYTES"], max_age=app.config["UPLOADS_MAX_AGE"]
+            ),
+        }
+    )
+
+
+@app.route("/api/designs")
+def list_designs():
+    """Design history, newest first, with keyset pagination and status/project/parameter filters"""
+    BridgeDesign = models.BridgeDesign
+    try:
+        limit = request.args.get("limit", app.config["DESIGNS_PAGE_SIZE"], type=int)
+        limit = max(1, min(limit, app.config["DESIGNS_MAX_PAGE_SIZE"]))
+        query = BridgeDesign.query.options(
+            defer(BridgeDesign.parameters), defer(BridgeDesign.validation), defer(BridgeDesign.timings)
+        )
+        if request.args.get("status"):
+            query = query.filter(BridgeDesign.status == request.args["status"])
+        if request.args.get("project"):
+            query = query.filter(BridgeDesign.project_name == request.args["project"])
+        for name in DESIGN_FILTERS:
+            for condition in request.args.getlist(name):
+                op, _, value = condition.rpartition(":")
+                if (op or "eq") not in FILTER_OPERATORS:
+                    raise ValueError(f"Unknown operator '{op}' for {name}")
+                query = query.filter(FILTER_OPERATORS[op or "eq"](getattr(BridgeDesign, name), float(value)))
+        if request.args.get("cursor"):
+            query = query.filter(
+                tuple_(BridgeDesign.upload_time, BridgeDesign.id) < decode_cursor(request.args["cursor"])
+            )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {str(e)}"}), 400
+
+    designs = query.order_by(BridgeDesign.upload_time.desc(), BridgeDesign.id.desc()).limit(limit + 1).all()
+    page = designs[:limit]
+    response = {"designs": [design_summary(design) for design in page], "next_cursor": None, "next_url": None}
+    if len(designs) > limit:
+        cursor = encode_cursor(page[-1])
+        args = request.args.to_dict(flat=False)
+        args["cursor"] = cursor
+        response["next_cursor"] = cursor
+        response["next_url"] = url_for("list_designs", **args)
+    return jsonify(response)
+
+
+@app.route("/api/v1/designs", methods=["POST"])
+def create_design_api():
+    """Queue a design generated from a JSON parameter set; answers 202 with the URLs to follow its job.
+
+    The body holds `parameters` (keyed like BridgeProcessor.required_variables) and optionally
+    `terrain` ([[chainage, RL], ...]), `project_name` and `preview` ("svg", "json" or "none").
+    Once done, the job status carries the artifact, the requested preview and the validation.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or "parameters" not in data:
+        return jsonify({"error": "Expected a JSON object with a 'parameters' object"}), 400
+    preview_format = data.get("preview", "svg")
+    if preview_format not in ("svg", "json", "none"):
+        return jsonify({"error": "preview must be 'svg', 'json' or 'none'"}), 400
+
+    terrain = data.get("terrain")
+    validation = BridgeProcessor().validate_parameter_set(data["parameters"], terrain)
+    if not validation["valid"]:
+        return jsonify({"error": "Parameter validation failed", "validation": validation}), 422
+
+    project_name = str(data.get("project_name") or "BRIDGE PROJECT")
+    design = models.BridgeDesign(
+        filename="api",
+        project_name=project_name,
+        terrain=json.dumps(terrain) if terrain is not None else None,
+        status="processing",
+    )
+    db.session.add(design)
+    db.session.commit()
+    try:
+        job_id = job_queue.submit(
+            process_parameters,
+            data["parameters"],
+            project_name,
+            terrain,
+            None if preview_format == "none" else preview_format,
+            app.config["THUMBNAIL_SIZE"],
+            validation,
+            on_done=finish_upload,
+            pass_job_id=True,
+            info={"filename": "api", "project_name": project_name, "design_id": design.id, "preview": preview_format},
+        )
+    except QueueFull:
+        db.session.delete(design)
+        db.session.commit()
+        return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "10"}
+    design.job_id = job_id
+    db.session.commit()
+
+    status_url = url_for("job_detail", job_id=job_id, format="json")
+    response = jsonify(
+        {
+            "id": design.id,
+            "job_id": job_id,
+            "status_url": status_url,
+            "events_url": url_for("job_events", job_id=job_id),
+            "results_url": url_for("show_results", design_id=design.id),
+            "validation": validation,
+        }
+    )
+    response.status_code = 202
+    response.headers["Location"] = status_url
+    return response
+
+
+class ZipChunks:
+    """Write-only file object collecting what zipfile writes, so the archive can be streamed as it grows"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def unpack_batch(archive, folder):
+    """Extract the workbooks and JSON files of an uploaded zip into `folder`; returns [(member name, path)]"""
+    members = [
+        info
+        for info in archive.infolist()
+        if not info.is_dir()
+        and not os.path.basename(info.filename).startswith(".")
+        and info.filename.rsplit(".", 1)[-1].lower() in BATCH_EXTENSIONS
+    ]
+    if not members:
+        raise ValueError("The zip contains no .xlsx, .xls or .json files")
+    if len(members) > app.config["BATCH_MAX_FILES"]:
+        raise ValueError(f"The zip holds {len(members)} files, at most {app.config['BATCH_MAX_FILES']} are accepted")
+    if sum(info.file_size for info in members) > app.config["BATCH_MAX_UNPACKED_SIZE"]:
+        raise ValueError("The zip is too large once unpacked")
+
+    files = []
+    for number, info in enumerate(members):
+        # Numbered names keep members with the same basename in different folders apart
+        path = os.path.join(folder, f"{number:04d}_{secure_filename(os.path.basename(info.filename)) or 'file'}")
+        with archive.open(info) as source, open(path, "wb") as target:
+            shutil.copyfileobj(source, target)
+        files.append((info.filename, path))
+    return files
+
+
+@app.route("/api/v1/batch", methods=["POST"])
+def batch_designs():
+    """Generate the DXFs of a zip of workbooks/JSON parameter files in parallel, streaming back a zip.
+
+    DXFs are added to the response as each design finishes, followed by manifest.csv with the
+    status, error and timings of every design; a failed design does not fail the batch.
+    Members are only handed to the worker pool while a batch slot is free (503 if none is).
+    Their DXFs are pinned against the sweeper until the response is closed; one that is gone
+    anyway (swept by another process) is reported as failed in the manifest.
+    """
+    upload = request.files.get("file")
+    if upload is None or upload.filename == "":
+        return jsonify({"error": "Upload a zip file in the 'file' field"}), 400
+    project_name = request.form.get("project_name", "").strip() or "BRIDGE PROJECT"
+    if not batch_slots.acquire(blocking=False):
+        return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "30"}
+
+    folder = tempfile.mkdtemp(prefix="batch_", dir=app.config["UPLOAD_FOLDER"])
+    try:
+        with zipfile.ZipFile(upload.stream) as archive:
+            files = deque(unpack_batch(archive, folder))
+    except (zipfile.BadZipFile, ValueError) as e:
+        batch_slots.release()
+        shutil.rmtree(folder, ignore_errors=True)
+        return jsonify({"error": str(e)}), 400
+
+    started = time.perf_counter()
+    futures = {}
+    pins = []
+
+    def submit(name, path):
+        """Hand a member to the worker pool under a batch slot, which is released once it finishes"""
+        try:
+            future = submit_work(process_batch_item, path, project_name, app.config["THUMBNAIL_SIZE"])
+        except Exception:
+            batch_slots.release()
+            raise
+        future.add_done_callback(lambda _: batch_slots.release())
+        futures[future] = name
+
+    submit(*files.popleft())
+
+    def stream():
+        sink = ZipChunks()
+        rows = []
+        used = set()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as result:
+            while futures or files:
+                # Take the free slots for more members, waiting for one while none of ours is running
+                while files and batch_slots.acquire(blocking=not futures):
+                    submit(*files.popleft())
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    try:
+                        item = future.result()
+                    except Exception as e:
+                        item = {"dxf_filename": None, "design_key": None, "error": str(e), "seconds": None}
+                    entry = None
+                    if item["dxf_filename"]:
+                        group = artifact_store.group_of(item["dxf_filename"])
+                        with batch_pins_lock:
+                            batch_pins[group] += 1
+                        pins.append(group)
+                        entry = os.path.splitext(name)[0] + ".dxf"
+                        while entry in used:
+                            entry = "_" + entry
+                        try:
+                            result.write(os.path.join(app.config["GENERATED_FOLDER"], item["dxf_filename"]), entry)
+                            used.add(entry)
+                        except FileNotFoundError:
+                            item["error"] = "The generated DXF was removed before it could be added"
+                            entry = None
+                    rows.append(
+                        {
+                            "file": name,
+                            "status": "failed" if item["error"] else "done",
+                            "dxf": entry or "",
+                            "design_key": item["design_key"] or "",
+                            "seconds": item["seconds"],
+                            "finished_after": round(time.perf_counter() - started, 3),
+                            "error": item["error"] or "",
+                        }
+                    )
+                    yield from sink.drain()
+
+            manifest = io.StringIO()
+            writer = csv.DictWriter(manifest, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+            result.writestr("manifest.csv", manifest.getvalue())
+        yield from sink.drain()
+
+    def close():
+        """Runs once the response is closed, also when its body was never read"""
+        for future in list(futures):
+            future.cancel()
+        shutil.rmtree(folder, ignore_errors=True)
+        with batch_pins_lock:
+            batch_pins.subtract(pins)
+            for group in set(pins):
+                if batch_pins[group] <= 0:
+                    del batch_pins[group]
+
+    response = Response(
+        stream_with_context(stream()),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=bridge_designs.zip", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(close)
+    return response
+
 
 @app.route("/download/<filename>")
 def download_file(filename):
+    """Send a generated file with strong validators, answering If-None-Match/If-Modified-Since and Range requests"""
     try:
-        file_path = os.path.join(app.config["GENERATED_FOLDER"], filename)
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
-        else:
-            flash("File not found", "error")
-            return redirect(url_for("index"))
+        file_path = safe_join(app.config["GENERATED_FOLDER"], filename)
+        if file_path is not None and os.path.isfile(file_path):
+            # Sent from the path, so servers with a file wrapper (e.g. gunicorn) use sendfile() for the body
+            response = send_file(
+                os.path.abspath(file_path),
+                as_attachment=True,
+                conditional=True,
+                etag=artifact_store.etag_for(filename) or True,
+            )
+            response.headers["Cache-Control"] = "private, no-cache"
+            # Downloads, including revalidations, keep the artifact at the recent end of the LRU order
+            artifact_store.touch(filename)
+            return response
+
+        # An evicted DXF of a recorded design is generated again; the sweep has cleared its filename,
+        # so the design is found by the key the artifact is named after
+        key_prefix = artifact_store.key_prefix_of(filename)
+        if key_prefix and filename.endswith(".dxf"):
+            design = db.session.execute(
+                db.select(models.BridgeDesign)
+                .where(models.BridgeDesign.design_key.startswith(key_prefix, autoescape=True))
+                .order_by(models.BridgeDesign.id.desc())
+                .limit(1)
+            ).scalar()
+            if design is not None:
+                return redirect(url_for("generate_download", design_id=design.id))
+        flash("File not found", "error")
+        return redirect(url_for("index"))
     except Exception as e:
         app.logger.error(f"Download error: {str(e)}")
         flash("Error downloading file", "error")
         return redirect(url_for("index"))
 
 
+@app.route("/preview/<design>/<int:z>/<int:x>/<int:y>")
+def preview_tile(design, z, x, y):
+    """Serve one clipped, level-of-detail reduced SVG tile of a design's preview"""
+    tiles = get_preview_tiles(secure_filename(design))
+    if tiles is None:
+        abort(404)
+
+    svg = tiles.render(z, x, y)
+    if svg is None:
+        abort(404)
+    response = app.response_class(svg, mimetype="image/svg+xml")
+    # Designs are content addressed, so a tile never changes
+    response.headers["Cache-Control"] = "public, max-age=86400, immutable"
+    return response
+
+
+@app.route("/thumbnail/<design>")
+def thumbnail(design):
+    """Serve the PNG thumbnail of a design, falling back to its stored SVG preview or its preview tiles"""
+    key = secure_filename(design)
+    path = artifact_store.path_for(key, ".png")
+    if os.path.exists(path):
+        return send_file(path, mimetype="image/png", max_age=86400)
+    svg_filename = db.session.execute(
+        db.select(models.BridgeDesign.svg_filename)
+        .filter_by(design_key=key)
+        .where(models.BridgeDesign.svg_filename.is_not(None))
+        .limit(1)
+    ).scalar()
+    svg_path = os.path.abspath(os.path.join(app.config["GENERATED_FOLDER"], svg_filename or ""))
+    if svg_filename and os.path.exists(svg_path):
+        # Short-lived, a PNG may be rendered for the design later
+        return send_file(svg_path, mimetype="image/svg+xml", max_age=60)
+    if has_preview_tiles(key):
+        return redirect(url_for("preview_tile", design=key, z=0, x=0, y=0))
+    abort(404)
+
+
+@app.route("/generate/<int:design_id>")
+def generate_download(design_id):
+    """Generate the DXF of a design on demand from its recorded upload, or its parameters and terrain, and send it.
+
+    Answers 503 with Retry-After while too many generations are waiting for a worker.
+    """
+    if not generate_slots.acquire(blocking=False):
+        return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "10"}
+    try:
+        design = db.session.get(models.BridgeDesign, design_id)
+        if design is None:
+            flash("Design not found", "error")
+            return redirect(url_for("index"))
+
+        # Generate in a worker process so the request thread does not hold the GIL while drawing
+        if design.filename == "api" and design.parameters:
+            packed = design.load("parameters")
+            parameters = {name: packed[name.lower()] for name in required_variables if name.lower() in packed}
+            future = submit_work(generate_parameters, parameters, design.project_name, design.load("terrain"))
+        else:
+            filepath = os.path.join(app.config["UPLOAD_FOLDER"], design.upload_filename or "")
+            if not design.upload_filename or not os.path.exists(filepath):
+                flash("Uploaded file not found, please upload it again", "error")
+                return redirect(url_for("index"))
+            upload_store.touch(design.upload_filename)
+            future = submit_work(generate_file, filepath, design.project_name)
+        try:
+            dxf_filename = future.result(timeout=app.config["GENERATE_TIMEOUT"])
+        except FutureTimeout:
+            future.cancel()
+            app.logger.error(f"DXF generation of design {design_id} timed out")
+            return (
+                jsonify({"error": "Generating the DXF took too long, please retry shortly"}),
+                503,
+                {"Retry-After": "30"},
+            )
+        if design.dxf_filename != dxf_filename:
+            design.dxf_filename = dxf_filename
+            db.session.commit()
+        return redirect(url_for("download_file", filename=dxf_filename))
+    except Exception as e:
+        app.logger.error(f"DXF generation error: {str(e)}")
+        flash(f"Error generating DXF: {str(e)}", "error")
+        return redirect(url_for("index"))
+    finally:
+        generate_slots.release()
+
+
 @app.route("/validate", methods=["POST"])
 def validate_parameters():
     """AJAX endpoint for parameter validation"""
@@ -129,8 +1126,7 @@ def validate_parameters():
 
 @app.errorhandler(413)
 def too_large(e):
-    flash("File is too large. Maximum size is 16MB.", "error")
-    return redirect(url_for("index"))
+    return upload_error("File is too large. Maximum size is 16MB.", 413)
 
 
 @app.errorhandler(500)
@@ -141,9 +1137,8 @@ def internal_error(e):
 
 
 with app.app_context():
-    import models
-
     db.create_all()
+    models.upgrade_schema()
 
 if __name__ == "__main__":
     import traceback
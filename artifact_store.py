@@ -0,0 +1,248 @@
+import os
+import json
+import math
+import time
+import hashlib
+import tempfile
+import logging
+import threading
+
+
+class ArtifactStore:
+    """Content-addressed store for generated drawings.
+
+    Artifacts are named by a hash of the normalized design parameters plus the
+    engine version, so identical designs map to the same file and concurrent
+    requests for different designs can never overwrite each other.
+
+    `sweep` keeps the directory within size and age quotas, evicting the least
+    recently accessed artifacts first; accesses are recorded with `touch`.
+    Files of one artifact (DXF, metadata, preview, thumbnail) are evicted
+    together. Other files in the directory, e.g. uploads, are each their own
+    group. Eviction counters are kept in a metrics file in the directory, so
+    every process reports the same ones; processes sharing a directory must
+    not sweep it at the same time.
+    """
+
+    # Temporary files of interrupted writes are removed by `sweep` after this many seconds
+    STALE_TEMP_AGE = 3600
+
+    def __init__(self, root="generated", prefix="bridge_design"):
+        self.logger = logging.getLogger(__name__)
+        self.root = root
+        self.prefix = prefix
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(value):
+        """Normalize parameter values so equal designs serialize identically"""
+        if isinstance(value, dict):
+            return {str(k).lower(): ArtifactStore.normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [ArtifactStore.normalize(v) for v in value]
+        if isinstance(value, bool) or value is None or isinstance(value, str):
+            return value
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return str(value)
+        if not math.isfinite(number):
+            return str(number)
+        # Round away float noise from Excel round-trips, keep integers stable
+        number = round(number, 9)
+        return int(number) if number == int(number) else number
+
+    def key_for(self, parameters, engine_version):
+        """Return the content hash for a parameter set and engine version"""
+        payload = json.dumps(
+            {"engine": engine_version, "parameters": self.normalize(parameters)},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def filename_for(self, key, ext=".dxf"):
+        return f"{self.prefix}_{key[:20]}{ext}"
+
+    def path_for(self, key, ext=".dxf"):
+        return os.path.join(os.path.abspath(self.root), self.filename_for(key, ext))
+
+    def lookup(self, key):
+        """Return the stored metadata for `key`, or None if the artifact does not exist"""
+        dxf_path = self.path_for(key)
+        meta_path = self.path_for(key, ".json")
+        if not os.path.exists(dxf_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            meta = {}
+        meta["filename"] = self.filename_for(key)
+        return meta
+
+    def etag_for(self, filename):
+        """Strong ETag of a stored artifact file: its design key, type and modification time.
+
+        Returns None for files that are not artifacts of this store.
+        """
+        stem, dot, ext = os.path.basename(filename).partition(".")
+        ext = dot + ext
+        if not stem.startswith(f"{self.prefix}_"):
+            return None
+        root = os.path.abspath(self.root)
+        try:
+            with open(os.path.join(root, stem + ".json"), "r", encoding="utf-8") as fh:
+                key = json.load(fh)["key"]
+            mtime = os.stat(os.path.join(root, stem + ext)).st_mtime_ns
+        except (OSError, ValueError, KeyError):
+            return None
+        # A key always describes the same design, but regenerated files differ in header timestamps
+        return f"{key}-{ext.lstrip('.')}-{mtime:x}"
+
+    def key_prefix_of(self, filename):
+        """The start of the design key an artifact file is named by, or None for other files"""
+        group = self.group_of(os.path.basename(filename))
+        return group[len(self.prefix) + 1 :] if group.startswith(f"{self.prefix}_") else None
+
+    def group_of(self, filename):
+        """Eviction group of a file: the artifact name without extension(s), or the file name itself"""
+        stem = filename.partition(".")[0]
+        return stem if stem.startswith(f"{self.prefix}_") else filename
+
+    def touch(self, filename):
+        """Record an access to a stored file (its atime) for LRU eviction; the mtime and ETag stay unchanged"""
+        path = os.path.join(os.path.abspath(self.root), os.path.basename(filename))
+        try:
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except OSError:
+            pass
+
+    def _groups(self):
+        groups = {}
+        root = os.path.abspath(self.root)
+        if not os.path.isdir(root):
+            return groups
+        for entry in os.scandir(root):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            st = entry.stat()
+            group = groups.setdefault(self.group_of(entry.name), {"bytes": 0, "accessed": 0.0, "paths": []})
+            group["bytes"] += st.st_size
+            group["accessed"] = max(group["accessed"], st.st_atime, st.st_mtime)
+            group["paths"].append(entry.path)
+        return groups
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            self.logger.warning(f"Could not remove {path}: {e}")
+
+    def sweep(self, max_bytes=None, max_age=None, pinned=(), now=None):
+        """Evict groups not accessed for `max_age` seconds, then the least recently accessed
+        ones until at most `max_bytes` remain. Groups named in `pinned` are never evicted.
+
+        Returns the list of evicted group names.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            # Leftovers of interrupted writes are only removed here, reading metrics never deletes
+            root = os.path.abspath(self.root)
+            if os.path.isdir(root):
+                for entry in os.scandir(root):
+                    if entry.name.startswith(".tmp_") and now - entry.stat().st_mtime > self.STALE_TEMP_AGE:
+                        self._remove(entry.path)
+            groups = self._groups()
+            total = sum(group["bytes"] for group in groups.values())
+            evicted = []
+            candidates = sorted((name for name in groups if name not in pinned), key=lambda n: groups[n]["accessed"])
+            for name in candidates:
+                group = groups[name]
+                expired = max_age is not None and now - group["accessed"] > max_age
+                if not expired and (max_bytes is None or total <= max_bytes):
+                    # Candidates are oldest first, so no later group is expired either
+                    break
+                for path in group["paths"]:
+                    self._remove(path)
+                total -= group["bytes"]
+                evicted.append(name)
+
+            counters = self._counters()
+            counters["evictions"] += len(evicted)
+            counters["evicted_bytes"] += sum(groups[name]["bytes"] for name in evicted)
+            counters["sweeps"] += 1
+            counters["last_sweep"] = now
+            self._save_counters(counters)
+        if evicted:
+            self.logger.info(f"Evicted {len(evicted)} artifacts from {self.root}, {total} bytes remain")
+        return evicted
+
+    def _counters_path(self):
+        return os.path.join(os.path.abspath(self.root), f".{self.prefix}_metrics.json")
+
+    def _counters(self):
+        """Eviction counters of all sweeps so far, from the metrics file"""
+        counters = {"evictions": 0, "evicted_bytes": 0, "sweeps": 0, "last_sweep": None}
+        try:
+            with open(self._counters_path(), "r", encoding="utf-8") as fh:
+                counters.update(json.load(fh))
+        except (OSError, ValueError):
+            pass
+        return counters
+
+    def _save_counters(self, counters):
+        root = os.path.abspath(self.root)
+        os.makedirs(root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".tmp_", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(counters, fh)
+        os.replace(tmp_path, self._counters_path())
+
+    def metrics(self):
+        """Bytes and files currently stored, plus eviction counters; reads only"""
+        groups = self._groups()
+        return dict(
+            self._counters(),
+            bytes_stored=sum(group["bytes"] for group in groups.values()),
+            files=sum(len(group["paths"]) for group in groups.values()),
+            artifacts=len(groups),
+        )
+
+    def save(self, key, write, meta=None):
+        """Write an artifact atomically.
+
+        `write` is called with a temporary path in the store directory; the
+        result is then renamed into place so readers never see partial files.
+        """
+        root = os.path.abspath(self.root)
+        os.makedirs(root, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".tmp_", suffix=".dxf")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, self.path_for(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        meta = dict(meta or {})
+        meta["key"] = key
+        fd, tmp_meta = tempfile.mkstemp(dir=root, prefix=".tmp_", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_meta, self.path_for(key, ".json"))
+
+        meta["filename"] = self.filename_for(key)
+        return meta
+
+    def save_file(self, key, ext, data):
+        """Atomically write `data` (bytes) next to the artifact of `key`, e.g. a thumbnail"""
+        root = os.path.abspath(self.root)
+        os.makedirs(root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".tmp_", suffix=ext)
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, self.path_for(key, ext))
+        return self.filename_for(key, ext)
@@ -1,15 +1,42 @@
 import pandas as pd
+import numpy as np
 import ezdxf
 import os
 import math
+import html
+import time
 from datetime import datetime
 import logging
 import traceback
+from artifact_store import ArtifactStore
+from entity_emitter import EntityEmitter
+from geometry_index import GeometryIndex, text_bbox
+from preview_tiles import GEOMETRY_EXT, encode_geometry
+from thumbnails import thumbnail_png
+from ezdxf import bbox
 
 
 class BridgeProcessor:
+    # Bump whenever drawing output changes so cached artifacts are not reused
+    ENGINE_VERSION = "1.6.0"
+
+    # Pipeline stages reported to `progress`, in order
+    STAGES = (
+        "parsed",
+        "validated",
+        "grid",
+        "superstructure",
+        "abutments",
+        "piers",
+        "cross-section",
+        "plan",
+        "cleanup",
+        "saved",
+    )
+
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self.artifact_store = ArtifactStore("generated")
         self.required_variables = [
             "SCALE1",
             "SCALE2",
@@ -67,49 +94,207 @@ class BridgeProcessor:
             "ALBBR",
         ]
 
-    def process_excel_file(self, filepath, project_name=None):
-        """Process Excel file and generate bridge drawings"""
+        # Level-of-detail policy for grid and survey annotations.
+        # Distances are paper millimetres and are multiplied by scale1 when drawing.
+        self.lod_min_line_spacing = 2.0  # Closest allowed spacing of grid/tick lines
+        self.lod_min_label_gap = 1.0  # Clear gap kept between neighbouring labels
+        self.lod_char_width = 0.6  # Approximate character width as a fraction of text height
+        self.lod_max_grid_lines = 200  # Hard cap on grid lines per axis
+        self.lod_keep_full_resolution = False  # Also draw thinned-out items on a separate layer
+        self.lod_full_resolution_layer = "GRID_FULL"
+        self.lod_max_full_resolution = 5000  # Hard cap on items placed on the full resolution layer
+        self._lod_detail_count = 0
+        self.lod_terrain_tolerance = 0.1  # Largest deviation of the simplified river bed profile
+        self.lod_keep_full_terrain = False  # Also draw the unsimplified profile on a separate layer
+        self.lod_full_terrain_layer = "TERRAIN_FULL"
+
+        # Geometry shorter than this is rejected by the emitter instead of being drawn and cleaned up
+        self.cleanup_eps = 1e-6
+        # Duplicate lines/polylines are dropped and collinear overlaps merged on endpoints snapped to this grid
+        self.dedupe_geometry = True
+        self.dedupe_quantum = 1e-4
+        # Cell size of the spatial index over emitted geometry, in multiples of scale1
+        self.index_cell_scale = 10.0
+
+        # Paper-space sheet tiling. Sizes are paper millimetres; one paper mm shows scale1 drawing units.
+        self.sheet_layouts = True
+        self.sheet_size = (841.0, 594.0)  # A1 landscape
+        self.sheet_margin = 10.0
+        self.sheet_title_height = 50.0  # Title strip along the bottom of each sheet
+        self.sheet_key_plan_width = 200.0
+        self.sheet_overlap = 0.1  # Fraction of a viewport repeated on the next sheet
+        self.sheet_max_count = 100
+
+        # SVG preview coordinates are quantized to this many steps across the drawing
+        self.svg_resolution = 4000
+
+        # Optional callback(stage, info) told when each pipeline stage has finished
+        self.progress = None
+        self._stage_started = self._stage_last = time.perf_counter()
+
+    def process_excel_file(
+        self, filepath, project_name=None, preview_only=False, preview_format="svg", tiles=False, thumbnail_size=None
+    ):
+        """Process Excel file and generate bridge drawings.
+
+        With `preview_only`, only the preview ("svg" or "json") is produced: the
+        geometry is drawn into memory without an ezdxf document, and `dxf_filename`
+        is None. The DXF can be generated later from the same inputs (see
+        `prepare_variables` and `generate_dxf`). With `tiles`, the geometry is
+        stored as `geometry_filename` for zoomable tiled previews, and with a
+        `thumbnail_size` a PNG thumbnail is stored as `thumbnail_filename`.
+        """
         try:
-            # Read Excel file
-            df = self.read_variables(filepath)
-            if df is None:
-                raise ValueError("Could not read Excel file")
-
-            # Validate parameters
-            validation_result = self.validate_dataframe(df)
-            if not validation_result["valid"]:
-                raise ValueError(f"Parameter validation failed: {'; '.join(validation_result['errors'])}")
-
-            # Extract variables
-            variables = self.extract_variables(df)
-
-            # Add project name to variables
-            if project_name:
-                variables["project_name"] = project_name
-            else:
-                variables["project_name"] = "BRIDGE PROJECT"
+            variables, validation_result = self.prepare_variables(filepath, project_name)
+            dxf_filename, cleanup_stats, previews = self.draw_design(
+                variables,
+                dxf=not preview_only,
+                preview_format=preview_format,
+                tiles=tiles,
+                thumbnail_size=thumbnail_size,
+            )
+            return {
+                "success": True,
+                "variables": variables,
+                "dxf_filename": dxf_filename,
+                "design_key": self.design_key(variables),
+                "validation": validation_result,
+                "cleanup": cleanup_stats,
+                **previews,
+            }
+
+        except Exception as e:
+            self.logger.error(f"Processing error: {str(e)}")
+            return {"success": False, "error": str(e), "variables": {}, "dxf_filename": None, "svg_content": None}
+
+    def prepare_variables(self, filepath, project_name=None):
+        """Read, validate and extract the drawing variables of an Excel file; returns (variables, validation)"""
+        self._stage_started = self._stage_last = time.perf_counter()
+
+        # Read Excel file
+        df = self.read_variables(filepath)
+        if df is None:
+            raise ValueError("Could not read Excel file")
+        self.report_stage("parsed")
+
+        # Validate parameters
+        validation_result = self.validate_dataframe(df)
+        if not validation_result["valid"]:
+            raise ValueError(f"Parameter validation failed: {'; '.join(validation_result['errors'])}")
+        self.report_stage("validated")
+
+        # Extract variables
+        variables = self.extract_variables(df)
+
+        # Add project name to variables
+        if project_name:
+            variables["project_name"] = project_name
+        else:
+            variables["project_name"] = "BRIDGE PROJECT"
 
-            # Add Excel file path to variables for cross-section plotting
-            variables["excel_file_path"] = filepath
+        # Add Excel file path and its Sheet2 survey data for cross-section plotting
+        variables["excel_file_path"] = filepath
+        variables["terrain"] = self.read_terrain(filepath)
 
-            # Generate DXF file
-            dxf_filename, cleanup_stats = self.generate_dxf(variables)
+        return variables, validation_result
 
-            # Generate SVG for web display
-            svg_content = self.generate_svg_preview(variables)
+    def validate_parameter_set(self, parameters, terrain=None):
+        """Validate a parameter dict keyed by the required variable names, and an optional terrain array"""
+        errors = []
+        if not isinstance(parameters, dict):
+            return {"valid": False, "errors": ["Parameters must be an object of variable names to values"]}
+
+        missing_vars = [var for var in self.required_variables if var not in parameters]
+        if missing_vars:
+            errors.append(f"Missing required variables: {', '.join(missing_vars)}")
+        for name, value in parameters.items():
+            try:
+                if isinstance(value, bool) or not math.isfinite(float(value)):
+                    raise ValueError
+            except (ValueError, TypeError):
+                errors.append(f"Non-numeric value for variable {name}: {value}")
+        if not errors:
+            errors.extend(self.validate_parameters(parameters)["errors"])
+
+        if terrain is not None:
+            try:
+                points = [(float(x), float(y)) for x, y in terrain]
+                if len(points) < 2 or not all(math.isfinite(x) and math.isfinite(y) for x, y in points):
+                    raise ValueError
+            except (ValueError, TypeError):
+                errors.append("Terrain must be a list of at least two finite [chainage, RL] pairs")
+
+        return {"valid": len(errors) == 0, "errors": errors}
+
+    def prepare_parameters(self, parameters, project_name=None, terrain=None, validation=None):
+        """Validate and extract the drawing variables of a parameter dict; returns (variables, validation).
+
+        A `validation` result the caller already has for the same parameters is used instead of validating again.
+        """
+        self._stage_started = self._stage_last = time.perf_counter()
+        self.report_stage("parsed")
+
+        validation_result = validation or self.validate_parameter_set(parameters, terrain)
+        if not validation_result["valid"]:
+            raise ValueError(f"Parameter validation failed: {'; '.join(validation_result['errors'])}")
+        self.report_stage("validated")
+
+        # Same layout as extract_variables: original names plus lowercase versions
+        variables = {}
+        for name, value in parameters.items():
+            variables[name] = float(value)
+            variables[name.lower()] = float(value)
+        variables["project_name"] = project_name or "BRIDGE PROJECT"
+        variables["terrain"] = [[float(x), float(y)] for x, y in terrain] if terrain is not None else None
+
+        return variables, validation_result
+
+    def process_parameters(
+        self, parameters, project_name=None, terrain=None, preview_format="svg", thumbnail_size=None, validation=None
+    ):
+        """Generate the DXF and preview of a parameter dict (see prepare_parameters).
 
+        `preview_format` is "svg", "json" or None for no preview; with a
+        `thumbnail_size` a PNG thumbnail is stored too.
+        """
+        validation_result = validation
+        try:
+            variables, validation_result = self.prepare_parameters(parameters, project_name, terrain, validation)
+            dxf_filename, cleanup_stats, previews = self.draw_design(
+                variables, preview_format=preview_format, thumbnail_size=thumbnail_size
+            )
             return {
                 "success": True,
                 "variables": variables,
                 "dxf_filename": dxf_filename,
-                "svg_content": svg_content,
+                "design_key": self.design_key(variables),
                 "validation": validation_result,
                 "cleanup": cleanup_stats,
+                **previews,
             }
 
         except Exception as e:
             self.logger.error(f"Processing error: {str(e)}")
-            return {"success": False, "error": str(e), "variables": {}, "dxf_filename": None, "svg_content": None}
+            return {"success": False, "error": str(e), "validation": validation_result, "dxf_filename": None}
+
+    def report_stage(self, stage, entities=None):
+        """Tell the `progress` callback that `stage` has finished, with elapsed seconds and entity count"""
+        if self.progress is None:
+            return
+        now = time.perf_counter()
+        info = {
+            "stage": stage,
+            "index": self.STAGES.index(stage) + 1,
+            "total": len(self.STAGES),
+            "elapsed": round(now - self._stage_started, 3),
+            "duration": round(now - self._stage_last, 3),
+            "entities": entities,
+        }
+        self._stage_last = now
+        try:
+            self.progress(stage, info)
+        except Exception as e:
+            self.logger.error(f"Progress reporting error: {str(e)}")
 
     def read_variables(self, file_path):
         """Read variables from Excel file"""
@@ -140,6 +325,29 @@ class BridgeProcessor:
             self.logger.error(f"Error reading Excel file: {e}")
             return None
 
+    def read_terrain(self, file_path):
+        """Read the Sheet2 river bed survey as a list of [chainage, RL] pairs, or None if unavailable"""
+        if not file_path or not os.path.exists(file_path):
+            return None
+        try:
+            df_sheet2 = pd.read_excel(file_path, sheet_name="Sheet2")
+        except Exception as e:
+            self.logger.warning(f"Could not read Excel Sheet2 data: {e}, using fallback terrain")
+            return None
+        if "Chainage (x)" not in df_sheet2.columns or "RL (y)" not in df_sheet2.columns:
+            return None
+
+        terrain = []
+        for x, y in zip(df_sheet2["Chainage (x)"], df_sheet2["RL (y)"]):
+            try:
+                x = float(x)
+                y = float(y)
+            except (ValueError, TypeError):
+                continue
+            if math.isfinite(x) and math.isfinite(y):
+                terrain.append([x, y])
+        return terrain
+
     def validate_dataframe(self, df):
         """Validate that all required variables are present"""
         errors = []
@@ -207,88 +415,227 @@ class BridgeProcessor:
                 self.logger.warning(f"Could not convert {row['Variable']} value to float: {row['Value']}")
         return variables
 
-    def generate_dxf(self, variables):
-        """Generate DXF file from bridge parameters using comprehensive bridge drawing logic"""
+    def design_key(self, variables):
+        """Return the content hash naming the drawing generated for `variables`"""
+        parameters = {k: v for k, v in variables.items() if k != "excel_file_path"}
+        parameters["lod"] = [
+            self.lod_min_line_spacing,
+            self.lod_min_label_gap,
+            self.lod_char_width,
+            self.lod_max_grid_lines,
+            self.lod_keep_full_resolution,
+            self.lod_max_full_resolution,
+            self.lod_terrain_tolerance,
+            self.lod_keep_full_terrain,
+        ]
+        parameters["sheets"] = [
+            self.sheet_layouts,
+            list(self.sheet_size),
+            self.sheet_margin,
+            self.sheet_title_height,
+            self.sheet_key_plan_width,
+            self.sheet_overlap,
+            self.sheet_max_count,
+        ]
+        parameters["cleanup"] = [self.cleanup_eps, self.dedupe_geometry, self.dedupe_quantum]
+        return self.artifact_store.key_for(parameters, self.ENGINE_VERSION)
+
+    def draw_design(self, variables, dxf=True, preview_format="svg", tiles=False, thumbnail_size=None):
+        """Draw a design once and produce its DXF and previews from the same geometry.
+
+        The DXF is written unless `dxf` is false; when it is already stored, the
+        geometry is drawn into memory for the previews only. `preview_format` is
+        "svg", "json" or None. With `tiles`, the geometry is also stored next to
+        the artifact (see `save_geometry`) to serve tiled previews from, and with
+        a `thumbnail_size` a PNG thumbnail (see `save_thumbnail`), unless stored
+        already. Returns (dxf_filename, cleanup_stats, previews), see `render_previews`.
+        """
+        if "terrain" not in variables:
+            variables = dict(variables, terrain=self.read_terrain(variables.get("excel_file_path")))
+        key = self.design_key(variables)
+        previews = {}
+        if thumbnail_size and os.path.exists(self.artifact_store.path_for(key, ".png")):
+            previews["thumbnail_filename"] = self.artifact_store.filename_for(key, ".png")
+            thumbnail_size = None
+        wanted = preview_format is not None or tiles or bool(thumbnail_size)
+        rendered = []
+
+        def render(emitter):
+            rendered.append(key)
+            previews.update(self.render_previews(emitter, preview_format))
+            if tiles:
+                geometry = previews["geometry"] or self.render_geometry_json(emitter)
+                previews["geometry_filename"] = self.save_geometry(key, geometry)
+            if thumbnail_size:
+                previews["thumbnail_filename"] = self.save_thumbnail(key, emitter, thumbnail_size)
+
+        if dxf:
+            dxf_filename, cleanup_stats = self.generate_dxf(variables, on_geometry=render if wanted else None)
+            if rendered or not wanted:
+                return dxf_filename, cleanup_stats, previews
+
+        # Preview only, or a stored DXF whose stages were already reported
+        progress = self.progress
+        if dxf:
+            self.progress = None
         try:
+            emitter = self.draw_geometry(variables)
+            if emitter.dedupe:
+                emitter.deduplicate()
+            self.report_stage("cleanup", len(emitter))
+            render(emitter)
+            self.report_stage("saved", len(emitter))
+        finally:
+            self.progress = progress
+        if dxf:
+            return dxf_filename, cleanup_stats, previews
+        return None, dict(emitter.rejected), previews
+
+    def generate_dxf(self, variables, on_geometry=None):
+        """Generate DXF file from bridge parameters using comprehensive bridge drawing logic.
+
+        `on_geometry(emitter)` is called with the deduplicated geometry before it
+        is inserted into the modelspace, e.g. to render previews from the same
+        drawing; it is not called when an existing artifact is reused.
+        """
+        try:
+            # Survey data is part of the design identity, load it once up front
+            if "terrain" not in variables:
+                variables = dict(variables, terrain=self.read_terrain(variables.get("excel_file_path")))
+
+            # Identical designs map to the same artifact, reuse it if already generated
+            key = self.design_key(variables)
+            cached = self.artifact_store.lookup(key)
+            if cached is not None:
+                self.logger.info(f"Reusing existing artifact {cached['filename']}")
+                self.report_stage("saved")
+                return cached["filename"], cached.get("cleanup", {})
+
             # Create DXF document
             doc = ezdxf.new("R2010", setup=True)
-            msp = doc.modelspace()
 
             # Setup styles and dimensions
             self.setup_styles(doc)
 
-            # Calculate derived values like the original code
-            scale1 = variables.get("scale1", 186)
-            scale2 = variables.get("scale2", 1)
-            skew = variables.get("skew", 0)
-            datum = variables.get("datum", 95)
-            left = variables.get("left", 0)
-            right = variables.get("right", 100)
-            toprl = variables.get("toprl", 100)
-
-            # Scale calculations
-            hs = 1
-            vs = 1
-            sc = scale1 / scale2
-            vvs = 1000.0 / vs
-            hhs = 1000.0 / hs
-            skew1 = skew * 0.0174532  # Convert to radians
-
-            # Position calculation functions
-            def vpos(a):
-                return datum + vvs * (a - datum)
-
-            def hpos(a):
-                return left + hhs * (a - left)
-
-            # Draw advanced layout grid system with chainage and level annotations
-            self.draw_advanced_layout_grid(msp, doc, variables, scale1)
-
-            # Draw comprehensive bridge design using enhanced LISP logic
-            self.draw_bridge_superstructure(msp, variables, hpos, vpos, scale1, hhs)
-            self.draw_detailed_abutment_geometry(msp, variables, hpos, vpos, scale1)
-            self.draw_complex_pier_geometry(msp, variables, hpos, vpos, scale1, hhs)
-            self.draw_approach_slabs(msp, variables, hpos, vpos, scale1)
-
-            # Add cross-section plotting for detailed analysis
-            lbridge = variables.get("lbridge", 100)  # Get bridge length
-            nspan = int(variables.get("nspan", 1))  # Get number of spans
-            section_x = left + lbridge / 2
-            section_y = toprl
-            self.draw_cross_section_plotting(msp, variables, section_x, section_y, scale1)
-
-            # Draw plan view (top-down view) with footings and plan details
-            self.draw_plan_view(msp, variables, hpos, vpos, scale1, hhs, vvs, datum, left)
+            # Draw everything into the modelspace through a batching emitter
+            emitter = self.draw_geometry(variables, doc)
+            if on_geometry is not None:
+                if emitter.dedupe:
+                    emitter.deduplicate()
+                    emitter.dedupe = False  # already done, flush() must not repeat it
+                on_geometry(emitter)
+            self.report_stage("cleanup", emitter.flush())
 
-            # Add drawing border and title block
-            self.draw_border_and_title(msp, doc, variables, scale1, left, datum)
+            # Degenerate geometry was rejected at emit time; report it like the cleanup pass did
+            cleanup_stats = dict(emitter.rejected)
+            self.logger.info(f"Cleanup removed: {cleanup_stats}")
 
-            # Cleanup degenerate/orphan entities before saving
-            cleanup_stats = self.remove_orphan_points_and_degenerate_entities(doc)
+            # Save DXF file under its content hash (written atomically)
+            meta = self.artifact_store.save(key, doc.saveas, {"cleanup": cleanup_stats})
+            self.report_stage("saved", len(doc.modelspace()))
 
-            # Save DXF file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"bridge_design_{timestamp}.dxf"
-
-            # Ensure generated directory exists (absolute path)
-            generated_dir = os.path.abspath("generated")
-            os.makedirs(generated_dir, exist_ok=True)
-            filepath = os.path.join(generated_dir, filename)
-            doc.saveas(filepath)
-
-            return filename, cleanup_stats
+            return meta["filename"], cleanup_stats
 
         except Exception as e:
             self.logger.error(f"DXF generation error: {str(e)}")
             raise
 
+    def draw_geometry(self, variables, doc=None):
+        """Run all drawing routines and return the EntityEmitter holding the buffered geometry.
+
+        With a `doc`, the emitter targets its modelspace (call `flush()` to insert)
+        and paper-space sheet layouts are created; without one, the geometry is
+        only buffered, e.g. for previews.
+        """
+        if "terrain" not in variables:
+            variables = dict(variables, terrain=self.read_terrain(variables.get("excel_file_path")))
+        self._lod_detail_count = 0
+
+        # Calculate derived values like the original code
+        scale1 = variables.get("scale1", 186)
+        scale2 = variables.get("scale2", 1)
+        skew = variables.get("skew", 0)
+        datum = variables.get("datum", 95)
+        left = variables.get("left", 0)
+        right = variables.get("right", 100)
+        toprl = variables.get("toprl", 100)
+
+        # Scale calculations
+        hs = 1
+        vs = 1
+        sc = scale1 / scale2
+        vvs = 1000.0 / vs
+        hhs = 1000.0 / hs
+        skew1 = skew * 0.0174532  # Convert to radians
+
+        # Buffer all drawing in an emitter so entities are inserted into the modelspace in one batch,
+        # indexing their bounding boxes for extents and overlap queries as they are added
+        emitter = EntityEmitter(
+            doc.modelspace() if doc is not None else None,
+            eps=self.cleanup_eps,
+            quantum=self.dedupe_quantum,
+            dedupe=self.dedupe_geometry,
+            index=GeometryIndex(cell_size=self.index_cell_scale * scale1),
+        )
+
+        # Position calculation functions
+        def vpos(a):
+            return datum + vvs * (a - datum)
+
+        def hpos(a):
+            return left + hhs * (a - left)
+
+        # Draw advanced layout grid system with chainage and level annotations
+        emitter.set_view("grid")
+        self.draw_advanced_layout_grid(emitter, doc, variables, scale1)
+        self.report_stage("grid", len(emitter))
+
+        # Draw comprehensive bridge design using enhanced LISP logic
+        emitter.set_view("elevation")
+        self.draw_bridge_superstructure(emitter, variables, hpos, vpos, scale1, hhs)
+        self.report_stage("superstructure", len(emitter))
+        self.draw_detailed_abutment_geometry(emitter, variables, hpos, vpos, scale1)
+        self.report_stage("abutments", len(emitter))
+        self.draw_complex_pier_geometry(emitter, variables, hpos, vpos, scale1, hhs)
+        self.draw_approach_slabs(emitter, variables, hpos, vpos, scale1)
+        self.report_stage("piers", len(emitter))
+
+        # Add cross-section plotting for detailed analysis
+        lbridge = variables.get("lbridge", 100)  # Get bridge length
+        nspan = int(variables.get("nspan", 1))  # Get number of spans
+        section_x = left + lbridge / 2
+        section_y = toprl
+        emitter.set_view("cross_section")
+        self.draw_cross_section_plotting(emitter, variables, section_x, section_y, scale1)
+        self.report_stage("cross-section", len(emitter))
+
+        # Draw plan view (top-down view) with footings and plan details
+        emitter.set_view("plan")
+        self.draw_plan_view(emitter, variables, hpos, vpos, scale1, hhs, vvs, datum, left)
+        self.report_stage("plan", len(emitter))
+
+        # Tile the drawing onto paper-space sheets before the border is added to the index
+        if doc is not None and self.sheet_layouts:
+            self.create_sheet_layouts(doc, emitter, variables, scale1)
+
+        # Add drawing border and title block
+        emitter.set_view("border")
+        self.draw_border_and_title(emitter, doc, variables, scale1, left, datum)
+
+        return emitter
+
     def remove_orphan_points_and_degenerate_entities(self, doc, eps: float = 1e-6):
         """Remove orphan/degenerate entities from the DXF document.
         - Zero-length LINEs
         - LWPOLYLINEs with <2 distinct vertices or with near-zero extents
         - Zero-radius CIRCLEs and ARCs
         - POINT entities (treated as orphan display artifacts)
+        The modelspace is traversed once; degeneracy is tested on NumPy coordinate arrays.
         Returns a stats dict with removed counts per type.
+
+        Not part of drawing generation, where the EntityEmitter rejects degenerate
+        geometry as it is emitted. Kept for scripts/run_cleanup_test.py and as the
+        reference the emitter is checked against in test_entity_emitter.py.
         """
         msp = doc.modelspace()
         removed = {
@@ -299,57 +646,55 @@ class BridgeProcessor:
             "points_removed": 0,
         }
 
-        # Collect to avoid modifying while iterating
+        # Single traversal: classify entities by type and gather their coordinates
+        lines, line_coords = [], []
+        polylines, polyline_points = [], []
+        curves, radii = [], []
         to_remove = []
-
-        # Zero-length LINEs
-        for e in list(msp.query("LINE")):
+        for e in msp:
+            dxftype = e.dxftype()
             try:
-                s = e.dxf.start
-                t = e.dxf.end
-                dx = float(s.x) - float(t.x)
-                dy = float(s.y) - float(t.y)
-                dz = float(s.z) - float(t.z)
-                if dx * dx + dy * dy + dz * dz <= eps * eps:
-                    to_remove.append(("LINE", e))
+                if dxftype == "LINE":
+                    s = e.dxf.start
+                    t = e.dxf.end
+                    line_coords.append((s.x, s.y, s.z, t.x, t.y, t.z))
+                    lines.append(e)
+                elif dxftype == "LWPOLYLINE":
+                    # Vertex rows are (x, y, start width, end width, bulge); view x/y without copying
+                    polyline_points.append(e.lwpoints.values[:, :2])
+                    polylines.append(e)
+                elif dxftype in ("CIRCLE", "ARC"):
+                    radii.append(float(e.dxf.radius))
+                    curves.append((dxftype, e))
+                elif dxftype == "POINT":
+                    # Remove POINTs (commonly stray)
+                    to_remove.append(("POINT", e))
             except Exception:
                 continue
 
-        # Degenerate LWPOLYLINEs
-        for e in list(msp.query("LWPOLYLINE")):
-            try:
-                pts = [tuple(p[:2]) for p in e.get_points("xy")]
-                if len(pts) < 2:
-                    to_remove.append(("LWPOLYLINE", e))
-                    continue
-                xs = [p[0] for p in pts]
-                ys = [p[1] for p in pts]
-                if (max(xs) - min(xs)) ** 2 + (max(ys) - min(ys)) ** 2 <= eps * eps:
-                    to_remove.append(("LWPOLYLINE", e))
-            except Exception:
-                continue
-
-        # Zero-radius CIRCLEs
-        for e in list(msp.query("CIRCLE")):
-            try:
-                r = float(e.dxf.radius)
-                if r <= eps:
-                    to_remove.append(("CIRCLE", e))
-            except Exception:
-                continue
-
-        # Zero-radius ARCs
-        for e in list(msp.query("ARC")):
-            try:
-                r = float(e.dxf.radius)
-                if r <= eps:
-                    to_remove.append(("ARC", e))
-            except Exception:
-                continue
-
-        # Remove POINTs (commonly stray)
-        for e in list(msp.query("POINT")):
-            to_remove.append(("POINT", e))
+        # Zero-length LINEs
+        if lines:
+            coords = np.asarray(line_coords, dtype=np.float64)
+            delta = coords[:, :3] - coords[:, 3:]
+            degenerate = np.einsum("ij,ij->i", delta, delta) <= eps * eps
+            to_remove.extend(("LINE", lines[i]) for i in np.flatnonzero(degenerate))
+
+        # Degenerate LWPOLYLINEs: fewer than 2 vertices or near-zero bounding box diagonal
+        if polylines:
+            counts = np.fromiter((len(p) for p in polyline_points), dtype=np.int64, count=len(polyline_points))
+            degenerate = counts < 2
+            nonempty = counts > 0
+            if nonempty.any():
+                flat = np.concatenate([p for p in polyline_points if len(p)])
+                starts = np.concatenate(([0], np.cumsum(counts[nonempty])[:-1]))
+                extents = np.maximum.reduceat(flat, starts, axis=0) - np.minimum.reduceat(flat, starts, axis=0)
+                degenerate[nonempty] |= np.einsum("ij,ij->i", extents, extents) <= eps * eps
+            to_remove.extend(("LWPOLYLINE", polylines[i]) for i in np.flatnonzero(degenerate))
+
+        # Zero-radius CIRCLEs and ARCs
+        if curves:
+            degenerate = np.asarray(radii, dtype=np.float64) <= eps
+            to_remove.extend(curves[i] for i in np.flatnonzero(degenerate))
 
         # Execute removals and accumulate stats
         for typ, ent in to_remove:
@@ -398,9 +743,152 @@ class BridgeProcessor:
             doc.styles.new("Times", dxfattribs={"font": "Times.ttf"})
             doc.styles.new("Courier", dxfattribs={"font": "Courier.ttf"})
 
+            # Optional layer holding grid and survey detail removed by the LOD policy (off by default)
+            full_layer = doc.layers.add(self.lod_full_resolution_layer, color=8)
+            full_layer.off()
+            full_terrain_layer = doc.layers.add(self.lod_full_terrain_layer, color=8)
+            full_terrain_layer.off()
+
         except Exception as e:
             self.logger.warning(f"Style setup warning: {str(e)}")
 
+    # ===== LEVEL-OF-DETAIL POLICY =====
+
+    def lod_label_extent(self, text, height, rotation=0):
+        """Approximate extent of a label along the axis its neighbours are spaced on"""
+        if rotation % 180 == 90:
+            return height
+        return len(text) * height * self.lod_char_width
+
+    def lod_stride(self, count, spacing, scale1, extent=0.0):
+        """Return the index step so that drawn items are legibly spaced and capped in number.
+
+        `spacing` is the drawing distance between consecutive items and `extent`
+        the size of one item (e.g. a label) along the same axis.
+        """
+        if count <= 1 or spacing <= 0:
+            return 1
+        min_spacing = self.lod_min_line_spacing * scale1
+        if extent:
+            min_spacing = max(min_spacing, extent + self.lod_min_label_gap * scale1)
+        stride = max(1, math.ceil(min_spacing / spacing - 1e-9))
+        return max(stride, math.ceil(count / self.lod_max_grid_lines))
+
+    def lod_thin_positions(self, positions, min_gap):
+        """Greedily select irregular positions (e.g. survey chainages) at least `min_gap` apart.
+
+        Returns a list of booleans, True for the positions that should be kept.
+        """
+        keep = []
+        last = None
+        kept = 0
+        for pos in positions:
+            ok = (last is None or abs(pos - last) >= min_gap) and kept < self.lod_max_grid_lines
+            if ok:
+                last = pos
+                kept += 1
+            keep.append(ok)
+        return keep
+
+    def lod_simplify(self, points, tolerance):
+        """Douglas-Peucker simplification of a polyline; returns the kept vertices as an (n, 2) array.
+
+        Each split step measures the distance of every point in the span to its
+        chord in one vectorized operation.
+        """
+        pts = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(pts) < 3 or tolerance <= 0:
+            return pts
+        keep = np.zeros(len(pts), dtype=bool)
+        keep[[0, -1]] = True
+        stack = [(0, len(pts) - 1)]
+        while stack:
+            start, end = stack.pop()
+            if end - start < 2:
+                continue
+            chord = pts[end] - pts[start]
+            rel = pts[start + 1 : end] - pts[start]
+            length = math.hypot(chord[0], chord[1])
+            if length > 0:
+                dist = np.abs(chord[0] * rel[:, 1] - chord[1] * rel[:, 0]) / length
+            else:
+                dist = np.hypot(rel[:, 0], rel[:, 1])
+            split = int(np.argmax(dist))
+            if dist[split] > tolerance:
+                split += start + 1
+                keep[split] = True
+                stack.append((start, split))
+                stack.append((split, end))
+        return pts[keep]
+
+    def lod_target(self, keep):
+        """Classify an item as "main", "detail" (full resolution layer) or None (dropped)"""
+        if keep:
+            return "main"
+        if not self.lod_keep_full_resolution or self._lod_detail_count >= self.lod_max_full_resolution:
+            return None
+        self._lod_detail_count += 1
+        return "detail"
+
+    def lod_label_clear(self, msp, text, insert, text_attribs):
+        """False if the label would overlap text already emitted into an indexed emitter"""
+        index = getattr(msp, "index", None)
+        if index is None:
+            return True
+        label_box = text_bbox(
+            text,
+            insert[0],
+            insert[1],
+            text_attribs.get("height", 2.5),
+            text_attribs.get("rotation", 0.0),
+            text_attribs.get("halign", 0),
+            text_attribs.get("valign", 0),
+            self.lod_char_width,
+        )
+        return not index.intersects(label_box, "TEXT")
+
+    def emit_lod(self, msp, lines=None, texts=None, text_attribs=None):
+        """Emit LOD-classified line and text buckets, placing "detail" items on the full resolution layer"""
+        detail = {"layer": self.lod_full_resolution_layer}
+        if lines:
+            self.emit_lines(msp, lines["main"])
+            self.emit_lines(msp, lines["detail"], detail)
+        if texts:
+            self.emit_texts(msp, texts["main"], text_attribs)
+            self.emit_texts(msp, texts["detail"], {**(text_attribs or {}), **detail})
+
+    # ===== BULK ENTITY EMISSION =====
+
+    def drawing_extents(self, msp):
+        """Return ((min_x, min_y), (max_x, max_y)) of the drawn geometry, or None if nothing is drawn"""
+        if isinstance(msp, EntityEmitter):
+            return msp.extents()
+        box = bbox.extents(msp)
+        if not box.has_data:
+            return None
+        return (box.extmin.x, box.extmin.y), (box.extmax.x, box.extmax.y)
+
+    def emit_lines(self, msp, segments, dxfattribs=None):
+        """Add many LINE entities sharing one attribute template"""
+        emitter = msp if isinstance(msp, EntityEmitter) else EntityEmitter(msp)
+        emitter.add_lines(segments, dxfattribs)
+        if emitter is not msp:
+            emitter.flush()
+
+    def emit_polylines(self, msp, polylines, dxfattribs=None, close=False):
+        """Add many LWPOLYLINE entities sharing one attribute template"""
+        emitter = msp if isinstance(msp, EntityEmitter) else EntityEmitter(msp)
+        emitter.add_polylines(polylines, dxfattribs, close=close)
+        if emitter is not msp:
+            emitter.flush()
+
+    def emit_texts(self, msp, texts, dxfattribs=None):
+        """Add many TEXT entities, given as (text, insert) pairs, sharing one attribute template"""
+        emitter = msp if isinstance(msp, EntityEmitter) else EntityEmitter(msp)
+        emitter.add_texts(texts, dxfattribs)
+        if emitter is not msp:
+            emitter.flush()
+
     def draw_bridge_elevation(self, msp, variables, sc, skew1):
         """Draw bridge elevation view"""
         try:
@@ -527,15 +1015,22 @@ class BridgeProcessor:
             # Write levels on Y axis
             nov = int((toprl - datum) // 1)
             n = max(1, int(nov // yincr))
+            text_height = 2.0 * scale1
+            stride = self.lod_stride(n + 1, vpos(datum + yincr) - vpos(datum), scale1, extent=text_height)
+            ticks = {"main": [], "detail": []}
+            labels = {"main": [], "detail": []}
             for a in range(n + 1):
+                target = self.lod_target(a % stride == 0)
+                if target is None:
+                    continue
                 lvl = datum + a * yincr
                 b1 = "{:.3f}".format(lvl)
                 pta1 = [left - 13 * scale1, vpos(lvl) - 1.0 * scale1]
-                text_height = 2.0 * scale1
-                msp.add_text(b1, dxfattribs={"height": text_height, "rotation": 0, "insert": pta1})
+                labels[target].append((b1, pta1))
                 small_line_start = (left - d2 * scale1, vpos(lvl))
                 small_line_end = (left + d2 * scale1, vpos(lvl))
-                msp.add_line(small_line_start, small_line_end)
+                ticks[target].append((small_line_start, small_line_end))
+            self.emit_lod(msp, ticks, labels, {"height": text_height, "rotation": 0})
 
             # Write chainages on X axis
             noh = right - left
@@ -546,17 +1041,24 @@ class BridgeProcessor:
             d7 = d1 - 2.0
             d8 = d4 - 4.0
 
+            stride = self.lod_stride(n + 2, hpos(left + xincr) - hpos(left), scale1, extent=2.0 * scale1)
+            ticks = {"main": [], "detail": []}
+            labels = {"main": [], "detail": []}
             for a in range(0, n + 2):
+                target = self.lod_target(a % stride == 0)
+                if target is None:
+                    continue
                 ch = left + a * xincr
                 b1 = f"{ch:.3f}"
                 pta1 = [scale1 + hpos(ch), datum - d8 * scale1]
-                msp.add_text(b1, dxfattribs={"height": 2.0 * scale1, "insert": pta1, "rotation": 90})
+                labels[target].append((b1, pta1))
                 pta1 = [hpos(ch), datum - d4 * scale1]
                 pta2 = [hpos(ch), datum - d5 * scale1]
                 pta3 = [hpos(ch), datum - d6 * scale1]
                 pta4 = [hpos(ch), datum - d7 * scale1]
-                msp.add_line(pta1, pta2)
-                msp.add_line(pta3, pta4)
+                ticks[target].append((pta1, pta2))
+                ticks[target].append((pta3, pta4))
+            self.emit_lod(msp, ticks, labels, {"height": 2.0 * scale1, "rotation": 90})
 
         except Exception as e:
             self.logger.error(f"Layout grid drawing error: {str(e)}")
@@ -1100,9 +1602,10 @@ class BridgeProcessor:
     def draw_border_and_title(self, msp, doc, variables, scale1, left, datum):
         """Add professional drawing border and title block with proportional fonts"""
         try:
-            # Get drawing extents
-            drawing_extents = msp.get_geometric_data("extents")
+            # Get drawing extents tracked by the emitter (O(1))
+            drawing_extents = self.drawing_extents(msp)
             if not drawing_extents:
+                self.logger.warning("Nothing drawn, skipping border and title block")
                 return
 
             drawing_left = drawing_extents[0][0]
@@ -1188,6 +1691,132 @@ class BridgeProcessor:
         except Exception as e:
             self.logger.error(f"Border and title error: {str(e)}")
 
+    def create_sheet_layouts(self, doc, emitter, variables, scale1):
+        """Create one paper-space layout per sheet, with viewports tiled along the chainage.
+
+        Sheet windows come from the emitter's extents and the vertical placement
+        of each window from a geometry index query over its chainage strip, so
+        the modelspace is never walked. Each sheet gets a title block and a key
+        plan showing the whole drawing with the current window outlined.
+        Returns the number of sheets created.
+        """
+        try:
+            extents = emitter.extents()
+            if extents is None:
+                self.logger.warning("Nothing drawn, skipping sheet layouts")
+                return 0
+            (min_x, min_y), (max_x, max_y) = extents
+
+            sheet_w, sheet_h = self.sheet_size
+            margin = self.sheet_margin
+            title_h = self.sheet_title_height
+            vp_w = sheet_w - 2 * margin
+            vp_h = sheet_h - 3 * margin - title_h
+            view_w = vp_w * scale1
+            view_h = vp_h * scale1
+            overlap = self.sheet_overlap * view_w
+            step = view_w - overlap
+
+            count = max(1, math.ceil((max_x - min_x - overlap) / step))
+            if count > self.sheet_max_count:
+                self.logger.warning(f"Drawing needs {count} sheets, only the first {self.sheet_max_count} are created")
+                count = self.sheet_max_count
+
+            # Key plan shows the whole drawing inside the title strip
+            key_w = self.sheet_key_plan_width
+            key_h = title_h - 2 * margin
+            key_center = (sheet_w - margin - key_w / 2, margin + title_h / 2)
+            key_view_h = max(max_y - min_y, (max_x - min_x) * key_h / key_w) * 1.05
+            key_scale = key_h / key_view_h
+            model_center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
+
+            def key_pos(x, y):
+                return (
+                    key_center[0] + (x - model_center[0]) * key_scale,
+                    key_center[1] + (y - model_center[1]) * key_scale,
+                )
+
+            project_name = variables.get("project_name", "BRIDGE PROJECT")
+            index = emitter.index
+            for i in range(count):
+                x0 = min_x + i * step
+                x1 = x0 + view_w
+
+                # Centre the window on what is actually drawn in this chainage strip. Items taller than the
+                # window (the border around the whole drawing) cannot be centred on and would pin every
+                # strip to the full drawing height, so they are left out.
+                y0, y1 = min_y, max_y
+                if index is not None:
+                    items = [
+                        item
+                        for item in index.query((x0, min_y, x1, max_y))
+                        if index.boxes[item][3] - index.boxes[item][1] <= view_h
+                    ]
+                    if items:
+                        y0 = min(index.boxes[item][1] for item in items)
+                        y1 = max(index.boxes[item][3] for item in items)
+                view_center = ((x0 + x1) / 2, (y0 + y1) / 2)
+
+                layout = doc.layouts.new(f"Sheet {i + 1}")
+                layout.page_setup(size=(sheet_w, sheet_h), margins=(0, 0, 0, 0), units="mm")
+                layout.add_viewport(
+                    center=(sheet_w / 2, sheet_h - margin - vp_h / 2),
+                    size=(vp_w, vp_h),
+                    view_center_point=view_center,
+                    view_height=view_h,
+                )
+
+                # Sheet border and title block
+                layout.add_lwpolyline(
+                    [
+                        (margin, margin),
+                        (sheet_w - margin, margin),
+                        (sheet_w - margin, sheet_h - margin),
+                        (margin, sheet_h - margin),
+                    ],
+                    close=True,
+                )
+                layout.add_lwpolyline(
+                    [
+                        (margin, margin),
+                        (sheet_w - margin, margin),
+                        (sheet_w - margin, margin + title_h),
+                        (margin, margin + title_h),
+                    ],
+                    close=True,
+                )
+                text_x = 2 * margin
+                layout.add_text(
+                    project_name,
+                    dxfattribs={"height": 8, "style": "Arial", "insert": (text_x, margin + title_h - 14)},
+                )
+                layout.add_text(
+                    f"Sheet {i + 1} of {count}    CH {x0:.1f}m to {x1:.1f}m    Scale: 1:{int(scale1)}",
+                    dxfattribs={"height": 5, "style": "Arial", "insert": (text_x, margin + title_h - 28)},
+                )
+
+                # Key plan with the current sheet window outlined, i.e. what the viewport shows
+                layout.add_viewport(
+                    center=key_center,
+                    size=(key_w, key_h),
+                    view_center_point=model_center,
+                    view_height=key_view_h,
+                )
+                bottom = view_center[1] - view_h / 2
+                top = view_center[1] + view_h / 2
+                layout.add_lwpolyline(
+                    [key_pos(x0, bottom), key_pos(x1, bottom), key_pos(x1, top), key_pos(x0, top)],
+                    close=True,
+                    dxfattribs={"color": 1},
+                )
+
+            self.logger.info(f"Created {count} sheet layouts")
+            return count
+
+        except Exception as e:
+            self.logger.error(f"Sheet layout error: {str(e)}")
+            return 0
+
     # ===== MISSING LISP LOGIC IMPLEMENTATION =====
 
     def draw_complex_pier_geometry(self, msp, variables, hpos, vpos, scale1, hhs):
@@ -1569,83 +2198,69 @@ class BridgeProcessor:
             ]
             msp.add_lwpolyline(right_kerb_points, close=True)
 
-            # Try to read real chainage and RL data from Excel if available
+            # Plot the real chainage and RL survey from Excel Sheet2 if available
+            terrain = variables.get("terrain")
+            if terrain is None:
+                terrain = self.read_terrain(variables.get("excel_file_path"))
             try:
-                # Check if we have access to the original Excel file
-                excel_file = variables.get("excel_file_path", None)
-                if excel_file and os.path.exists(excel_file):
-                    # Read Sheet2 for chainage and RL data
-                    df_sheet2 = pd.read_excel(excel_file, sheet_name="Sheet2")
-                    if "Chainage (x)" in df_sheet2.columns and "RL (y)" in df_sheet2.columns:
-                        chainages = df_sheet2["Chainage (x)"]
-                        rls = df_sheet2["RL (y)"]
-
-                        # Initialize variables for river bed plotting
-                        ptb3 = None
-                        a = 1
-
-                        # Loop through the real data and plot
-                        for x, y in zip(chainages, rls):
-                            try:
-                                x = float(x)
-                                y = float(y)
-                            except ValueError:
-                                continue
-
-                            # Calculate positions
-                            xx = section_x + (x - left) * 0.1  # Scale factor for display
-
-                            # Check if chainage x is a multiplier of increment (original logic)
-                            b = (x - left) % xincr
-                            if b != 0.0:
-                                # Draw small grid lines along the X axis (original logic)
-                                pta3 = [xx, datum - d4 * scale1]
-                                pta4 = [xx, datum - d5 * scale1]
-                                msp.add_line(pta3, pta4)
-                                pta5 = [xx, datum - d6 * scale1]
-                                pta6 = [xx, datum - d7 * scale1]
-                                msp.add_line(pta5, pta6)
-                                pta7 = [xx, datum - 2 * scale1]
-                                pta8 = [xx, datum]
-                                msp.add_line(pta7, pta8)
-
-                            # Plot river bed point
-                            ptb4 = [xx, vpos(y)]
-                            if a != 1 and ptb3 is not None:
-                                # Draw connecting line between current and previous point
-                                msp.add_line(ptb3, ptb4)
-                            ptb3 = ptb4
-
-                            # Add chainage and level annotations (original logic)
-                            pta1 = [xx + 0.9 * scale1, datum - d8 * scale1]
-                            pta2 = [xx + 0.9 * scale1, datum - d9 * scale1]
-
-                            rounded_x = round(x, 2)
-                            msp.add_text(
-                                str(rounded_x), dxfattribs={"height": 2 * scale1, "insert": pta1, "rotation": 90}
-                            )
-
-                            rounded_y = round(y, 2)
-                            msp.add_text(
-                                str(rounded_y), dxfattribs={"height": 2 * scale1, "insert": pta2, "rotation": 90}
-                            )
-
-                            a += 1
-
-                        # Add labels (original logic)
-                        b2 = "RL"
-                        b1 = "CH"
-                        msp.add_text(
-                            b2, dxfattribs={"height": 3 * scale1, "insert": (section_x - ccbr / 2 - 10, datum - 10)}
+                if terrain is not None:
+                    # Calculate display positions and apply the LOD policy to ticks and labels
+                    positions = [section_x + (x - left) * 0.1 for x, _ in terrain]  # Scale factor for display
+                    keep_ticks = self.lod_thin_positions(positions, self.lod_min_line_spacing * scale1)
+                    keep_labels = self.lod_thin_positions(positions, 2 * scale1 + self.lod_min_label_gap * scale1)
+
+                    # Collect ticks, labels and the river bed profile, then emit them in bulk
+                    ticks = {"main": [], "detail": []}
+                    labels = {"main": [], "detail": []}
+                    label_attribs = {"height": 2 * scale1, "rotation": 90}
+                    profile = []
+
+                    # Loop through the real data and plot
+                    for (x, y), xx, tick_ok, label_ok in zip(terrain, positions, keep_ticks, keep_labels):
+                        # Check if chainage x is a multiplier of increment (original logic)
+                        b = (x - left) % xincr
+                        target = self.lod_target(tick_ok)
+                        if b != 0.0 and target is not None:
+                            # Draw small grid lines along the X axis (original logic)
+                            ticks[target].append(([xx, datum - d4 * scale1], [xx, datum - d5 * scale1]))
+                            ticks[target].append(([xx, datum - d6 * scale1], [xx, datum - d7 * scale1]))
+                            ticks[target].append(([xx, datum - 2 * scale1], [xx, datum]))
+
+                        # Plot river bed point
+                        profile.append([xx, vpos(y)])
+
+                        # Add chainage and level annotations (original logic), skipping ones over placed text
+                        pta1 = [xx + 0.9 * scale1, datum - d8 * scale1]
+                        pta2 = [xx + 0.9 * scale1, datum - d9 * scale1]
+                        target = self.lod_target(
+                            label_ok and self.lod_label_clear(msp, str(round(x, 2)), pta1, label_attribs)
                         )
-                        msp.add_text(
-                            b1, dxfattribs={"height": 3 * scale1, "insert": (section_x + ccbr / 2 + 10, datum - 10)}
-                        )
-
-                        return  # Exit early if real data was processed
+                        if target is None:
+                            continue
+                        labels[target].append((str(round(x, 2)), pta1))
+                        labels[target].append((str(round(y, 2)), pta2))
+
+                    # River bed profile as one simplified polyline, optionally with the raw survey on its own layer
+                    simplified = self.lod_simplify(profile, self.lod_terrain_tolerance * scale1)
+                    self.emit_polylines(msp, [simplified])
+                    if self.lod_keep_full_terrain:
+                        self.emit_polylines(msp, [profile], {"layer": self.lod_full_terrain_layer})
+                    self.emit_lod(msp, ticks, labels, label_attribs)
+
+                    # Add labels (original logic)
+                    b2 = "RL"
+                    b1 = "CH"
+                    msp.add_text(
+                        b2, dxfattribs={"height": 3 * scale1, "insert": (section_x - ccbr / 2 - 10, datum - 10)}
+                    )
+                    msp.add_text(
+                        b1, dxfattribs={"height": 3 * scale1, "insert": (section_x + ccbr / 2 + 10, datum - 10)}
+                    )
+
+                    return  # Exit early if real data was processed
 
             except Exception as e:
-                self.logger.warning(f"Could not read Excel Sheet2 data: {e}, using fallback terrain")
+                self.logger.warning(f"Could not plot Excel Sheet2 data: {e}, using fallback terrain")
 
             # Fallback: Create realistic river bed profile with terrain variations
             river_left = deck_left - 15
@@ -1825,62 +2440,77 @@ class BridgeProcessor:
             grid_spacing_x = xincr * scale1
             grid_spacing_y = yincr * scale1
 
-            # Draw vertical grid lines (chainage) with professional annotations
-            current_x = left
-            chainage_count = 0
-
-            while current_x <= right and chainage_count < noch:
-                # Main grid line
-                msp.add_line((current_x, datum - 50 * scale1), (current_x, toprl + 50 * scale1))
-
-                # Add chainage annotation with professional formatting
-                chainage_text = f"CH {current_x:.1f}m"
-                msp.add_text(
-                    chainage_text,
-                    dxfattribs={
-                        "height": 3 * scale1,
-                        "style": "Arial",
-                        "insert": (current_x, datum - 60 * scale1),
-                        "halign": 1,
-                    },
+            # Draw vertical grid lines (chainage) with professional annotations,
+            # thinned by the LOD policy so a small XINCR cannot explode the entity count
+            count_x = 0
+            if right >= left:
+                count_x = (
+                    int(noch) if grid_spacing_x <= 0 else min(int(noch), int((right - left) // grid_spacing_x) + 1)
                 )
+            tick_length = 2 * scale1
+            line_stride = self.lod_stride(count_x, grid_spacing_x, scale1)
+            label_extent = self.lod_label_extent(f"CH {right:.1f}m", 3 * scale1)
+            label_stride = line_stride * self.lod_stride(
+                math.ceil(count_x / line_stride), grid_spacing_x * line_stride, scale1, extent=label_extent
+            )
+
+            label_attribs = {"height": 3 * scale1, "style": "Arial", "halign": 1}
+            lines = {"main": [], "detail": []}
+            labels = {"main": [], "detail": []}
+            for i in range(count_x):
+                current_x = left + i * grid_spacing_x
+
+                target = self.lod_target(i % line_stride == 0)
+                if target is not None:
+                    # Main grid line
+                    lines[target].append(((current_x, datum - 50 * scale1), (current_x, toprl + 50 * scale1)))
 
-                # Add small tick marks for precise positioning
-                tick_length = 2 * scale1
-                msp.add_line((current_x, datum - tick_length), (current_x, datum + tick_length))
-                msp.add_line((current_x, toprl - tick_length), (current_x, toprl + tick_length))
+                    # Add small tick marks for precise positioning
+                    lines[target].append(((current_x, datum - tick_length), (current_x, datum + tick_length)))
+                    lines[target].append(((current_x, toprl - tick_length), (current_x, toprl + tick_length)))
 
-                current_x += grid_spacing_x
-                chainage_count += 1
+                # Add chainage annotation with professional formatting, unless it collides with placed text
+                label = (f"CH {current_x:.1f}m", (current_x, datum - 60 * scale1))
+                target = self.lod_target(i % label_stride == 0 and self.lod_label_clear(msp, *label, label_attribs))
+                if target is not None:
+                    labels[target].append(label)
+
+            self.emit_lod(msp, lines, labels, label_attribs)
 
             # Draw horizontal grid lines (levels) with professional annotations
-            current_y = datum
-            level_count = 0
             max_levels = 20  # Prevent excessive grid lines
-
-            while current_y <= toprl and level_count < max_levels:
-                # Main grid line
-                msp.add_line((left - 50 * scale1, current_y), (right + 50 * scale1, current_y))
-
-                # Add level annotation with professional formatting
-                level_text = f"RL {current_y:.3f}m"
-                msp.add_text(
-                    level_text,
-                    dxfattribs={
-                        "height": 3 * scale1,
-                        "style": "Arial",
-                        "insert": (left - 60 * scale1, current_y),
-                        "valign": 1,
-                    },
+            count_y = 0
+            if toprl >= datum:
+                count_y = (
+                    max_levels if grid_spacing_y <= 0 else min(max_levels, int((toprl - datum) // grid_spacing_y) + 1)
                 )
+            line_stride = self.lod_stride(count_y, grid_spacing_y, scale1)
+            label_stride = line_stride * self.lod_stride(
+                math.ceil(count_y / line_stride), grid_spacing_y * line_stride, scale1, extent=3 * scale1
+            )
+
+            label_attribs = {"height": 3 * scale1, "style": "Arial", "valign": 1}
+            lines = {"main": [], "detail": []}
+            labels = {"main": [], "detail": []}
+            for i in range(count_y):
+                current_y = datum + i * grid_spacing_y
+
+                target = self.lod_target(i % line_stride == 0)
+                if target is not None:
+                    # Main grid line
+                    lines[target].append(((left - 50 * scale1, current_y), (right + 50 * scale1, current_y)))
 
-                # Add small tick marks for precise positioning
-                tick_length = 2 * scale1
-                msp.add_line((left - tick_length, current_y), (left + tick_length, current_y))
-                msp.add_line((right - tick_length, current_y), (right + tick_length, current_y))
+                    # Add small tick marks for precise positioning
+                    lines[target].append(((left - tick_length, current_y), (left + tick_length, current_y)))
+                    lines[target].append(((right - tick_length, current_y), (right + tick_length, current_y)))
 
-                current_y += grid_spacing_y
-                level_count += 1
+                # Add level annotation with professional formatting, unless it collides with placed text
+                label = (f"RL {current_y:.3f}m", (left - 60 * scale1, current_y))
+                target = self.lod_target(i % label_stride == 0 and self.lod_label_clear(msp, *label, label_attribs))
+                if target is not None:
+                    labels[target].append(label)
+
+            self.emit_lod(msp, lines, labels, label_attribs)
 
             # Draw coordinate system labels with professional styling
             msp.add_text(
@@ -1930,110 +2560,153 @@ class BridgeProcessor:
             self.logger.error(f"Advanced layout grid error: {str(e)}")
 
     def generate_svg_preview(self, variables):
-        """Generate SVG preview of the bridge design"""
+        """Generate SVG preview of the bridge design from the same geometry that goes into the DXF"""
+        # The drawing stages were already reported for the DXF
+        progress, self.progress = self.progress, None
         try:
-            # SVG dimensions
-            width = 800
-            height = 600
-
-            # Scale factors for display
-            display_scale = 2
-
-            # Get key variables
-            left = variables.get("left", 0)
-            lbridge = variables.get("lbridge", 100)
-            datum = variables.get("datum", 0)
-            toprl = variables.get("toprl", 100)
-            sofl = variables.get("sofl", 95)
-            ccbr = variables.get("ccbr", 20)
-
-            # Calculate display coordinates
-            bridge_width = lbridge * display_scale
-            bridge_height = (toprl - datum) * display_scale
-
-            # Center the bridge in the SVG
-            offset_x = (width - bridge_width) / 2
-            offset_y = (height - bridge_height) / 2 - 100
-
-            svg_content = f"""
-            <svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">
-                <defs>
-                    <style>
-                        .bridge-outline {{ fill: none; stroke: #007bff; stroke-width: 2; }}
-                        .abutment {{ fill: none; stroke: #28a745; stroke-width: 2; }}
-                        .pier {{ fill: none; stroke: #dc3545; stroke-width: 2; }}
-                        .text {{ font-family: Arial, sans-serif; font-size: 12px; fill: #333; }}
-                        .grid {{ stroke: #e0e0e0; stroke-width: 0.5; }}
-                    </style>
-                </defs>
-                
-                <!-- Grid -->
-                <defs>
-                    <pattern id="grid" width="50" height="50" patternUnits="userSpaceOnUse">
-                        <path d="M 50 0 L 0 0 0 50" fill="none" class="grid"/>
-                    </pattern>
-                </defs>
-                <rect width="100%" height="100%" fill="url(#grid)" />
-                
-                <!-- Bridge elevation -->
-                <g transform="translate({offset_x}, {offset_y})">
-                    <!-- Main bridge deck -->
-                    <rect x="0" y="{(toprl - sofl) * display_scale}" 
-                          width="{bridge_width}" height="{(toprl - sofl) * display_scale}" 
-                          class="bridge-outline"/>
-                    
-                    <!-- Abutments -->
-                    <rect x="-20" y="0" width="20" height="{bridge_height}" class="abutment"/>
-                    <rect x="{bridge_width}" y="0" width="20" height="{bridge_height}" class="abutment"/>
-            """
-
-            # Add piers if multiple spans
-            nspan = int(variables.get("nspan", 1))
-            if nspan > 1:
-                span_width = bridge_width / nspan
-                for i in range(1, nspan):
-                    pier_x = i * span_width
-                    svg_content += f"""
-                    <rect x="{pier_x - 5}" y="0" width="10" height="{bridge_height}" class="pier"/>
-                    """
-
-            # Add dimensions and labels
-            svg_content += f"""
-                    <!-- Labels -->
-                    <text x="{bridge_width/2}" y="-10" text-anchor="middle" class="text">
-                        Bridge Length: {lbridge:.1f}m
-                    </text>
-                    <text x="-50" y="{bridge_height/2}" text-anchor="middle" class="text" 
-                          transform="rotate(-90, -50, {bridge_height/2})">
-                        Height: {toprl - datum:.1f}m
-                    </text>
-                </g>
-                
-                <!-- Plan view -->
-                <g transform="translate({offset_x}, {height - 150})">
-                    <text x="{bridge_width/2}" y="-10" text-anchor="middle" class="text">Plan View</text>
-                    <rect x="0" y="0" width="{bridge_width}" height="{ccbr * display_scale}" 
-                          class="bridge-outline"/>
-                    <text x="{bridge_width/2}" y="{ccbr * display_scale + 20}" text-anchor="middle" class="text">
-                        Width: {ccbr:.1f}m
-                    </text>
-                </g>
-                
-                <!-- Legend -->
-                <g transform="translate(20, 20)">
-                    <text x="0" y="0" class="text" style="font-weight: bold;">Legend:</text>
-                    <line x1="0" y1="15" x2="20" y2="15" class="bridge-outline"/>
-                    <text x="25" y="20" class="text">Bridge Deck</text>
-                    <line x1="0" y1="35" x2="20" y2="35" class="abutment"/>
-                    <text x="25" y="40" class="text">Abutments</text>
-                    <line x1="0" y1="55" x2="20" y2="55" class="pier"/>
-                    <text x="25" y="60" class="text">Piers</text>
-                </g>
-            </svg>
-            """
-
-            return svg_content
+            emitter = self.draw_geometry(variables)
+            if emitter.dedupe:
+                emitter.deduplicate()
+            return self.render_svg(emitter)
 
         except Exception as e:
             self.logger.error(f"SVG generation error: {str(e)}")
             return f'<svg width="400" height="200"><text x="20" y="100">Error generating preview: {str(e)}</text></svg>'
+        finally:
+            self.progress = progress
+
+    def render_previews(self, emitter, preview_format="svg"):
+        """Previews of deduplicated emitter geometry: `svg_content` and `geometry` (JSON)"""
+        return {
+            "svg_content": self.render_svg(emitter) if preview_format == "svg" else None,
+            "geometry": self.render_geometry_json(emitter) if preview_format == "json" else None,
+        }
+
+    def save_thumbnail(self, key, emitter, size):
+        """Rasterize the visible emitter geometry into a PNG stored next to the artifact of `key`; returns the filename"""
+        png = thumbnail_png(self.thumbnail_segments(emitter), emitter.extents(), size)
+        return self.artifact_store.save_file(key, ".png", png) if png is not None else None
+
+    def save_geometry(self, key, geometry):
+        """Store JSON geometry next to the artifact of `key`, to rebuild its tiled preview from; returns the filename"""
+        return self.artifact_store.save_file(key, GEOMETRY_EXT, encode_geometry(geometry))
+
+    def thumbnail_segments(self, emitter):
+        """Return the visible line and polyline geometry of an emitter as an (n, 4) segment array"""
+        hidden = {self.lod_full_resolution_layer, self.lod_full_terrain_layer}
+        visible = [t.get("layer", "0") not in hidden for t in emitter.templates]
+        segments = [line[:4] for line in emitter.lines if visible[line[4]]]
+        for points, close, template_id in emitter.polylines:
+            if visible[template_id]:
+                ring = list(points) + [points[0]] if close else points
+                segments.extend(a + b for a, b in zip(ring[:-1], ring[1:]))
+        return np.asarray(segments, dtype=float).reshape(-1, 4)
+
+    def render_geometry_json(self, emitter):
+        """Return buffered emitter geometry as a JSON-serializable dict grouped by layer"""
+        layers = {}
+
+        def layer_of(template_id):
+            name = emitter.templates[template_id].get("layer", "0")
+            return layers.setdefault(name, {"lines": [], "polylines": [], "texts": []})
+
+        for x1, y1, x2, y2, template_id in emitter.lines:
+            layer_of(template_id)["lines"].append([x1, y1, x2, y2])
+        for points, close, template_id in emitter.polylines:
+            layer_of(template_id)["polylines"].append({"points": [list(p) for p in points], "closed": bool(close)})
+        for text, x, y, template_id in emitter.texts:
+            attribs = emitter.templates[template_id]
+            layer_of(template_id)["texts"].append(
+                {
+                    "text": text,
+                    "x": x,
+                    "y": y,
+                    "height": attribs.get("height", 2.5),
+                    "rotation": attribs.get("rotation", 0),
+                    "halign": attribs.get("halign", 0),
+                    "valign": attribs.get("valign", 0),
+                }
+            )
+
+        extents = emitter.extents()
+        return {
+            "extents": [list(corner) for corner in extents] if extents else None,
+            "layers": layers,
+            # Layers that are off in the DXF
+            "hidden_layers": [self.lod_full_resolution_layer, self.lod_full_terrain_layer],
+        }
+
+    def render_svg(self, emitter, width=800, height=600):
+        """Render buffered emitter geometry as compact SVG.
+
+        Coordinates are quantized to integers on a grid of `svg_resolution` steps
+        across the drawing, lines and polylines of a layer are joined into one
+        `<path>`, and texts are grouped per layer. Layers that are off in the DXF
+        are left out. The document is assembled from a list of parts and joined once.
+        """
+        extents = emitter.extents()
+        if extents is None:
+            return f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg"></svg>'
+        (min_x, min_y), (max_x, max_y) = extents
+        step = max(max_x - min_x, max_y - min_y, self.cleanup_eps) / self.svg_resolution
+        view_w = math.ceil((max_x - min_x) / step)
+        view_h = math.ceil((max_y - min_y) / step)
+        hidden = {self.lod_full_resolution_layer, self.lod_full_terrain_layer}
+        layers = [t.get("layer", "0") for t in emitter.templates]
+
+        paths = {}
+        if emitter.lines:
+            coords = np.array([line[:4] for line in emitter.lines], dtype=float)
+            coords[:, [0, 2]] = np.rint((coords[:, [0, 2]] - min_x) / step)
+            coords[:, [1, 3]] = np.rint((max_y - coords[:, [1, 3]]) / step)
+            coords = coords.astype(np.int64).tolist()
+            for (x1, y1, x2, y2), line in zip(coords, emitter.lines):
+                if x1 != x2 or y1 != y2:
+                    paths.setdefault(layers[line[4]], []).append(f"M{x1} {y1}L{x2} {y2}")
+        for points, close, template_id in emitter.polylines:
+            pts = np.asarray(points, dtype=float)
+            qx = np.rint((pts[:, 0] - min_x) / step).astype(np.int64).tolist()
+            qy = np.rint((max_y - pts[:, 1]) / step).astype(np.int64).tolist()
+            vertices = " ".join(f"{x} {y}" for x, y in zip(qx[1:], qy[1:]))
+            paths.setdefault(layers[template_id], []).append(f"M{qx[0]} {qy[0]}L{vertices}{'Z' if close else ''}")
+
+        texts = {}
+        for text, x, y, template_id in emitter.texts:
+            attribs = emitter.templates[template_id]
+            qx = round((x - min_x) / step)
+            qy = round((max_y - y) / step)
+            size = max(1, round(attribs.get("height", 2.5) / step))
+            halign = attribs.get("halign", 0)
+            anchor = {1: "middle", 2: "end", 4: "middle"}.get(halign, "start")
+            # DXF vertical alignment: 0 baseline, 1 bottom, 2 middle, 3 top; halign 4 (MIDDLE) also centres vertically
+            valign = 2 if halign == 4 else attribs.get("valign", 0)
+            baseline = {1: "text-after-edge", 2: "central", 3: "text-before-edge"}.get(valign)
+            baseline = f' dominant-baseline="{baseline}"' if baseline else ""
+            rotation = attribs.get("rotation", 0)
+            transform = f' transform="rotate({-rotation:g} {qx} {qy})"' if rotation else ""
+            texts.setdefault(layers[template_id], []).append(
+                f'<text x="{qx}" y="{qy}" font-size="{size}" text-anchor="{anchor}"{baseline}{transform}>'
+                f"{html.escape(text)}</text>"
+            )
+
+        out = []
+        write = out.append
+        write(
+            f'<svg width="{width}" height="{height}" viewBox="0 0 {view_w} {view_h}" '
+            f'xmlns="http://www.w3.org/2000/svg">'
+        )
+        write('<g fill="none" stroke="#007bff" stroke-width="1" vector-effect="non-scaling-stroke">')
+        for layer, parts in paths.items():
+            if layer not in hidden:
+                write(f'<path class="layer-{html.escape(layer)}" d="')
+                write("".join(parts))
+                write('" vector-effect="non-scaling-stroke"/>')
+        write("</g>")
+        write('<g font-family="Arial, sans-serif" fill="#333">')
+        for layer, parts in texts.items():
+            if layer not in hidden:
+                write(f'<g class="layer-{html.escape(layer)}">')
+                write("".join(parts))
+                write("</g>")
+        write("</g></svg>")
+        return "".join(out)
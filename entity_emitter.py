@@ -0,0 +1,320 @@
+import logging
+import numpy as np
+from ezdxf.entities import factory
+from ezdxf.math import Vec3
+from geometry_index import text_bbox
+
+
+class EntityEmitter:
+    """Buffers drawing primitives and inserts them into a modelspace in one batch.
+
+    The emitter offers the subset of the ezdxf modelspace API the drawing
+    routines use (`add_line`, `add_lwpolyline`, `add_text`) so it can be passed
+    wherever `msp` is expected, plus bulk variants that take arrays of geometry
+    sharing one attribute template. Each distinct template is validated once by
+    ezdxf into a prototype entity; per-entity work is then reduced to copying
+    the prototype and setting the geometry.
+
+    Degenerate geometry (zero-length lines, polylines with fewer than two
+    vertices or a near-zero extent) is rejected before it is buffered, using
+    the same `eps` tolerance as the modelspace cleanup pass; the counts are
+    kept in `rejected` under the cleanup stats keys.
+
+    On flush, lines and polylines sharing a template are deduplicated on
+    endpoints quantized to `quantum`, and collinear overlapping lines are
+    merged into one segment.
+
+    Running bounding boxes, overall and per view (see `set_view`), are kept as
+    primitives are added, so drawing extents are available in O(1) without
+    touching the modelspace. When a `GeometryIndex` is given, every accepted
+    primitive's box is also inserted into it for overlap queries.
+    """
+
+    def __init__(self, msp=None, eps=1e-6, quantum=1e-4, dedupe=True, index=None):
+        self.logger = logging.getLogger(__name__)
+        self.msp = msp
+        self.index = index
+        self.view = None
+        self.bounds = None  # (min_x, min_y, max_x, max_y) of everything added
+        self.view_bounds = {}  # view name -> (min_x, min_y, max_x, max_y)
+        self.eps = eps
+        self.quantum = quantum
+        self.dedupe = dedupe
+        self.rejected = {
+            "lines_removed": 0,
+            "polylines_removed": 0,
+            "circles_removed": 0,
+            "arcs_removed": 0,
+            "points_removed": 0,
+            "duplicates_removed": 0,
+            "segments_merged": 0,
+        }
+        self.lines = []  # (x1, y1, x2, y2, template_id)
+        self.polylines = []  # (points, close, template_id)
+        self.texts = []  # (text, x, y, template_id)
+        self.templates = []  # dxfattribs dicts, indexed by template_id
+        self._template_ids = {}
+
+    def __len__(self):
+        return len(self.lines) + len(self.polylines) + len(self.texts)
+
+    # ===== ATTRIBUTE TEMPLATES =====
+
+    def template(self, dxfattribs=None):
+        """Return the id of the shared template for `dxfattribs` (geometry keys excluded)"""
+        attribs = {k: v for k, v in (dxfattribs or {}).items() if k != "insert"}
+        key = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in attribs.items()))
+        template_id = self._template_ids.get(key)
+        if template_id is None:
+            template_id = len(self.templates)
+            self.templates.append(attribs)
+            self._template_ids[key] = template_id
+        return template_id
+
+    # ===== DEGENERACY FILTER =====
+
+    def _keep_line(self, x1, y1, x2, y2):
+        dx = x1 - x2
+        dy = y1 - y2
+        if dx * dx + dy * dy <= self.eps * self.eps:
+            self.rejected["lines_removed"] += 1
+            return False
+        return True
+
+    def _keep_polyline(self, pts):
+        if len(pts) >= 2:
+            xs = [p[0] for p in pts]
+            ys = [p[1] for p in pts]
+            if (max(xs) - min(xs)) ** 2 + (max(ys) - min(ys)) ** 2 > self.eps * self.eps:
+                return True
+        self.rejected["polylines_removed"] += 1
+        return False
+
+    # ===== EXTENTS AND SPATIAL INDEX =====
+
+    def set_view(self, name):
+        """Attribute subsequently added geometry to view `name` (e.g. "elevation", "plan")"""
+        self.view = name
+
+    def extents(self, view=None):
+        """((min_x, min_y), (max_x, max_y)) of everything added, or of one view; None if empty"""
+        bounds = self.bounds if view is None else self.view_bounds.get(view)
+        if bounds is None:
+            return None
+        return (bounds[0], bounds[1]), (bounds[2], bounds[3])
+
+    def _track(self, x0, y0, x1, y1, kind):
+        """Grow the overall and current view bounds by a primitive's box and index it"""
+        b = self.bounds
+        self.bounds = (x0, y0, x1, y1) if b is None else (min(b[0], x0), min(b[1], y0), max(b[2], x1), max(b[3], y1))
+        b = self.view_bounds.get(self.view)
+        self.view_bounds[self.view] = (
+            (x0, y0, x1, y1) if b is None else (min(b[0], x0), min(b[1], y0), max(b[2], x1), max(b[3], y1))
+        )
+        if self.index is not None:
+            self.index.insert((x0, y0, x1, y1), kind)
+
+    def _track_polyline(self, pts):
+        xs = [p[0] for p in pts]
+        ys = [p[1] for p in pts]
+        self._track(min(xs), min(ys), max(xs), max(ys), "LWPOLYLINE")
+
+    def _track_text(self, text, x, y, template_id):
+        attribs = self.templates[template_id]
+        bbox = text_bbox(
+            text,
+            x,
+            y,
+            attribs.get("height", 2.5),
+            attribs.get("rotation", 0.0),
+            attribs.get("halign", 0),
+            attribs.get("valign", 0),
+        )
+        self._track(*bbox, "TEXT")
+
+    # ===== MODELSPACE-COMPATIBLE API =====
+
+    def add_line(self, start, end, dxfattribs=None):
+        x1, y1, x2, y2 = float(start[0]), float(start[1]), float(end[0]), float(end[1])
+        if self._keep_line(x1, y1, x2, y2):
+            self.lines.append((x1, y1, x2, y2, self.template(dxfattribs)))
+            self._track(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2), "LINE")
+
+    def add_lwpolyline(self, points, format="xy", close=False, dxfattribs=None):
+        pts = [(float(p[0]), float(p[1])) for p in points]
+        if self._keep_polyline(pts):
+            self.polylines.append((pts, close, self.template(dxfattribs)))
+            self._track_polyline(pts)
+
+    def add_text(self, text, dxfattribs=None):
+        dxfattribs = dxfattribs or {}
+        insert = dxfattribs.get("insert", (0, 0))
+        text, x, y, template_id = str(text), float(insert[0]), float(insert[1]), self.template(dxfattribs)
+        self.texts.append((text, x, y, template_id))
+        self._track_text(text, x, y, template_id)
+
+    # ===== BULK API =====
+
+    def add_lines(self, segments, dxfattribs=None):
+        """Add many lines given as ((x1, y1), (x2, y2)) pairs or rows of x1, y1, x2, y2"""
+        template_id = self.template(dxfattribs)
+        append = self.lines.append
+        keep = self._keep_line
+        track = self._track
+        for seg in segments:
+            if len(seg) == 2:
+                (x1, y1), (x2, y2) = seg[0][:2], seg[1][:2]
+            else:
+                x1, y1, x2, y2 = seg[:4]
+            x1, y1, x2, y2 = float(x1), float(y1), float(x2), float(y2)
+            if keep(x1, y1, x2, y2):
+                append((x1, y1, x2, y2, template_id))
+                track(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2), "LINE")
+
+    def add_polylines(self, polylines, dxfattribs=None, close=False):
+        """Add many polylines, each given as a sequence of (x, y) vertices"""
+        template_id = self.template(dxfattribs)
+        for points in polylines:
+            pts = [(float(p[0]), float(p[1])) for p in points]
+            if self._keep_polyline(pts):
+                self.polylines.append((pts, close, template_id))
+                self._track_polyline(pts)
+
+    def add_texts(self, texts, dxfattribs=None):
+        """Add many texts given as (text, (x, y)) pairs"""
+        template_id = self.template(dxfattribs)
+        append = self.texts.append
+        for text, insert in texts:
+            text, x, y = str(text), float(insert[0]), float(insert[1])
+            append((text, x, y, template_id))
+            self._track_text(text, x, y, template_id)
+
+    # ===== DEDUPLICATION =====
+
+    def deduplicate(self):
+        """Drop duplicate lines/polylines and merge collinear overlapping lines in the buffer"""
+        q = self.quantum
+        if len(self.polylines) > 1:
+            seen = set()
+            unique = []
+            for points, close, template_id in self.polylines:
+                forward = tuple((round(x / q), round(y / q)) for x, y in points)
+                key = (template_id, close, min(forward, forward[::-1]))
+                if key in seen:
+                    self.rejected["duplicates_removed"] += 1
+                    continue
+                seen.add(key)
+                unique.append((points, close, template_id))
+            self.polylines = unique
+
+        if len(self.lines) < 2:
+            return
+        coords = np.array([line[:4] for line in self.lines], dtype=float)
+        template_ids = np.array([line[4] for line in self.lines], dtype=np.int64)
+
+        # Orient every segment so its first endpoint is the lexicographically smaller one
+        swap = (coords[:, 0] > coords[:, 2]) | ((coords[:, 0] == coords[:, 2]) & (coords[:, 1] > coords[:, 3]))
+        coords[swap] = coords[swap][:, [2, 3, 0, 1]]
+
+        # Exact duplicates: identical quantized endpoints and template
+        keys = np.column_stack([np.round(coords / q).astype(np.int64), template_ids])
+        _, first = np.unique(keys, axis=0, return_index=True)
+        first.sort()
+        self.rejected["duplicates_removed"] += len(coords) - len(first)
+        coords = coords[first]
+        template_ids = template_ids[first]
+
+        # Collinear groups: same template, quantized direction and offset from the origin
+        delta = coords[:, 2:] - coords[:, :2]
+        unit = delta / np.hypot(delta[:, 0], delta[:, 1])[:, None]
+        offset = unit[:, 0] * coords[:, 1] - unit[:, 1] * coords[:, 0]
+        group_keys = np.column_stack(
+            [template_ids, np.round(unit / (q * 1e-2)).astype(np.int64), np.round(offset / q).astype(np.int64)]
+        )
+        _, groups, group_sizes = np.unique(group_keys, axis=0, return_inverse=True, return_counts=True)
+        groups = groups.ravel()
+        t0 = np.einsum("ij,ij->i", coords[:, :2], unit)
+        t1 = np.einsum("ij,ij->i", coords[:, 2:], unit)
+
+        keep = np.ones(len(coords), dtype=bool)
+        for group in np.flatnonzero(group_sizes > 1):
+            members = np.flatnonzero(groups == group)
+            members = members[np.argsort(t0[members], kind="stable")]
+            current = members[0]
+            for index in members[1:]:
+                if t0[index] < t1[current] - q:
+                    # Overlaps the running segment: extend it with the original endpoint
+                    if t1[index] > t1[current]:
+                        coords[current, 2:] = coords[index, 2:]
+                        t1[current] = t1[index]
+                    keep[index] = False
+                    self.rejected["segments_merged"] += 1
+                else:
+                    current = index
+
+        self.lines = [
+            (x1, y1, x2, y2, int(template_id))
+            for (x1, y1, x2, y2), template_id in zip(coords[keep].tolist(), template_ids[keep].tolist())
+        ]
+
+    # ===== BATCH INSERTION =====
+
+    def _prototypes(self, dxftype, doc, template_ids):
+        """Validate the templates used by `dxftype` once and return a prototype entity per template"""
+        prototypes = {}
+        for template_id in template_ids:
+            try:
+                prototypes[template_id] = factory.new(dxftype, dxfattribs=self.templates[template_id], doc=doc)
+            except Exception as e:
+                self.logger.error(f"Invalid {dxftype} attributes {self.templates[template_id]}: {str(e)}")
+        return prototypes
+
+    def flush(self):
+        """Insert all buffered entities into the modelspace and clear the buffer"""
+        if self.msp is None:
+            return 0
+        if self.dedupe:
+            self.deduplicate()
+        msp = self.msp
+        doc = msp.doc
+        add_entity = msp.add_entity
+        count = 0
+
+        if self.lines:
+            prototypes = self._prototypes("LINE", doc, {line[4] for line in self.lines})
+            for x1, y1, x2, y2, template_id in self.lines:
+                if template_id not in prototypes:
+                    continue
+                entity = prototypes[template_id].copy()
+                entity.dxf.unprotected_set("start", Vec3(x1, y1, 0))
+                entity.dxf.unprotected_set("end", Vec3(x2, y2, 0))
+                add_entity(entity)
+                count += 1
+
+        if self.polylines:
+            prototypes = self._prototypes("LWPOLYLINE", doc, {pl[2] for pl in self.polylines})
+            for points, close, template_id in self.polylines:
+                if template_id not in prototypes:
+                    continue
+                entity = prototypes[template_id].copy()
+                entity.set_points(points, format="xy")
+                entity.closed = close
+                add_entity(entity)
+                count += 1
+
+        if self.texts:
+            prototypes = self._prototypes("TEXT", doc, {t[3] for t in self.texts})
+            for text, x, y, template_id in self.texts:
+                if template_id not in prototypes:
+                    continue
+                entity = prototypes[template_id].copy()
+                entity.dxf.unprotected_set("text", text)
+                entity.dxf.unprotected_set("insert", Vec3(x, y, 0))
+                add_entity(entity)
+                count += 1
+
+        self.lines = []
+        self.polylines = []
+        self.texts = []
+        self.logger.debug(f"Emitted {count} entities with {len(self.templates)} attribute templates")
+        return count
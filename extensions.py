@@ -0,0 +1,10 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import DeclarativeBase
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+# Shared by app.py and models.py, so models never import the app module (which may be running as __main__)
+db = SQLAlchemy(model_class=Base)
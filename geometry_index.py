@@ -0,0 +1,104 @@
+import math
+from collections import defaultdict
+
+
+def text_bbox(text, x, y, height=2.5, rotation=0.0, halign=0, valign=0, char_width=0.6):
+    """Approximate the bounding box of a TEXT entity from its insert point and alignment"""
+    width = len(text) * height * char_width
+    dx = -width * {1: 0.5, 2: 1.0, 4: 0.5}.get(halign, 0.0)
+    dy = -height * {2: 0.5, 3: 1.0}.get(valign, 0.0)
+    corners = [(dx, dy), (dx + width, dy), (dx, dy + height), (dx + width, dy + height)]
+    if rotation:
+        angle = math.radians(rotation)
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+        corners = [(cx * cos_a - cy * sin_a, cx * sin_a + cy * cos_a) for cx, cy in corners]
+    xs = [x + cx for cx, _ in corners]
+    ys = [y + cy for _, cy in corners]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+class GeometryIndex:
+    """Uniform-grid spatial index over emitted geometry.
+
+    Items are (min_x, min_y, max_x, max_y) boxes tagged with a kind (e.g. "LINE",
+    "TEXT") and are bucketed into square cells of `cell_size` as they are
+    inserted. Items spanning more than `max_cells` cells (grid lines, borders)
+    are kept in a separate list that every query scans. The drawing extents are
+    kept by the EntityEmitter feeding the index, not here.
+    """
+
+    def __init__(self, cell_size=100.0, max_cells=64):
+        self.cell_size = float(cell_size)
+        self.max_cells = max_cells
+        self.boxes = []
+        self.kinds = []
+        self.cells = defaultdict(list)
+        self.large = []
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _cell_range(self, bbox):
+        size = self.cell_size
+        return (
+            math.floor(bbox[0] / size),
+            math.floor(bbox[1] / size),
+            math.floor(bbox[2] / size),
+            math.floor(bbox[3] / size),
+        )
+
+    def insert(self, bbox, kind=None):
+        """Add an item and return its id"""
+        item = len(self.boxes)
+        self.boxes.append(bbox)
+        self.kinds.append(kind)
+
+        cx0, cy0, cx1, cy1 = self._cell_range(bbox)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.max_cells:
+            self.large.append(item)
+        else:
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self.cells[(cx, cy)].append(item)
+        return item
+
+    def _candidates(self, bbox):
+        cx0, cy0, cx1, cy1 = self._cell_range(bbox)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            # Query larger than the occupied area: walk the occupied cells instead
+            found = {
+                i for (cx, cy), items in self.cells.items() if cx0 <= cx <= cx1 and cy0 <= cy <= cy1 for i in items
+            }
+        else:
+            found = set()
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    found.update(self.cells.get((cx, cy), ()))
+        found.update(self.large)
+        return found
+
+    def query(self, bbox, kind=None):
+        """Return the ids of items whose boxes overlap `bbox`, optionally of one kind"""
+        x0, y0, x1, y1 = bbox
+        result = []
+        for item in sorted(self._candidates(bbox)):
+            if kind is not None and self.kinds[item] != kind:
+                continue
+            b = self.boxes[item]
+            if b[0] <= x1 and b[2] >= x0 and b[1] <= y1 and b[3] >= y0:
+                result.append(item)
+        return result
+
+    def intersects(self, bbox, kind=None):
+        """True if any item (of `kind`) overlaps `bbox`"""
+        return bool(self.query(bbox, kind))
+
+    def near(self, x, y, radius, kind=None):
+        """Return the ids of items (of `kind`) whose boxes come within `radius` of the point (x, y), nearest first"""
+        found = []
+        for item in self.query((x - radius, y - radius, x + radius, y + radius), kind):
+            x0, y0, x1, y1 = self.boxes[item]
+            distance = math.hypot(max(x0 - x, 0.0, x - x1), max(y0 - y, 0.0, y - y1))
+            if distance <= radius:
+                found.append((distance, item))
+        return [item for _, item in sorted(found)]
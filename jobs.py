@@ -0,0 +1,137 @@
+import time
+import uuid
+import logging
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, BrokenExecutor
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its admission limit"""
+
+
+class JobQueue:
+    """Runs submitted work on a bounded local worker pool and tracks it by job ID.
+
+    Each job is a dict with its status ("queued", "running", "done" or
+    "failed"), submit/start/finish timestamps, and the result or error. Only
+    the most recent `max_jobs` jobs are kept.
+
+    With an `executor` (e.g. a process pool), job functions run there and the
+    queue's `max_workers` threads only dispatch and track them; functions must
+    then be picklable. When `max_queued` jobs are already waiting, `submit`
+    raises QueueFull instead of accepting more work. Progress reported with
+    `record_stage` is kept on the job as its list of `stages`. When the
+    executor turns out broken (e.g. a worker process was killed), the job
+    fails and `on_broken(executor)` is called, e.g. to replace `pool`.
+    """
+
+    def __init__(self, max_workers=2, max_jobs=500, executor=None, max_queued=None):
+        self.logger = logging.getLogger(__name__)
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.max_queued = max_queued
+        self.pool = executor
+        self.on_broken = None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, on_done=None, info=None, pass_job_id=False, **kwargs):
+        """Queue `fn(*args, **kwargs)` and return the new job ID.
+
+        `info` is kept on the job for display (e.g. the uploaded filename) and
+        `on_done(job)` is called in the worker once the job has finished and its
+        status is set (check `job["error"]`). With
+        `pass_job_id`, `fn` also gets the ID as `job_id` to report progress under.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "result": None,
+            "error": None,
+            "info": dict(info or {}),
+            "stages": [],
+        }
+        if pass_job_id:
+            kwargs["job_id"] = job_id
+        with self.lock:
+            if self.max_queued is not None:
+                queued = sum(1 for j in self.jobs.values() if j["status"] == "queued")
+                if queued >= self.max_queued:
+                    raise QueueFull(f"{queued} jobs are already waiting")
+            self.jobs[job_id] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+        self.executor.submit(self._run, job, fn, args, kwargs, on_done)
+        return job_id
+
+    def _run(self, job, fn, args, kwargs, on_done):
+        job["started"] = time.time()
+        job["status"] = "running"
+        pool = self.pool
+        try:
+            if pool is not None:
+                job["result"] = pool.submit(fn, *args, **kwargs).result()
+            else:
+                job["result"] = fn(*args, **kwargs)
+            status = "done"
+        except Exception as e:
+            self.logger.error(f"Job {job['id']} failed: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            job["error"] = str(e)
+            status = "failed"
+            if isinstance(e, BrokenExecutor) and self.on_broken is not None:
+                self.on_broken(pool)
+        job["finished"] = time.time()
+        job["status"] = status
+        if on_done is not None:
+            try:
+                on_done(job)
+            except Exception as e:
+                self.logger.error(f"Job {job['id']} completion error: {str(e)}")
+
+    def record_stage(self, job_id, info):
+        """Append a progress record (e.g. a finished pipeline stage) to a job; unknown IDs are ignored"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job["stages"].append(info)
+
+    def get(self, job_id):
+        """Return the job record, or None for unknown (or expired) IDs"""
+        return self.jobs.get(job_id)
+
+    @staticmethod
+    def timings(job):
+        """Seconds spent waiting in the queue and running, so far"""
+        now = time.time()
+        started = job["started"] or now
+        return {
+            "queued": round(started - job["submitted"], 3),
+            "running": round((job["finished"] or now) - started, 3) if job["started"] else 0.0,
+        }
+
+    def stats(self):
+        """Queue depth, running count and average timings of finished jobs"""
+        with self.lock:
+            jobs = list(self.jobs.values())
+        finished = [j for j in jobs if j["finished"]]
+        return {
+            "workers": self.max_workers,
+            "max_queued": self.max_queued,
+            "queue_depth": sum(1 for j in jobs if j["status"] == "queued"),
+            "running": sum(1 for j in jobs if j["status"] == "running"),
+            "done": sum(1 for j in jobs if j["status"] == "done"),
+            "failed": sum(1 for j in jobs if j["status"] == "failed"),
+            "avg_queued": (
+                round(sum(j["started"] - j["submitted"] for j in finished) / len(finished), 3) if finished else 0.0
+            ),
+            "avg_running": (
+                round(sum(j["finished"] - j["started"] for j in finished) / len(finished), 3) if finished else 0.0
+            ),
+        }
@@ -1,25 +1,107 @@
-from app import db
+import json
+import logging
+import hashlib
+from extensions import db
 from datetime import datetime
+from sqlalchemy.schema import CreateColumn
 
 
 class BridgeDesign(db.Model):
+    # History is paged by (upload_time, id); status lookups are usually also ordered by upload time
+    __table_args__ = (
+        db.Index("ix_bridge_design_upload_time_id", "upload_time", "id"),
+        db.Index("ix_bridge_design_status_upload_time", "status", "upload_time"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     upload_time = db.Column(db.DateTime, default=datetime.utcnow)
-    parameters = db.Column(db.Text)  # JSON string of parameters
+    parameters = db.Column(db.Text)  # Packed JSON of the drawing variables, see set_parameters()
+    parameter_hash = db.Column(db.String(64), index=True)
     dxf_filename = db.Column(db.String(255))
     status = db.Column(db.String(50), default="processing")
     error_message = db.Column(db.Text)
 
+    # Processing job and stored artifacts of the design
+    job_id = db.Column(db.String(32), index=True)
+    project_name = db.Column(db.String(255), index=True)
+    upload_filename = db.Column(db.String(255))  # Uploaded workbook in the upload folder, named by its content hash
+    terrain = db.Column(db.Text)  # JSON [[chainage, RL], ...] of designs generated from parameters
+    design_key = db.Column(db.String(64), index=True)
+    svg_filename = db.Column(db.String(255))  # Preview SVG in the generated folder
+    thumbnail_filename = db.Column(db.String(255))
+    validation = db.Column(db.Text)  # JSON string of the validation result
+    cleanup = db.Column(db.Text)  # JSON string of cleanup statistics
+    timings = db.Column(db.Text)  # JSON string of queue/run seconds and per-stage durations
+    completed_time = db.Column(db.DateTime)
+    # Exempt from storage eviction; the server default lets the column be added to existing tables
+    pinned = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False, index=True)
+
+    # Variables promoted out of the packed parameters so history can be searched by them
+    nspan = db.Column(db.Integer, index=True)
+    skew = db.Column(db.Float, index=True)
+    lbridge = db.Column(db.Float, index=True)
+
+    @staticmethod
+    def pack_parameters(variables, names):
+        """Packed JSON of the named variables, keyed by lower-case name, plus the project name"""
+        values = {name.lower(): variables[name.lower()] for name in names if name.lower() in variables}
+        values["project_name"] = variables.get("project_name")
+        return json.dumps(values, sort_keys=True, separators=(",", ":"))
+
+    def set_parameters(self, variables, names):
+        """Store the design's variables as one packed JSON value with its hash, instead of a row per variable"""
+        self.parameters = self.pack_parameters(variables, names)
+        self.parameter_hash = hashlib.sha256(self.parameters.encode("utf-8")).hexdigest()
+        nspan = variables.get("nspan")
+        self.nspan = int(nspan) if nspan is not None else None
+        self.skew = variables.get("skew")
+        self.lbridge = variables.get("lbridge")
+
+    def load(self, column):
+        """Decode one of the JSON string columns, None when unset"""
+        value = getattr(self, column)
+        return json.loads(value) if value else None
+
     def __repr__(self):
         return f"<BridgeDesign {self.filename}>"
 
 
 class BridgeParameter(db.Model):
+    # Not written by the app, design variables are packed into BridgeDesign.parameters
     id = db.Column(db.Integer, primary_key=True)
     design_id = db.Column(db.Integer, db.ForeignKey("bridge_design.id"), nullable=False)
     variable_name = db.Column(db.String(100), nullable=False)
     value = db.Column(db.Float, nullable=False)
     description = db.Column(db.String(255))
 
-    design = db.relationship("BridgeDesign", backref=db.backref("parameters", lazy=True))
+    # Named apart from the BridgeDesign.parameters column, which a "parameters" backref would clash with
+    design = db.relationship("BridgeDesign", backref=db.backref("parameter_values", lazy=True))
+
+
+def upgrade_schema(engine=None):
+    """Add the columns and indexes missing from tables created by an older version.
+
+    db.create_all() only creates missing tables and never alters existing ones,
+    so databases from before a column was introduced are brought up to date here.
+    Returns the names of the added columns.
+    """
+    engine = engine or db.engine
+    inspector = db.inspect(engine)
+    added = []
+    with engine.begin() as connection:
+        for table in (BridgeDesign.__table__, BridgeParameter.__table__):
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+    if added:
+        logging.getLogger(__name__).info(f"Added columns: {', '.join(added)}")
+    return added
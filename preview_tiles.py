@@ -0,0 +1,181 @@
+import gzip
+import html
+import json
+from geometry_index import GeometryIndex, text_bbox
+
+# Stored next to a design's artifact so its tile source can be rebuilt, e.g. after a restart
+GEOMETRY_EXT = ".geometry.json.gz"
+
+
+def encode_geometry(geometry):
+    """Compressed JSON of a geometry dict (see BridgeProcessor.render_geometry_json)"""
+    return gzip.compress(json.dumps(geometry, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+
+
+class PreviewTiles:
+    """Serves square SVG tiles of a drawing's geometry for a zoomable preview.
+
+    The geometry is the layer-grouped dict of `BridgeProcessor.render_geometry_json`;
+    its `hidden_layers` are left out. Tile (0, 0, 0) covers the square around
+    the drawing extents and every zoom level splits each tile into four.
+    Primitives are indexed once; a tile only visits the items its window
+    overlaps, clips lines to the window, drops items smaller than a pixel and
+    text too small to read at that zoom, and quantizes coordinates to whole pixels.
+    """
+
+    def __init__(self, geometry, tile_size=256, max_zoom=8, min_text_px=4):
+        self.tile_size = tile_size
+        self.max_zoom = max_zoom
+        self.min_text_px = min_text_px
+        self.refs = []  # (kind, primitive, layer), indexed like the spatial index items
+
+        extents = geometry.get("extents")
+        if extents is None:
+            self.origin = (0.0, 0.0)
+            self.side = 1.0
+        else:
+            (min_x, min_y), (max_x, max_y) = extents
+            self.side = max(max_x - min_x, max_y - min_y) or 1.0
+            self.origin = (min_x, max_y)  # top-left corner of tile (0, 0, 0)
+        self.index = GeometryIndex(cell_size=self.side / 64)
+
+        hidden = set(geometry.get("hidden_layers", ()))
+        for layer, items in geometry["layers"].items():
+            if layer in hidden:
+                continue
+            for x1, y1, x2, y2 in items["lines"]:
+                self._add((min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)), ("LINE", (x1, y1, x2, y2), layer))
+            for polyline in items["polylines"]:
+                points = [tuple(p) for p in polyline["points"]]
+                xs = [p[0] for p in points]
+                ys = [p[1] for p in points]
+                self._add((min(xs), min(ys), max(xs), max(ys)), ("LWPOLYLINE", (points, polyline["closed"]), layer))
+            for text in items["texts"]:
+                box = text_bbox(
+                    text["text"],
+                    text["x"],
+                    text["y"],
+                    text.get("height", 2.5),
+                    text.get("rotation", 0.0),
+                    text.get("halign", 0),
+                    text.get("valign", 0),
+                )
+                self._add(box, ("TEXT", text, layer))
+
+    @classmethod
+    def load(cls, path, **options):
+        """Build the tile source of a geometry file written with `encode_geometry`"""
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            return cls(json.load(fh), **options)
+
+    def _add(self, bbox, ref):
+        self.index.insert(bbox, ref[0])
+        self.refs.append(ref)
+
+    def tile_window(self, z, x, y):
+        """Model-space (min_x, min_y, max_x, max_y) covered by tile z/x/y"""
+        size = self.side / (1 << z)
+        left = self.origin[0] + x * size
+        top = self.origin[1] - y * size
+        return (left, top - size, left + size, top)
+
+    @staticmethod
+    def _clip(x1, y1, x2, y2, window):
+        """Liang-Barsky clipping of a segment to `window`; returns the clipped segment or None"""
+        x0, y0, xm, ym = window
+        dx, dy = x2 - x1, y2 - y1
+        t0, t1 = 0.0, 1.0
+        for p, q in ((-dx, x1 - x0), (dx, xm - x1), (-dy, y1 - y0), (dy, ym - y1)):
+            if p == 0:
+                if q < 0:
+                    return None
+                continue
+            t = q / p
+            if p < 0:
+                if t > t1:
+                    return None
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return None
+                t1 = min(t1, t)
+        return x1 + t0 * dx, y1 + t0 * dy, x1 + t1 * dx, y1 + t1 * dy
+
+    def render(self, z, x, y):
+        """Return the SVG for tile z/x/y, or None if the tile does not exist"""
+        if not (0 <= z <= self.max_zoom and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+            return None
+        window = self.tile_window(z, x, y)
+        pixel = (window[2] - window[0]) / self.tile_size
+
+        def px(vx, vy):
+            return round((vx - window[0]) / pixel), round((window[3] - vy) / pixel)
+
+        paths = {}
+        texts = {}
+        for item in self.index.query(window):
+            kind, primitive, layer = self.refs[item]
+            box = self.index.boxes[item]
+            if kind == "TEXT":
+                size = primitive.get("height", 2.5) / pixel
+                if size < self.min_text_px:
+                    continue
+                qx, qy = px(primitive["x"], primitive["y"])
+                halign = primitive.get("halign", 0)
+                anchor = {1: "middle", 2: "end", 4: "middle"}.get(halign, "start")
+                valign = 2 if halign == 4 else primitive.get("valign", 0)
+                baseline = {1: "text-after-edge", 2: "central", 3: "text-before-edge"}.get(valign)
+                baseline = f' dominant-baseline="{baseline}"' if baseline else ""
+                rotation = primitive.get("rotation", 0)
+                transform = f' transform="rotate({-rotation:g} {qx} {qy})"' if rotation else ""
+                texts.setdefault(layer, []).append(
+                    f'<text x="{qx}" y="{qy}" font-size="{round(size)}" text-anchor="{anchor}"{baseline}{transform}>'
+                    f"{html.escape(primitive['text'])}</text>"
+                )
+                continue
+
+            # Level of detail: anything smaller than a pixel is not drawn
+            if box[2] - box[0] < pixel and box[3] - box[1] < pixel:
+                continue
+            if kind == "LINE":
+                segments = [primitive[:4]]
+            else:
+                points = primitive[0]
+                if primitive[1]:
+                    points = list(points) + [points[0]]
+                segments = [a + b for a, b in zip(points[:-1], points[1:])]
+
+            parts = paths.setdefault(layer, [])
+            last = None
+            for segment in segments:
+                clipped = self._clip(*segment, window)
+                if clipped is None:
+                    last = None
+                    continue
+                start = px(clipped[0], clipped[1])
+                end = px(clipped[2], clipped[3])
+                if start == end:
+                    continue
+                # Continue the current run when the segment starts where the previous one ended
+                if start == last:
+                    parts.append(f" {end[0]} {end[1]}")
+                else:
+                    parts.append(f"M{start[0]} {start[1]}L{end[0]} {end[1]}")
+                last = end
+
+        out = []
+        write = out.append
+        size = self.tile_size
+        write(f'<svg width="{size}" height="{size}" viewBox="0 0 {size} {size}" xmlns="http://www.w3.org/2000/svg">')
+        for layer, parts in paths.items():
+            if parts:
+                write(f'<path class="layer-{html.escape(layer)}" fill="none" stroke="#007bff" d="')
+                write("".join(parts))
+                write('"/>')
+        if texts:
+            write('<g font-family="Arial, sans-serif" fill="#333">')
+            for parts in texts.values():
+                write("".join(parts))
+            write("</g>")
+        write("</svg>")
+        return "".join(out)
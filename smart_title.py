@@ -1,30 +1,108 @@
 # smart_title.py  (drop-in)
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
+
+import numpy as np
+
+VERTEX_KEYS = ("points", "vertices")
+
+
+def first_vertices(el: Dict[str, Any]):
+    """The element's `points`/`vertices` sequence, or None; empty sequences count as missing"""
+    vertices = next((el[k] for k in VERTEX_KEYS if k in el), None)
+    return vertices if vertices is not None and len(vertices) else None
+
+
+def shift_vertices(vertices, dx: float, dy: float):
+    """Return `vertices` moved by (dx, dy), keeping the container and vertex types (and any z)"""
+    if isinstance(vertices, np.ndarray):
+        shifted = np.array(vertices, dtype=float)
+        if shifted.ndim == 2 and len(shifted):
+            shifted[:, :2] += (dx, dy)
+        return shifted
+    moved = [type(p)((p[0] + dx, p[1] + dy, *p[2:])) for p in vertices]
+    return moved if isinstance(vertices, list) else type(vertices)(moved)
+
+
+def pack_elements(elements: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Convert a list of element dicts into an array-backed collection:
+      xy    - (n_vertices, 2) float array with every element's vertices
+      start - (n_elements,) index of each element's first vertex in `xy`
+      tag   - (n_elements,) object array of element tags
+    Point-like elements contribute their `x`/`y`, multi-vertex elements
+    (polylines) their `points`/`vertices` list.
+    """
+    xy = []
+    start = []
+    for el in elements:
+        start.append(len(xy))
+        vertices = first_vertices(el)
+        if vertices is not None:
+            xy.extend((float(p[0]), float(p[1])) for p in vertices)
+        elif "x" in el and "y" in el:
+            xy.append((float(el["x"]), float(el["y"])))
+    return {
+        "xy": np.asarray(xy, dtype=float).reshape(-1, 2),
+        "start": np.asarray(start, dtype=np.int64),
+        "tag": np.asarray([el.get("tag") for el in elements], dtype=object),
+    }
+
 
 def smart_recenter_title(
-    elements: List[Dict[str, Any]],
+    elements: Union[List[Dict[str, Any]], Dict[str, np.ndarray]],
     *,
     title_tag: str = "title_block",
     target_origin: tuple = (50, 50),
-    margin: int = 10
-) -> None:
+    margin: int = 10,
+):
     """
     Moves the title block back to `target_origin` plus a small margin.
     Shifts the *entire drawing* so the title block stays visually
     at the chosen spot but relative positions are preserved.
+
+    `elements` is either a list of element dicts or an array-backed
+    collection from `pack_elements`; the latter is shifted in place with a
+    single array operation. Returns the applied (dx, dy), or None when
+    there is no title block or it has no coordinates.
     """
 
     # 1. locate the title block
-    titles = [e for e in elements if e.get("tag") == title_tag]
-    if not titles:
-        return  # nothing to do
-    title = titles[0]
+    if isinstance(elements, dict):
+        titles = np.flatnonzero(elements["tag"] == title_tag)
+        if not len(titles):
+            return None  # nothing to do
+        # The title's vertices run up to the next element's start; there may be none
+        first = elements["start"][titles[0]]
+        end = elements["start"][titles[0] + 1] if titles[0] + 1 < len(elements["start"]) else len(elements["xy"])
+        if first >= end:
+            return None
+        anchor = elements["xy"][first]
+    else:
+        title = next((e for e in elements if e.get("tag") == title_tag), None)
+        if title is None:
+            return None  # nothing to do
+        vertices = first_vertices(title)
+        if vertices is not None:
+            anchor = vertices[0]
+        elif "x" in title and "y" in title:
+            anchor = (title["x"], title["y"])
+        else:
+            return None
 
     # 2. compute shift vector
-    dx = target_origin[0] - title["x"]
-    dy = target_origin[1] - title["y"]
+    dx = target_origin[0] - float(anchor[0])
+    dy = target_origin[1] - float(anchor[1])
+
+    # 3. apply shift to *every* element (and every vertex of multi-vertex ones)
+    if isinstance(elements, dict):
+        elements["xy"] += (dx, dy)
+        return dx, dy
 
-    # 3. apply shift to *every* element
     for el in elements:
-        el["x"] += dx
-        el["y"] += dy
\ No newline at end of file
+        if "x" in el and "y" in el:
+            el["x"] += dx
+            el["y"] += dy
+        for key in VERTEX_KEYS:
+            if key in el:
+                el[key] = shift_vertices(el[key], dx, dy)
+    return dx, dy
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for content-addressed naming and reuse of generated drawings
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+from artifact_store import ArtifactStore
+from bridge_processor import BridgeProcessor
+
+SAMPLE = str(Path(__file__).parent / "attached_assets" / "input.xlsx")
+
+
+def test_keys_depend_only_on_normalized_parameters_and_engine_version():
+    """Key order, case and float noise do not change a key; values and the engine version do"""
+    store = ArtifactStore()
+    key = store.key_for({"NSPAN": 3, "lbridge": 42.5, "terrain": [[0, 1.1]]}, "1.0")
+    assert store.key_for({"lbridge": np.float64(42.5000000000001), "nspan": 3.0, "terrain": [(0, 1.1)]}, "1.0") == key
+    assert store.key_for({"NSPAN": 4, "lbridge": 42.5, "terrain": [[0, 1.1]]}, "1.0") != key
+    assert store.key_for({"NSPAN": 3, "lbridge": 42.5, "terrain": [[0, 1.1]]}, "1.1") != key
+    assert store.filename_for(key) == f"bridge_design_{key[:20]}.dxf"
+
+
+def test_identical_designs_reuse_one_artifact(tmp_path):
+    """Generating the same design twice writes one file, named by the design key, wherever the workbook lives"""
+    processor = BridgeProcessor()
+    processor.artifact_store = ArtifactStore(str(tmp_path))
+    variables, _ = processor.prepare_variables(SAMPLE, "P")
+    stages = []
+    processor.progress = lambda stage, info: stages.append(stage)
+
+    filename, cleanup = processor.generate_dxf(variables)
+    path = tmp_path / filename
+    written = path.stat().st_mtime_ns
+    assert filename == processor.artifact_store.filename_for(processor.design_key(variables))
+    assert processor.artifact_store.lookup(processor.design_key(variables))["cleanup"] == cleanup
+
+    del stages[:]
+    moved = dict(variables, excel_file_path="elsewhere.xlsx")
+    assert processor.generate_dxf(moved) == (filename, cleanup)
+    assert stages == ["saved"] and path.stat().st_mtime_ns == written
+
+    renamed, _ = processor.generate_dxf(dict(variables, project_name="Q"))
+    assert renamed != filename
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [filename, renamed, Path(filename).stem + ".json", Path(renamed).stem + ".json"]
+    )
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    test_keys_depend_only_on_normalized_parameters_and_engine_version()
+    with tempfile.TemporaryDirectory() as root:
+        test_identical_designs_reuse_one_artifact(Path(root))
+    print("All tests passed.")
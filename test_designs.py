@@ -0,0 +1,660 @@
+#!/usr/bin/env python3
+"""
+Tests for persisting processed designs and rendering them from the store
+"""
+
+import io
+import os
+import csv
+import sys
+import json
+import time
+import runpy
+import signal
+import multiprocessing
+import zipfile
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from collections import OrderedDict
+from pathlib import Path
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.orm import Session
+from flask import Flask
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Keep the test database out of the working tree; it has to be chosen before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'designs.db')}"
+
+import pytest
+import openpyxl
+
+import app as bridge_app
+import workers
+from bridge_processor import BridgeProcessor
+from artifact_store import ArtifactStore
+from preview_tiles import GEOMETRY_EXT
+
+SAMPLE = str(Path(__file__).parent / "attached_assets" / "input.xlsx")
+
+
+@pytest.fixture
+def data_dir(monkeypatch, tmp_path):
+    """Point the app's folders, artifact stores and worker pool at a per-test directory, restored afterwards"""
+    root = str(tmp_path)
+    monkeypatch.setitem(bridge_app.app.config, "GENERATED_FOLDER", root)
+    monkeypatch.setitem(bridge_app.app.config, "UPLOAD_FOLDER", root)
+    monkeypatch.setattr(bridge_app.artifact_store, "root", root)
+    monkeypatch.setattr(bridge_app.upload_store, "root", root)
+    monkeypatch.setattr(workers.get_processor().artifact_store, "root", root)
+    # Run worker functions in-process so their artifacts also go to the test directory
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(bridge_app, "worker_pool", pool)
+    monkeypatch.setattr(bridge_app.job_queue, "pool", pool)
+    yield root
+    pool.shutdown()
+
+
+def test_results_are_rendered_from_the_stored_design(data_dir):
+    """A finished job is stored on its design record and /results serves it, answering repeat views with 304"""
+    app = bridge_app.app
+    client = app.test_client()
+
+    results = BridgeProcessor().process_excel_file(SAMPLE, project_name="P", preview_only=True)
+    with app.app_context():
+        design_id = bridge_app.create_design("input.xlsx", "P")
+    job = {
+        "id": "job",
+        "status": "done",
+        "submitted": 1.0,
+        "started": 2.0,
+        "finished": 3.5,
+        "result": results,
+        "error": None,
+        "info": {"design_id": design_id},
+        "stages": [{"stage": "parsed", "duration": 0.5}, {"stage": "saved", "duration": 1.0}],
+    }
+    bridge_app.store_design(job)
+
+    with app.app_context():
+        design = bridge_app.db.session.get(bridge_app.models.BridgeDesign, design_id)
+        assert design.status == "completed" and design.design_key == results["design_key"]
+        assert design.load("timings") == {"queued": 1.0, "running": 1.5, "stages": {"parsed": 0.5, "saved": 1.0}}
+        assert design.load("cleanup") == results["cleanup"]
+        assert os.path.exists(os.path.join(data_dir, design.svg_filename))
+
+    response = client.get(f"/results/{design_id}")
+    assert response.status_code == 200
+    assert results["svg_content"] in response.get_data(as_text=True)
+    repeat = client.get(f"/results/{design_id}", headers={"If-None-Match": response.headers["ETag"]})
+    assert repeat.status_code == 304 and repeat.data == b""
+
+    failed = dict(job, status="failed", result=None, error="boom")
+    with app.app_context():
+        failed["info"] = {"design_id": bridge_app.create_design("bad.xlsx", "P")}
+    bridge_app.store_design(failed)
+    response = client.get(f"/results/{failed['info']['design_id']}")
+    assert response.status_code == 200 and "boom" in response.get_data(as_text=True)
+
+
+def test_results_of_a_running_job_show_the_waiting_page(data_dir, monkeypatch):
+    """While a design is being stored its results URL renders the job page instead of redirecting back and forth"""
+    app = bridge_app.app
+    client = app.test_client()
+    with app.app_context():
+        design_id = bridge_app.create_design("input.xlsx", "P")
+        design = bridge_app.db.session.get(bridge_app.models.BridgeDesign, design_id)
+        design.job_id = "storing"
+        bridge_app.db.session.commit()
+    job = {"id": "storing", "status": "running", "submitted": 1.0, "started": 2.0, "finished": 3.0}
+    monkeypatch.setitem(bridge_app.job_queue.jobs, "storing", dict(job, result=None, error=None, info={}, stages=[]))
+
+    response = client.get(f"/results/{design_id}")
+    assert response.status_code == 200 and "Processing Bridge Design" in response.get_data(as_text=True)
+
+
+def workbook_bytes(**changes):
+    """The sample workbook as bytes, with some variables changed"""
+    book = openpyxl.load_workbook(SAMPLE, data_only=True)
+    for row in book.worksheets[0].iter_rows():
+        if row[1].value in changes:
+            row[0].value = changes[row[1].value]
+    data = io.BytesIO()
+    book.save(data)
+    return data.getvalue()
+
+
+def wait_for_job(job_id, timeout=30):
+    """Wait until the job has finished and its completion hook has stored the design"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if bridge_app.job_queue.get(job_id)["status"] not in ("queued", "running"):
+            with bridge_app.app.app_context():
+                design = bridge_app.design_for_job(job_id)
+                if design is None or design.status != "processing":
+                    break
+        time.sleep(0.05)
+    return bridge_app.job_queue.get(job_id)
+
+
+def test_uploads_sharing_a_name_keep_their_own_workbook(data_dir):
+    """Uploads are stored by content hash, so a later upload of the same name cannot change an earlier design"""
+    client = bridge_app.app.test_client()
+    designs = []
+    for kerb_width in (0.5, 0.6):
+        upload = {"file": (io.BytesIO(workbook_bytes(KERBW=kerb_width)), "bridge.xlsx"), "project_name": "Same"}
+        response = client.post("/upload", data=upload, headers={"Accept": "application/json"})
+        assert response.status_code == 202
+        assert wait_for_job(response.get_json()["job_id"])["status"] == "done"
+        with bridge_app.app.app_context():
+            designs.append(bridge_app.db.session.get(bridge_app.models.BridgeDesign, response.get_json()["design_id"]))
+
+    first, second = designs
+    assert first.filename == second.filename == "bridge.xlsx"
+    assert first.upload_filename != second.upload_filename and first.design_key != second.design_key
+    assert os.path.exists(os.path.join(data_dir, first.upload_filename))
+
+    response = client.get(f"/generate/{first.id}")
+    assert response.status_code == 302
+    assert response.location.endswith(bridge_app.artifact_store.filename_for(first.design_key))
+
+
+def test_generation_on_download_is_admission_limited_and_timed_out(data_dir, monkeypatch):
+    """Downloads needing a DXF answer 503 with Retry-After when too many wait for a worker or one takes too long"""
+    app = bridge_app.app
+    client = app.test_client()
+    with app.app_context():
+        design_id = bridge_app.create_design(
+            "bridge.xlsx", "Slow", bridge_app.upload_store.save_file("a" * 64, ".xlsx", b"x")
+        )
+
+    monkeypatch.setattr(bridge_app, "generate_slots", threading.BoundedSemaphore(1))
+    bridge_app.generate_slots.acquire()
+    response = client.get(f"/generate/{design_id}")
+    assert response.status_code == 503 and response.headers["Retry-After"] == "10"
+    bridge_app.generate_slots.release()
+
+    release = threading.Event()
+    monkeypatch.setattr(bridge_app, "generate_file", lambda *args: release.wait(5) and "late.dxf")
+    monkeypatch.setitem(app.config, "GENERATE_TIMEOUT", 0.05)
+    response = client.get(f"/generate/{design_id}")
+    release.set()
+    assert response.status_code == 503 and "too long" in response.get_json()["error"]
+    assert bridge_app.generate_slots.acquire(blocking=False)  # the slot was given back
+
+
+def test_upload_errors_are_json_and_event_streams_are_time_limited(data_dir, monkeypatch):
+    """Fetch uploads get JSON errors, and an event stream of a long job ends with a "timeout" event"""
+    client = bridge_app.app.test_client()
+    headers = {"Accept": "application/json"}
+    response = client.post("/upload", data={"file": (io.BytesIO(b"x"), "notes.txt")}, headers=headers)
+    assert response.status_code == 400 and "Invalid file type" in response.get_json()["error"]
+    assert client.post("/upload", data={}, headers=headers).get_json() == {"error": "No file selected"}
+    assert client.post("/upload", data={"file": (io.BytesIO(b"x"), "notes.txt")}).status_code == 302
+
+    monkeypatch.setitem(bridge_app.app.config, "EVENTS_MAX_DURATION", 0)
+    job = {"id": "slow", "status": "running", "submitted": 1.0, "started": 2.0, "finished": None}
+    monkeypatch.setitem(bridge_app.job_queue.jobs, "slow", dict(job, result=None, error=None, info={}, stages=[]))
+    body = client.get("/jobs/slow/events").get_data(as_text=True)
+    assert body.startswith("event: timeout\n") and '"status": "running"' in body
+
+
+def test_thumbnails_are_rendered_by_the_job_and_fall_back_to_the_stored_svg(data_dir):
+    """The processing job stores the PNG thumbnail; without it the design's stored SVG preview is served"""
+    client = bridge_app.app.test_client()
+    upload = {"file": (io.BytesIO(workbook_bytes(KERBW=0.55)), "thumb.xlsx"), "project_name": "Thumb"}
+    response = client.post("/upload", data=upload, headers={"Accept": "application/json"})
+    assert wait_for_job(response.get_json()["job_id"])["status"] == "done"
+    with bridge_app.app.app_context():
+        design = bridge_app.db.session.get(bridge_app.models.BridgeDesign, response.get_json()["design_id"])
+    assert design.thumbnail_filename == bridge_app.artifact_store.filename_for(design.design_key, ".png")
+
+    thumbnail = client.get(f"/thumbnail/{design.design_key}")
+    assert thumbnail.status_code == 200 and thumbnail.mimetype == "image/png"
+
+    os.remove(os.path.join(data_dir, design.thumbnail_filename))
+    fallback = client.get(f"/thumbnail/{design.design_key}")
+    assert fallback.status_code == 200 and fallback.mimetype == "image/svg+xml"
+    assert "max-age=60" in fallback.headers["Cache-Control"]
+    assert client.get(f"/thumbnail/{'0' * 64}").status_code == 404
+
+
+def test_preview_tiles_are_rebuilt_from_the_stored_geometry(data_dir, monkeypatch):
+    """Tiles are served from the geometry stored next to the artifact, also once the in-memory cache is empty"""
+    processor = workers.get_processor()
+    results = processor.process_excel_file(SAMPLE, project_name="Tiles", preview_only=True, tiles=True)
+    key = results["design_key"]
+    assert results["geometry_filename"] == bridge_app.artifact_store.filename_for(key, GEOMETRY_EXT)
+    assert bridge_app.artifact_store.group_of(results["geometry_filename"]) == bridge_app.artifact_store.group_of(
+        bridge_app.artifact_store.filename_for(key)
+    )
+
+    monkeypatch.setattr(bridge_app, "preview_tiles", OrderedDict())
+    client = bridge_app.app.test_client()
+    tile = client.get(f"/preview/{key}/0/0/0")
+    assert tile.status_code == 200 and tile.mimetype == "image/svg+xml" and "<path" in tile.get_data(as_text=True)
+    assert key in bridge_app.preview_tiles
+    assert client.get(f"/preview/{key}/1/0/0").status_code == 200
+    assert client.get(f"/preview/{'0' * 64}/0/0/0").status_code == 404
+
+
+def test_parameters_are_packed_into_one_indexed_column():
+    """Variables are stored as one packed JSON value whose hash identifies the parameter set"""
+    app = bridge_app.app
+    BridgeDesign = bridge_app.models.BridgeDesign
+    variables, _ = BridgeProcessor().prepare_variables(SAMPLE, "P")
+
+    first = BridgeDesign(filename="a.xlsx")
+    first.set_parameters(variables, bridge_app.required_variables)
+    second = BridgeDesign(filename="b.xlsx")
+    second.set_parameters(dict(variables, excel_file_path="elsewhere.xlsx"), bridge_app.required_variables)
+    assert first.parameter_hash == second.parameter_hash
+
+    packed = first.load("parameters")
+    assert set(packed) == {name.lower() for name in bridge_app.required_variables} | {"project_name"}
+    assert packed["lbridge"] == variables["lbridge"] and packed["project_name"] == "P"
+
+    with app.app_context():
+        indexes = {
+            tuple(index["column_names"])
+            for index in bridge_app.db.inspect(bridge_app.db.engine).get_indexes("bridge_design")
+        }
+    assert {("upload_time", "id"), ("parameter_hash",), ("status", "upload_time")} <= indexes
+
+
+def test_worker_processes_run_jobs_and_a_broken_pool_is_replaced(monkeypatch):
+    """Jobs run in real worker processes; once a worker is killed, the pool is started again for later work"""
+    monkeypatch.setattr(bridge_app, "worker_pool", None)
+    monkeypatch.setattr(bridge_app, "progress_channel", None)
+    monkeypatch.setattr(bridge_app.job_queue, "pool", None)
+    monkeypatch.setitem(bridge_app.app.config, "JOB_WORKERS", 1)
+    assert bridge_app.app.config["WORKER_START_METHOD"] in multiprocessing.get_all_start_methods()
+    bridge_app.init_workers()
+    pool = bridge_app.worker_pool
+    try:
+        worker = wait_for_job(bridge_app.job_queue.submit(os.getpid), timeout=60)["result"]
+        assert worker != os.getpid()
+
+        os.kill(worker, signal.SIGKILL)
+        assert wait_for_job(bridge_app.job_queue.submit(os.getpid), timeout=60)["status"] == "failed"
+        assert bridge_app.worker_pool is not pool and bridge_app.job_queue.pool is bridge_app.worker_pool
+        assert bridge_app.submit_work(os.getpid).result(timeout=60) not in (worker, os.getpid())
+    finally:
+        bridge_app.worker_pool.shutdown()
+
+
+def test_app_starts_when_run_as_a_script(monkeypatch):
+    """`python app.py` sets up the database and starts the server, without a circular import of the models"""
+    started = []
+    monkeypatch.setattr(Flask, "run", lambda self, **options: started.append((self, options)))
+    namespace = runpy.run_path(bridge_app.__file__, run_name="__main__")
+    assert len(started) == 1 and started[0][0] is namespace["app"]
+    assert namespace["models"].upgrade_schema is bridge_app.models.upgrade_schema
+
+
+def test_databases_of_the_baseline_schema_are_upgraded(tmp_path):
+    """Columns and indexes added since the first release are added to existing tables, keeping their rows"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE bridge_design (id INTEGER PRIMARY KEY, filename VARCHAR(255) NOT NULL, upload_time DATETIME, "
+            "parameters TEXT, dxf_filename VARCHAR(255), status VARCHAR(50), error_message TEXT)"
+        )
+        connection.exec_driver_sql("INSERT INTO bridge_design (filename, status) VALUES ('old.xlsx', 'completed')")
+
+    BridgeDesign = bridge_app.models.BridgeDesign
+    added = bridge_app.models.upgrade_schema(engine)
+    assert "bridge_design.pinned" in added and "bridge_design.design_key" in added
+    assert bridge_app.models.upgrade_schema(engine) == []
+    indexes = {index["name"] for index in inspect(engine).get_indexes("bridge_design")}
+    assert {"ix_bridge_design_upload_time_id", "ix_bridge_design_parameter_hash"} <= indexes
+
+    with Session(engine) as session:
+        session.add(BridgeDesign(filename="new.xlsx", status="completed", nspan=3))
+        session.commit()
+        designs = session.scalars(select(BridgeDesign).order_by(BridgeDesign.id)).all()
+        assert [(d.filename, d.pinned) for d in designs] == [("old.xlsx", False), ("new.xlsx", False)]
+
+
+def test_design_history_is_keyset_paginated_and_filtered():
+    """/api/designs pages newest first by (upload_time, id), filters on promoted variables and omits the SVG"""
+    app = bridge_app.app
+    BridgeDesign = bridge_app.models.BridgeDesign
+    client = app.test_client()
+    variables, _ = BridgeProcessor().prepare_variables(SAMPLE, "History")
+    with app.app_context():
+        uploaded = datetime(2030, 1, 1)
+        for i in range(7):
+            design = BridgeDesign(filename=f"h{i}.xlsx", project_name="History", status="completed")
+            design.upload_time = uploaded  # identical times are ordered by id
+            design.set_parameters(dict(variables, nspan=i, skew=0 if i % 2 else 15), bridge_app.required_variables)
+            bridge_app.db.session.add(design)
+        bridge_app.db.session.commit()
+
+    seen = []
+    url = "/api/designs?project=History&limit=3"
+    while url:
+        page = client.get(url).get_json()
+        seen.extend(page["designs"])
+        url = page["next_url"]
+    assert [d["filename"] for d in seen] == [f"h{i}.xlsx" for i in reversed(range(7))]
+    assert "svg_content" not in seen[0] and seen[0]["results_url"] == f"/results/{seen[0]['id']}"
+
+    filtered = client.get("/api/designs?project=History&nspan=ge:2&nspan=lt:6&skew=ne:0").get_json()
+    assert [d["nspan"] for d in filtered["designs"]] == [4, 2] and filtered["next_url"] is None
+    assert client.get("/api/designs?nspan=about:2").status_code == 400
+
+
+def test_downloads_are_conditional_and_resumable(data_dir):
+    """Downloads carry a strong ETag from the artifact key, answer revalidation with 304 and serve byte ranges"""
+    app = bridge_app.app
+    client = app.test_client()
+    processor = workers.get_processor()
+    variables, _ = processor.prepare_variables(SAMPLE, "P")
+    dxf_filename, _ = processor.generate_dxf(variables)
+
+    full = client.get(f"/download/{dxf_filename}")
+    assert full.status_code == 200 and full.headers["Accept-Ranges"] == "bytes"
+    etag = full.headers["ETag"]
+    assert etag.startswith(f'"{processor.design_key(variables)}-dxf-') and "Last-Modified" in full.headers
+
+    repeat = client.get(f"/download/{dxf_filename}", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304 and repeat.data == b""
+    resumed = client.get(f"/download/{dxf_filename}", headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert resumed.status_code == 206 and resumed.data == full.data[1000:]
+
+
+def test_json_api_generates_designs_from_parameters(data_dir, monkeypatch):
+    """POST /api/v1/designs queues a job whose status carries the artifact, preview and validation"""
+    app = bridge_app.app
+    client = app.test_client()
+
+    variables, _ = BridgeProcessor().prepare_variables(SAMPLE, "API")
+    parameters = {name: variables[name] for name in bridge_app.required_variables}
+    terrain = [[0, 103.0], [20, 99.5], [40, 101.0]]
+    validations = []
+    validate = BridgeProcessor.validate_parameter_set
+    monkeypatch.setattr(
+        BridgeProcessor, "validate_parameter_set", lambda *args: validations.append(args) or validate(*args)
+    )
+    response = client.post(
+        "/api/v1/designs", json={"parameters": parameters, "terrain": terrain, "project_name": "API"}
+    )
+    assert response.status_code == 202 and response.headers["Location"] == response.get_json()["status_url"]
+    queued = response.get_json()
+    assert wait_for_job(queued["job_id"])["status"] == "done" and len(validations) == 1
+
+    body = client.get(queued["status_url"]).get_json()
+    assert body["validation"]["valid"] and body["preview"]["format"] == "svg" and "<path" in body["preview"]["content"]
+    assert client.get(body["download_url"]).status_code == 200
+    assert client.get(queued["results_url"]).status_code == 200
+
+    # Another server process does not hold the job record and answers from the stored design
+    job = bridge_app.job_queue.jobs.pop(queued["job_id"])
+    try:
+        stored = client.get(queued["status_url"]).get_json()
+        assert stored["status"] == "done" and stored["success"] and stored["results_url"] == queued["results_url"]
+        assert {key: stored[key] for key in ("artifact_id", "download_url", "validation", "cleanup")} == {
+            key: body[key] for key in ("artifact_id", "download_url", "validation", "cleanup")
+        }
+        page = client.get(f"/jobs/{queued['job_id']}")
+        assert page.status_code == 302 and page.location.endswith(queued["results_url"])
+        assert client.get(queued["events_url"]).get_data(as_text=True).startswith("event: done\n")
+    finally:
+        bridge_app.job_queue.jobs[queued["job_id"]] = job
+    with app.app_context():
+        pending = bridge_app.db.session.get(bridge_app.models.BridgeDesign, bridge_app.create_design("api", "API"))
+        pending.job_id = "elsewhere"
+        bridge_app.db.session.commit()
+    running = client.get("/jobs/elsewhere?format=json").get_json()
+    assert running["status"] == "running" and running["timings"]["running"] == 0.0
+    assert client.get("/jobs/elsewhere").status_code == 200
+    monkeypatch.setitem(app.config, "EVENTS_MAX_DURATION", 0)
+    assert client.get("/jobs/elsewhere/events").get_data(as_text=True).startswith("event: timeout\n")
+
+    as_excel = BridgeProcessor().design_key(dict(variables, terrain=terrain, project_name="API"))
+    assert body["artifact_id"] == as_excel
+
+    # The design keeps its terrain, so its DXF can be generated again once it is gone
+    with app.app_context():
+        design = bridge_app.db.session.get(bridge_app.models.BridgeDesign, queued["id"])
+        assert design.load("terrain") == terrain and design.thumbnail_filename
+    os.remove(os.path.join(data_dir, design.dxf_filename))
+    regenerated = client.get(f"/generate/{queued['id']}")
+    assert regenerated.status_code == 302 and regenerated.location.endswith(design.dxf_filename)
+    assert os.path.exists(os.path.join(data_dir, design.dxf_filename))
+
+    geometry = client.post("/api/v1/designs", json={"parameters": parameters, "preview": "json"}).get_json()
+    wait_for_job(geometry["job_id"])
+    geometry = client.get(geometry["status_url"]).get_json()
+    assert geometry["preview"]["format"] == "json" and geometry["artifact_id"] != body["artifact_id"]
+
+    invalid = client.post("/api/v1/designs", json={"parameters": dict(parameters, NSPAN=0.5, SKEW="steep")})
+    assert invalid.status_code == 422
+    errors = invalid.get_json()["validation"]["errors"]
+    assert any("SKEW" in error for error in errors)
+    assert client.post("/api/v1/designs", data="not json").status_code == 400
+
+    monkeypatch.setattr(bridge_app.job_queue, "max_queued", 0)
+    busy = client.post("/api/v1/designs", json={"parameters": parameters})
+    assert busy.status_code == 503 and busy.headers["Retry-After"]
+
+
+def test_batch_zip_streams_dxfs_and_a_manifest(data_dir, monkeypatch):
+    """Each workbook/JSON file of an uploaded zip becomes a DXF; failures are listed in the manifest only"""
+    app = bridge_app.app
+    client = app.test_client()
+    # One member at a time in the worker pool, taking the single batch slot in turn
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(bridge_app, "batch_slots", slots)
+
+    variables, _ = BridgeProcessor().prepare_variables(SAMPLE, "Batch")
+    parameters = {name: variables[name] for name in bridge_app.required_variables}
+    upload = io.BytesIO()
+    with zipfile.ZipFile(upload, "w") as archive:
+        archive.write(SAMPLE, "north/bridge.xlsx")
+        archive.write(SAMPLE, "south/bridge.xlsx")
+        archive.writestr("json/spans.json", json.dumps({"parameters": dict(parameters, NSPAN=3)}))
+        archive.writestr("broken.xlsx", b"not a workbook")
+        archive.writestr("README.txt", "ignored")
+    archive_bytes = upload.getvalue()
+    upload.seek(0)
+
+    response = client.post(
+        "/api/v1/batch", data={"file": (upload, "tender.zip")}, content_type="multipart/form-data", buffered=True
+    )
+    assert response.status_code == 200 and response.mimetype == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as result:
+        names = set(result.namelist())
+        rows = {row["file"]: row for row in csv.DictReader(io.StringIO(result.read("manifest.csv").decode("utf-8")))}
+    assert names == {"north/bridge.dxf", "south/bridge.dxf", "json/spans.dxf", "manifest.csv"}
+    assert rows["broken.xlsx"]["status"] == "failed" and rows["broken.xlsx"]["error"]
+    assert rows["json/spans.json"]["status"] == "done" and float(rows["json/spans.json"]["seconds"]) > 0
+    assert rows["north/bridge.xlsx"]["design_key"] == rows["south/bridge.xlsx"]["design_key"]
+    assert not [name for name in os.listdir(data_dir) if name.startswith("batch_")]
+
+    not_zip = client.post(
+        "/api/v1/batch", data={"file": (io.BytesIO(b"nope"), "x.zip")}, content_type="multipart/form-data"
+    )
+    assert not_zip.status_code == 400
+
+    # Every slot is given back, and a batch arriving while none is free is refused
+    assert slots.acquire(blocking=False)
+    busy = client.post(
+        "/api/v1/batch", data={"file": (io.BytesIO(archive_bytes), "tender.zip")}, content_type="multipart/form-data"
+    )
+    assert busy.status_code == 503 and busy.headers["Retry-After"]
+
+
+def test_batch_folders_and_pins_are_released_when_the_response_closes(data_dir, monkeypatch):
+    """Closing a batch response cleans up even when its body is never read; DXFs swept mid-batch fail their member"""
+    app = bridge_app.app
+    client = app.test_client()
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(bridge_app, "batch_slots", slots)
+    upload = io.BytesIO()
+    with zipfile.ZipFile(upload, "w") as archive:
+        archive.write(SAMPLE, "first.xlsx")
+        archive.write(SAMPLE, "second.xlsx")
+    archive_bytes = upload.getvalue()
+
+    def post(buffered=False):
+        data = {"file": (io.BytesIO(archive_bytes), "tender.zip")}
+        return client.post("/api/v1/batch", data=data, content_type="multipart/form-data", buffered=buffered)
+
+    def batch_folders():
+        return [name for name in os.listdir(data_dir) if name.startswith("batch_")]
+
+    unread = post()
+    assert batch_folders()
+    unread.close()
+    assert not batch_folders()
+    deadline = time.time() + 30
+    while not slots.acquire(blocking=False):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    slots.release()
+
+    # The sweeper keeps the DXFs of a running batch
+    streamed = post()
+    chunks = iter(streamed.response)
+    next(chunks)
+    assert bridge_app.batch_pins
+    monkeypatch.setitem(app.config, "GENERATED_MAX_BYTES", 0)
+    bridge_app.sweep_storage()
+    assert all(os.path.exists(os.path.join(data_dir, group + ".dxf")) for group in bridge_app.batch_pins)
+    list(chunks)
+    streamed.close()
+    assert not bridge_app.batch_pins and not batch_folders()
+
+    # A DXF removed anyway, e.g. by the sweeper of another process, fails only its member
+    process = bridge_app.process_batch_item
+
+    def swept(path, *args):
+        item = process(path, *args)
+        if path.endswith("first.xlsx"):
+            os.remove(os.path.join(data_dir, item["dxf_filename"]))
+        return item
+
+    monkeypatch.setattr(bridge_app, "process_batch_item", swept)
+    response = post(buffered=True)
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as result:
+        names = result.namelist()
+        rows = {row["file"]: row for row in csv.DictReader(io.StringIO(result.read("manifest.csv").decode("utf-8")))}
+    assert "first.dxf" not in names and rows["first.xlsx"]["status"] == "failed"
+    assert "removed" in rows["first.xlsx"]["error"]
+
+
+def test_storage_sweeper_evicts_least_recently_downloaded_unpinned_artifacts(tmp_path):
+    """Over quota, whole artifacts are evicted least recently accessed first, and pinned designs are kept"""
+    root = str(tmp_path)
+    store = ArtifactStore(root)
+    keys = [store.key_for({"design": i}, "test") for i in range(4)]
+    for age, key in zip((400, 300, 200, 100), keys):
+        store.save(key, lambda path: open(path, "wb").write(b"x" * 1000), {})
+        store.save_file(key, ".svg", b"<svg/>")
+        for ext in (".dxf", ".json", ".svg"):
+            path = store.path_for(key, ext)
+            os.utime(path, (time.time() - age, time.time() - age))
+    with open(os.path.join(root, ".tmp_stale.dxf"), "wb") as fh:
+        fh.write(b"partial")
+    os.utime(os.path.join(root, ".tmp_stale.dxf"), (0, 0))
+
+    store.touch(store.filename_for(keys[0]))  # downloaded just now
+    pinned = {store.group_of(store.filename_for(keys[1]))}
+    size = store.metrics()["bytes_stored"] // 4
+    evicted = store.sweep(max_bytes=3 * size, pinned=pinned)
+
+    assert evicted == [store.group_of(store.filename_for(keys[2]))]
+    assert [os.path.exists(store.path_for(key)) for key in keys] == [True, True, False, True]
+    assert not os.path.exists(store.path_for(keys[2], ".svg"))
+    assert not os.path.exists(os.path.join(root, ".tmp_stale.dxf"))
+
+    assert store.sweep(max_age=150) == [store.group_of(store.filename_for(keys[1]))]
+    metrics = store.metrics()
+    assert metrics["artifacts"] == 2 and metrics["evictions"] == 2 and metrics["sweeps"] == 2
+
+    # Counters are shared through the folder, so every process reports the same ones
+    other = ArtifactStore(root)
+    assert other.metrics() == metrics and other.metrics()["evicted_bytes"] == 2 * size
+
+    # Reading metrics leaves stale temporary files alone, only sweeps remove them
+    with open(os.path.join(root, ".tmp_stale.dxf"), "wb") as fh:
+        fh.write(b"partial")
+    os.utime(os.path.join(root, ".tmp_stale.dxf"), (0, 0))
+    other.metrics()
+    assert os.path.exists(os.path.join(root, ".tmp_stale.dxf"))
+
+
+def test_pinned_designs_survive_the_app_sweep(data_dir, monkeypatch):
+    """Pinning through the API exempts a design's artifacts from the app's storage quotas"""
+    app = bridge_app.app
+    client = app.test_client()
+    keys = [bridge_app.artifact_store.key_for({"pin": i}, "test") for i in range(2)]
+    with app.app_context():
+        ids = []
+        for key in keys:
+            bridge_app.artifact_store.save_file(key, ".svg", b"<svg/>")
+            design = bridge_app.models.BridgeDesign(filename="pin.xlsx", status="completed", design_key=key)
+            bridge_app.db.session.add(design)
+            bridge_app.db.session.commit()
+            ids.append(design.id)
+
+    assert client.post(f"/api/designs/{ids[0]}/pin").get_json()["pinned"] is True
+    monkeypatch.setitem(app.config, "GENERATED_MAX_BYTES", 0)
+    bridge_app.sweep_storage()
+    stored = [name for name in os.listdir(data_dir) if not name.startswith(".")]
+    assert stored == [bridge_app.artifact_store.filename_for(keys[0], ".svg")]
+    storage = client.get("/api/storage").get_json()
+    assert storage["generated"]["evictions"] >= 1 and storage["generated"]["files"] == 1
+
+
+def test_evicted_designs_are_generated_again_on_download(data_dir, monkeypatch):
+    """A sweep clears the artifact filenames of evicted designs and stale batch folders; old DXF links regenerate"""
+    app = bridge_app.app
+    client = app.test_client()
+    # Uploads apart from the generated files, so that only the generated folder is over its quota
+    uploads = os.path.join(data_dir, "uploads")
+    monkeypatch.setitem(app.config, "UPLOAD_FOLDER", uploads)
+    monkeypatch.setattr(bridge_app.upload_store, "root", uploads)
+    with open(SAMPLE, "rb") as fh:
+        upload_filename = bridge_app.upload_store.save_file("workbook", ".xlsx", fh.read())
+    with app.app_context():
+        design_id = bridge_app.create_design("input.xlsx", "Evicted", upload_filename)
+    filename = client.get(f"/generate/{design_id}").location.rsplit("/", 1)[-1]
+    with app.app_context():
+        design = bridge_app.db.session.get(bridge_app.models.BridgeDesign, design_id)
+        design.design_key = BridgeProcessor().design_key(BridgeProcessor().prepare_variables(SAMPLE, "Evicted")[0])
+        assert filename == bridge_app.artifact_store.filename_for(design.design_key)
+        key = bridge_app.artifact_store.key_for({"preview": design_id}, "test")
+        design.svg_filename = bridge_app.artifact_store.save_file(key, ".svg", b"<svg/>")
+        bridge_app.db.session.commit()
+
+    for name, age in (("batch_crashed", 7 * 3600), ("batch_running", 60)):
+        os.makedirs(os.path.join(uploads, name))
+        os.utime(os.path.join(uploads, name), (time.time() - age, time.time() - age))
+
+    monkeypatch.setitem(app.config, "GENERATED_MAX_BYTES", 0)
+    with bridge_app.storage_lock() as locked:
+        assert locked
+        with bridge_app.storage_lock() as again:
+            assert not again  # another process (or sweeper) is already sweeping
+        bridge_app.sweep_storage()
+    assert not os.path.exists(os.path.join(data_dir, filename))
+    assert sorted(name for name in os.listdir(uploads) if name.startswith("batch_")) == ["batch_running"]
+    with app.app_context():
+        design = bridge_app.db.session.get(bridge_app.models.BridgeDesign, design_id)
+        assert design.dxf_filename is None and design.svg_filename is None
+
+    # Links handed out before the sweep still work: the DXF is generated again from the recorded upload
+    response = client.get(f"/download/{filename}")
+    assert response.status_code == 302 and response.location.endswith(f"/generate/{design_id}")
+    assert client.get(response.location).location.endswith(f"/download/{filename}")
+    assert os.path.exists(os.path.join(data_dir, filename))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
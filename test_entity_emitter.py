@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Tests for the batched entity emission layer used by BridgeProcessor
+"""
+
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import math
+import ezdxf
+import numpy as np
+import pytest
+from bridge_processor import BridgeProcessor
+from entity_emitter import EntityEmitter
+from geometry_index import GeometryIndex
+
+SAMPLE = str(Path(__file__).parent / "attached_assets" / "input.xlsx")
+
+
+def test_bulk_emission_matches_per_entity_api():
+    """Bulk lines/texts/polylines land in the modelspace with their shared attributes"""
+    doc = ezdxf.new("R2010")
+    msp = doc.modelspace()
+    emitter = EntityEmitter(msp)
+
+    emitter.add_lines([((i, 0), (i, 10)) for i in range(50)], {"layer": "GRID"})
+    emitter.add_texts([(f"CH {i}", (i, -5)) for i in range(50)], {"height": 2.5, "rotation": 90})
+    emitter.add_polylines([[(0, 0), (5, 0), (5, 5)]], close=True)
+    emitter.add_line((0, 0), (1, 1))
+    emitter.add_text("TITLE", dxfattribs={"height": 8, "insert": (3, 4)})
+    assert len(emitter) == 103
+
+    assert emitter.flush() == 103
+    assert len(emitter) == 0
+
+    lines = msp.query("LINE")
+    texts = msp.query("TEXT")
+    assert len(lines) == 51
+    assert len(texts) == 51
+    assert sum(1 for e in lines if e.dxf.layer == "GRID") == 50
+    assert all(e.dxf.rotation == 90 for e in texts if e.dxf.text.startswith("CH"))
+    title = [e for e in texts if e.dxf.text == "TITLE"][0]
+    assert tuple(title.dxf.insert)[:2] == (3, 4)
+    assert msp.query("LWPOLYLINE")[0].closed
+    assert not doc.audit().has_errors
+
+
+def test_processor_emit_methods_accept_plain_modelspace():
+    """emit_* helpers work on a raw ezdxf modelspace as well as on an emitter"""
+    doc = ezdxf.new("R2010")
+    msp = doc.modelspace()
+    processor = BridgeProcessor()
+
+    processor.emit_lines(msp, [((0, 0), (1, 0)), ((0, 1), (1, 1))])
+    processor.emit_texts(msp, [("A", (0, 0))], {"height": 1})
+    assert len(msp) == 3
+
+
+def test_degenerate_geometry_is_rejected_before_insertion():
+    """Zero-length lines and collapsed polylines never reach the modelspace but are counted"""
+    doc = ezdxf.new("R2010")
+    msp = doc.modelspace()
+    emitter = EntityEmitter(msp, eps=1e-6)
+
+    emitter.add_line((1, 1), (1, 1))
+    emitter.add_lines([((0, 0), (0, 1e-9)), ((0, 0), (5, 0))])
+    emitter.add_lwpolyline([(2, 2)])
+    emitter.add_polylines([[(3, 3), (3, 3), (3, 3)], [(0, 0), (1, 0), (1, 1)]])
+
+    assert emitter.flush() == 2
+    assert emitter.rejected["lines_removed"] == 2
+    assert emitter.rejected["polylines_removed"] == 2
+    assert BridgeProcessor().remove_orphan_points_and_degenerate_entities(doc)["lines_removed"] == 0
+
+
+def modelspace_counts(doc):
+    counts = {}
+    for entity in doc.modelspace():
+        counts[entity.dxftype()] = counts.get(entity.dxftype(), 0) + 1
+    return counts
+
+
+def test_emit_time_rejection_matches_the_cleanup_pass(monkeypatch):
+    """On the sample design, rejecting degenerate geometry at emit time leaves the same entities and
+    reports the same stats as drawing everything and running remove_orphan_points_and_degenerate_entities"""
+    processor = BridgeProcessor()
+    processor.dedupe_geometry = False
+    processor.sheet_layouts = False
+    variables, _ = processor.prepare_variables(SAMPLE, "P")
+
+    def draw(extra):
+        doc = ezdxf.new("R2010", setup=True)
+        processor.setup_styles(doc)
+        emitter = processor.draw_geometry(variables, doc)
+        # Hand-made degenerate geometry, so the comparison does not depend on the sample having any
+        emitter.add_lines(extra["lines"])
+        emitter.add_polylines(extra["polylines"])
+        emitter.flush()
+        return doc, emitter
+
+    extra = {
+        "lines": [((1, 1), (1, 1)), ((0, 0), (0, 1e-9)), ((0, 0), (5, 0))],
+        "polylines": [[(2, 2)], [(3, 3), (3, 3), (3, 3)], [(0, 0), (1, 0), (1, 1)]],
+    }
+    emitted_doc, emitter = draw(extra)
+
+    # Baseline: nothing is rejected while drawing, the modelspace is cleaned up afterwards
+    monkeypatch.setattr(EntityEmitter, "_keep_line", lambda self, *coords: True)
+    monkeypatch.setattr(EntityEmitter, "_keep_polyline", lambda self, pts: True)
+    cleaned_doc, _ = draw(extra)
+    stats = processor.remove_orphan_points_and_degenerate_entities(cleaned_doc, eps=processor.cleanup_eps)
+
+    assert modelspace_counts(emitted_doc) == modelspace_counts(cleaned_doc)
+    assert {key: emitter.rejected[key] for key in stats} == stats
+    assert stats["lines_removed"] >= 2 and stats["polylines_removed"] >= 2
+
+
+def test_duplicate_and_overlapping_lines_are_collapsed():
+    """Exact duplicates are dropped and collinear overlaps merged, per attribute template"""
+    doc = ezdxf.new("R2010")
+    msp = doc.modelspace()
+    emitter = EntityEmitter(msp)
+
+    emitter.add_lines([((0, 0), (10, 0)), ((10, 0), (0, 0)), ((0, 0), (10, 0.00001))])
+    emitter.add_lines([((5, 0), (15, 0)), ((12, 0), (14, 0)), ((20, 0), (30, 0))])
+    emitter.add_lines([((0, 0), (10, 0))], {"layer": "GRID"})
+    emitter.add_polylines([[(0, 0), (1, 0), (1, 1)], [(1, 1), (1, 0), (0, 0)]])
+
+    assert emitter.flush() == 4
+    assert emitter.rejected["duplicates_removed"] == 3
+    assert emitter.rejected["segments_merged"] == 2
+    spans = sorted((e.dxf.start.x, e.dxf.end.x) for e in msp.query("LINE") if e.dxf.layer == "0")
+    assert spans == [(0, 15), (20, 30)]
+
+
+def test_terrain_profile_is_one_simplified_polyline():
+    """A dense survey becomes a single LWPOLYLINE within tolerance, with the raw profile on its own layer"""
+    processor = BridgeProcessor()
+    profile = [(x * 0.5, math.sin(x / 2000.0) * 50) for x in range(20000)]
+    simplified = processor.lod_simplify(profile, 0.5)
+    assert 2 < len(simplified) < 200
+    ys = np.interp(np.asarray(profile)[:, 0], simplified[:, 0], simplified[:, 1])
+    assert np.max(np.abs(ys - np.asarray(profile)[:, 1])) <= 0.5
+
+    doc = ezdxf.new("R2010")
+    processor.setup_styles(doc)
+    processor.lod_keep_full_terrain = True
+    terrain = [[x, 95 + math.sin(x / 7.0)] for x in range(0, 2000)]
+    emitter = EntityEmitter(doc.modelspace())
+    processor.draw_cross_section_plotting(emitter, {"terrain": terrain, "left": 0, "datum": 95}, 0, 100, 1)
+    emitter.flush()
+    polylines = doc.modelspace().query("LWPOLYLINE")
+    full = [e for e in polylines if e.dxf.layer == "TERRAIN_FULL"]
+    assert len(full) == 1 and len(full[0]) == 2000
+    assert any(e.dxf.layer == "0" and 2 < len(e) < 2000 for e in polylines)
+
+
+def test_extents_are_tracked_per_view_as_geometry_is_added():
+    """Overall and per-view bounds grow as geometry is added, before anything is flushed, and the index gets every box"""
+    emitter = EntityEmitter(index=GeometryIndex(cell_size=10))
+    assert emitter.extents() is None
+    emitter.set_view("elevation")
+    emitter.add_lines([((0, 0), (10, 5))])
+    emitter.set_view("plan")
+    emitter.add_lwpolyline([(20, -10), (30, -10), (30, -2)])
+    emitter.add_text("X", {"insert": (40, 0), "height": 2})
+    emitter.add_line((3, 3), (3, 3))  # rejected, must not affect extents
+
+    assert emitter.extents("elevation") == ((0, 0), (10, 5))
+    assert emitter.extents("plan") == ((20, -10), (41.2, 2))
+    assert emitter.extents() == ((0, -10), (41.2, 5))
+    assert emitter.extents("section") is None
+    assert len(emitter.index) == 3 and emitter.index.query((35, -1, 45, 1), "TEXT") == [2]
+
+
+def test_drawing_records_the_extents_of_each_view():
+    """The drawing pipeline attributes its geometry to views, each lying within the overall extents"""
+    emitter = BridgeProcessor().draw_geometry(BridgeProcessor().prepare_variables(SAMPLE, "P")[0])
+    (x0, y0), (x1, y1) = emitter.extents()
+    for view in ("grid", "elevation", "cross_section", "plan", "border"):
+        (vx0, vy0), (vx1, vy1) = emitter.extents(view)
+        assert x0 <= vx0 <= vx1 <= x1 and y0 <= vy0 <= vy1 <= y1
+    assert emitter.extents("plan") != emitter.extents("elevation")
+
+
+def test_svg_preview_has_one_quantized_path_per_visible_layer():
+    """render_svg joins a layer's lines and polylines into one path of integer coordinates"""
+    processor = BridgeProcessor()
+    emitter = EntityEmitter()
+    emitter.add_lines([((i * 0.37, 0), (i * 0.37, 10.123)) for i in range(500)])
+    emitter.add_polylines([[(0, 0), (50, 20), (100, 0)]], {"layer": "DECK"}, close=True)
+    emitter.add_lines([((0, 0), (1, 1))], {"layer": "GRID_FULL"})
+    emitter.add_text("A<B", {"insert": (5, 5), "height": 2})
+
+    svg = processor.render_svg(emitter)
+    assert svg.count("<path") == 2
+    assert 'class="layer-DECK"' in svg and "GRID_FULL" not in svg
+    assert "A&lt;B" in svg
+    path = svg.split('class="layer-0" d="')[1].split('"')[0]
+    assert path.count("M") == 500 and "." not in path
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the spatial index built over emitted drawing geometry
+"""
+
+import sys
+import math
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import ezdxf
+from bridge_processor import BridgeProcessor
+from entity_emitter import EntityEmitter
+from geometry_index import GeometryIndex, text_bbox
+
+
+def test_index_queries_match_brute_force():
+    """Overlap and nearness queries, also by kind and across the large-item list, agree with a linear scan"""
+    index = GeometryIndex(cell_size=10)
+    boxes = [(i * 7.0, (i % 5) * 3.0, i * 7.0 + 4, (i % 5) * 3.0 + 2) for i in range(200)]
+    for i, box in enumerate(boxes):
+        index.insert(box, "TEXT" if i % 2 else "LINE")
+    index.insert((-50, -50, 2000, -40), "LINE")  # spans many cells
+
+    probe = (100, 0, 160, 5)
+    expected = [
+        i
+        for i, b in enumerate(boxes + [(-50, -50, 2000, -40)])
+        if b[0] <= probe[2] and b[2] >= probe[0] and b[1] <= probe[3] and b[3] >= probe[1]
+    ]
+    assert index.query(probe) == expected
+    assert all(i % 2 for i in index.query(probe, "TEXT"))
+    assert index.query((500, -45, 501, -44)) == [200]
+
+    # What lies near a chainage and level: measured to the boxes, nearest first
+    x, y, radius = 352.0, 5.0, 6.0
+    distances = {
+        i: math.hypot(max(b[0] - x, 0, x - b[2]), max(b[1] - y, 0, y - b[3]))
+        for i, b in enumerate(boxes + [(-50, -50, 2000, -40)])
+    }
+    nearby = index.near(x, y, radius)
+    assert sorted(nearby) == sorted(i for i, d in distances.items() if d <= radius)
+    assert [distances[i] for i in nearby] == sorted(distances[i] for i in nearby)
+    assert nearby[0] == 50 and all(i % 2 for i in index.near(x, y, radius, "TEXT"))
+    assert index.near(500, -38, 1) == [] and index.near(500, -39, 1) == [200]
+
+
+def test_text_bbox_follows_alignment_and_rotation():
+    """Centered and rotated labels get boxes around their insert point"""
+    assert text_bbox("AB", 10, 0, height=1, halign=1, char_width=0.5) == (9.5, 0, 10.5, 1)
+    x0, y0, x1, y1 = text_bbox("ABCD", 0, 0, height=1, rotation=90, char_width=0.5)
+    assert round(x0, 9) == -1 and round(y1, 9) == 2
+
+
+def test_border_is_sized_from_indexed_extents():
+    """The border encloses the emitted geometry without scanning the modelspace"""
+    doc = ezdxf.new("R2010")
+    emitter = EntityEmitter(doc.modelspace(), index=GeometryIndex(cell_size=50))
+    emitter.add_line((0, 0), (400, 300))
+    processor = BridgeProcessor()
+    processor.draw_border_and_title(emitter, doc, {"project_name": "T"}, 1, 0, 0)
+    emitter.flush()
+
+    border = doc.modelspace().query("LWPOLYLINE")[0]
+    xs = [p[0] for p in border.get_points()]
+    ys = [p[1] for p in border.get_points()]
+    assert min(xs) < 0 and max(xs) > 400 and min(ys) < 0 and max(ys) > 300
+
+
+def test_long_drawing_is_tiled_onto_sheets():
+    """A corridor wider than one sheet gets overlapping viewports, a title block and key plan per sheet"""
+    doc = ezdxf.new("R2010")
+    emitter = EntityEmitter(doc.modelspace(), index=GeometryIndex(cell_size=500))
+    emitter.add_lines([((x, 0), (x + 100, 50)) for x in range(0, 3000, 100)])
+    emitter.add_line((2900, 2000), (3000, 2100))  # tall content only near the end
+    # A border around everything overlaps every strip, but must not decide where a window is centred
+    emitter.add_lwpolyline([(-10, -10), (3010, -10), (3010, 2110), (-10, 2110)], close=True)
+    processor = BridgeProcessor()
+
+    count = processor.create_sheet_layouts(doc, emitter, {"project_name": "CORRIDOR"}, 1)
+    view_w = processor.sheet_size[0] - 2 * processor.sheet_margin
+    assert count == 4 and view_w * (count - processor.sheet_overlap * (count - 1)) >= 3000
+
+    first = doc.layouts.get("Sheet 1")
+    last = doc.layouts.get(f"Sheet {count}")
+    viewports = [e for e in first.query("VIEWPORT") if e.dxf.id != 1]
+    assert len(viewports) == 2
+    assert viewports[0].dxf.view_center_point.y < 100
+    assert [e for e in last.query("VIEWPORT") if e.dxf.id != 1][0].dxf.view_center_point.y > 1000
+    assert any("Sheet 1 of 4" in e.dxf.text for e in first.query("TEXT"))
+
+    # The key plan outlines the viewport window, which is taller than the strip content it is centred on
+    outline = [e for e in first.query("LWPOLYLINE") if e.dxf.color == 1][0]
+    ys = [p[1] for p in outline.get_points()]
+    xs = [p[0] for p in outline.get_points()]
+    view_h = processor.sheet_size[1] - 3 * processor.sheet_margin - processor.sheet_title_height
+    assert abs((max(ys) - min(ys)) / (max(xs) - min(xs)) - view_h / view_w) < 1e-9
+    assert not doc.audit().has_errors
+
+
+if __name__ == "__main__":
+    test_index_queries_match_brute_force()
+    test_text_bbox_follows_alignment_and_rotation()
+    test_border_is_sized_from_indexed_extents()
+    test_long_drawing_is_tiled_onto_sheets()
+    print("All tests passed.")
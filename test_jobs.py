@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the background job queue used by the upload endpoint
+"""
+
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from concurrent.futures import ProcessPoolExecutor
+from jobs import JobQueue, QueueFull
+from artifact_store import ArtifactStore
+from bridge_processor import BridgeProcessor
+
+SAMPLE = str(Path(__file__).parent / "attached_assets" / "input.xlsx")
+
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while queue.get(job_id)["status"] in ("queued", "running") and time.time() < deadline:
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_jobs_report_results_errors_and_queue_depth():
+    """Jobs run on the bounded pool, failures are recorded, and waiting jobs count as queue depth"""
+    queue = JobQueue(max_workers=1)
+    gate = threading.Event()
+    done = []
+
+    blocker = queue.submit(gate.wait, info={"filename": "a.xlsx"})
+    ok = queue.submit(lambda x: x * 2, 21, on_done=lambda job: done.append((job["id"], job["status"])))
+    bad = queue.submit(lambda: 1 / 0)
+    time.sleep(0.05)
+    assert queue.get(blocker)["status"] == "running"
+    assert queue.stats()["queue_depth"] == 2
+
+    gate.set()
+    assert wait_for(queue, ok)["result"] == 42
+    assert wait_for(queue, bad)["status"] == "failed" and "division" in queue.get(bad)["error"]
+    assert done == [(ok, "done")]  # pollers never see a finished job as running
+    assert queue.get(blocker)["info"]["filename"] == "a.xlsx"
+    assert queue.timings(queue.get(ok))["queued"] > 0
+    stats = queue.stats()
+    assert stats["done"] == 2 and stats["failed"] == 1 and stats["queue_depth"] == 0
+
+
+def test_jobs_dispatch_to_executor_and_refuse_when_full():
+    """With an executor, jobs run in worker processes; beyond max_queued waiting jobs, submit is refused"""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        queue = JobQueue(max_workers=1, executor=pool, max_queued=1)
+        job_id = queue.submit(pow, 2, 10)
+        assert wait_for(queue, job_id)["result"] == 1024
+
+    queue = JobQueue(max_workers=1, max_queued=1)
+    gate = threading.Event()
+    queue.submit(gate.wait)
+    time.sleep(0.05)
+    waiting = queue.submit(lambda: "ok")
+    try:
+        queue.submit(lambda: "too many")
+        assert False, "expected QueueFull"
+    except QueueFull:
+        pass
+    gate.set()
+    assert wait_for(queue, waiting)["result"] == "ok"
+    assert queue.stats()["max_queued"] == 1
+
+
+def test_pipeline_stages_are_reported_in_order():
+    """The processor reports every stage once per run, and the job queue keeps what is recorded"""
+    with tempfile.TemporaryDirectory() as root:
+        processor = BridgeProcessor()
+        processor.artifact_store = ArtifactStore(root)
+        reported = []
+        processor.progress = lambda stage, info: reported.append(info)
+
+        processor.process_excel_file(SAMPLE, project_name="P", preview_only=True)
+        assert [info["stage"] for info in reported] == list(BridgeProcessor.STAGES)
+        assert reported[-1]["index"] == reported[-1]["total"] == len(BridgeProcessor.STAGES)
+        assert all(a["elapsed"] <= b["elapsed"] for a, b in zip(reported, reported[1:]))
+        assert reported[2]["entities"] > 0 and reported[-1]["entities"] >= reported[2]["entities"]
+
+        del reported[:]
+        processor.process_excel_file(SAMPLE, project_name="P")
+        assert [info["stage"] for info in reported] == list(BridgeProcessor.STAGES)
+
+    queue = JobQueue(max_workers=1)
+    job_id = queue.submit(lambda job_id: queue.record_stage(job_id, {"stage": "parsed"}), pass_job_id=True)
+    assert wait_for(queue, job_id)["stages"] == [{"stage": "parsed"}]
+
+
+if __name__ == "__main__":
+    test_jobs_report_results_errors_and_queue_depth()
+    test_jobs_dispatch_to_executor_and_refuse_when_full()
+    test_pipeline_stages_are_reported_in_order()
+    print("All tests passed.")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the level-of-detail policy thinning grid and survey annotations
+"""
+
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bridge_processor import BridgeProcessor
+from entity_emitter import EntityEmitter
+from geometry_index import GeometryIndex
+
+# A chainage increment of 1 cm over a kilometre would be 100000 grid lines without the policy
+DENSE_GRID = {"left": 0, "right": 1000, "datum": 95, "toprl": 100, "xincr": 0.01, "yincr": 0.001, "noch": 100000}
+
+
+def draw_grid(processor):
+    emitter = EntityEmitter(index=GeometryIndex(cell_size=10))
+    processor.draw_advanced_layout_grid(emitter, None, DENSE_GRID, 1)
+    return emitter
+
+
+def layer_of(emitter, template_id):
+    return emitter.templates[template_id].get("layer", "0")
+
+
+def test_strides_keep_items_legible_and_capped():
+    """The stride grows with too-close spacing or label extent, and never allows more than the cap"""
+    processor = BridgeProcessor()
+    assert processor.lod_stride(50, 5.0, 1) == 1
+    assert processor.lod_stride(1000, 0.01, 1) == 200
+    assert processor.lod_stride(50, 5.0, 1, extent=9.5) == 3
+    assert processor.lod_stride(100000, 5.0, 1) == 100000 // processor.lod_max_grid_lines
+    assert processor.lod_thin_positions([0, 0.5, 1, 2.5, 3, 5], 2) == [True, False, False, True, False, True]
+
+
+def test_dense_grid_is_thinned_to_legible_lines_and_labels():
+    """A tiny XINCR gives capped, legibly spaced grid lines and chainage labels that do not overlap"""
+    processor = BridgeProcessor()
+    emitter = draw_grid(processor)
+
+    vertical = sorted({x1 for x1, y1, x2, y2, _ in emitter.lines if x1 == x2})
+    assert 1 < len(vertical) <= processor.lod_max_grid_lines
+    assert min(b - a for a, b in zip(vertical, vertical[1:])) >= processor.lod_min_line_spacing
+    chainages = sorted(x for text, x, y, _ in emitter.texts if text.startswith("CH "))
+    extent = processor.lod_label_extent("CH 1000.0m", 3)
+    assert min(b - a for a, b in zip(chainages, chainages[1:])) >= extent + processor.lod_min_label_gap
+    assert all(layer_of(emitter, t) != processor.lod_full_resolution_layer for *_, t in emitter.lines)
+
+
+def test_thinned_items_can_be_kept_on_a_capped_full_resolution_layer():
+    """With lod_keep_full_resolution, dropped items go to GRID_FULL up to lod_max_full_resolution"""
+    processor = BridgeProcessor()
+    main = draw_grid(processor)
+    processor.lod_keep_full_resolution = True
+    processor.lod_max_full_resolution = 50
+    full = draw_grid(processor)
+
+    detail = [t for *_, t in full.lines + full.texts if layer_of(full, t) == processor.lod_full_resolution_layer]
+    assert 0 < len(detail) <= 3 * processor.lod_max_full_resolution
+    kept = [t for *_, t in full.lines if layer_of(full, t) != processor.lod_full_resolution_layer]
+    assert len(kept) == len(main.lines)
+
+
+if __name__ == "__main__":
+    test_strides_keep_items_legible_and_capped()
+    test_dense_grid_is_thinned_to_legible_lines_and_labels()
+    test_thinned_items_can_be_kept_on_a_capped_full_resolution_layer()
+    print("All tests passed.")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for the preview-only processing path
+"""
+
+import os
+import sys
+import zlib
+import tempfile
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bridge_processor import BridgeProcessor
+from artifact_store import ArtifactStore
+from entity_emitter import EntityEmitter
+from preview_tiles import PreviewTiles
+from thumbnails import encode_png, rasterize_segments
+
+SAMPLE = str(Path(__file__).parent / "attached_assets" / "input.xlsx")
+
+
+def test_preview_only_writes_nothing_and_matches_full_preview():
+    """preview_only returns the same SVG as the full run without creating a DXF"""
+    with tempfile.TemporaryDirectory() as root:
+        processor = BridgeProcessor()
+        processor.artifact_store = ArtifactStore(root)
+
+        preview = processor.process_excel_file(SAMPLE, project_name="P", preview_only=True)
+        assert preview["success"] and preview["dxf_filename"] is None
+        assert os.listdir(root) == []
+        assert "<path" in preview["svg_content"]
+
+        # The full run renders its preview from the geometry it inserts into the DXF, drawing once
+        draws = []
+        draw_geometry = processor.draw_geometry
+        processor.draw_geometry = lambda *args: draws.append(args) or draw_geometry(*args)
+        full = processor.process_excel_file(SAMPLE, project_name="P")
+        assert full["svg_content"] == preview["svg_content"] and len(draws) == 1
+        assert full["dxf_filename"] == processor.artifact_store.filename_for(preview["design_key"])
+
+        # A stored DXF is reused and only drawn again, in memory, for its preview
+        again = processor.process_excel_file(SAMPLE, project_name="P")
+        assert again["svg_content"] == preview["svg_content"] and len(draws) == 2 and draws[1][1:] == ()
+
+
+def test_preview_only_json_geometry():
+    """The JSON preview groups geometry by layer and carries the extents"""
+    result = BridgeProcessor().process_excel_file(SAMPLE, preview_only=True, preview_format="json")
+    geometry = result["geometry"]
+    assert result["svg_content"] is None
+    assert geometry["extents"] is not None
+    assert geometry["layers"]["0"]["lines"] and geometry["layers"]["0"]["texts"]
+
+
+def test_svg_text_follows_horizontal_and_vertical_alignment():
+    """halign maps to text-anchor and valign to dominant-baseline"""
+    emitter = EntityEmitter()
+    emitter.add_line((0, 0), (100, 100))
+    emitter.add_text("BASE", {"insert": (10, 10)})
+    emitter.add_text("TOP", {"insert": (20, 20), "halign": 2, "valign": 3})
+    emitter.add_text("MID", {"insert": (30, 30), "halign": 4})
+    svg = BridgeProcessor().render_svg(emitter)
+    assert 'text-anchor="start">BASE' in svg
+    assert 'text-anchor="end" dominant-baseline="text-before-edge">TOP' in svg
+    assert 'text-anchor="middle" dominant-baseline="central">MID' in svg
+
+
+def test_tiles_are_clipped_and_level_of_detail_reduced():
+    """Deep tiles only carry the geometry they overlap, clipped to the tile, and tiny items vanish when zoomed out"""
+    emitter = EntityEmitter()
+    emitter.add_lines([((0, 0), (10000, 0)), ((0, 10000), (10000, 0))])
+    emitter.add_lines([((x, 5000), (x + 0.5, 5000)) for x in range(0, 10000, 10)])  # sub-pixel at low zoom
+    emitter.add_text("LABEL", {"insert": (100, 9900), "height": 20})
+    tiles = PreviewTiles(BridgeProcessor().render_geometry_json(emitter), tile_size=256)
+
+    top = tiles.render(0, 0, 0)
+    assert top.count("M") == 2 and "LABEL" not in top
+
+    deep = tiles.render(8, 0, 255)  # bottom-left corner
+    coords = [int(v) for v in deep.split(' d="')[1].split('"')[0].replace("M", " ").replace("L", " ").split()]
+    assert all(0 <= v <= 256 for v in coords)
+    assert "LABEL" in tiles.render(5, 0, 0)
+    assert tiles.render(9, 0, 0) is None and tiles.render(1, 2, 0) is None
+
+
+def test_thumbnail_png_round_trips_and_is_cached_next_to_the_artifact():
+    """Segments are rasterized into a valid PNG stored under the design's artifact name"""
+    image = rasterize_segments([(0, 0, 100, 50), (0, 50, 100, 0)], ((0, 0), (100, 50)), size=64)
+    assert image.shape == (36, 64) and (image < 255).sum() > 100
+    png = encode_png(image)
+    assert png.startswith(b"\x89PNG")
+    idat = png[png.index(b"IDAT") + 4 : png.index(b"IEND") - 8]
+    rows = zlib.decompress(idat)
+    assert rows == b"".join(b"\x00" + row.tobytes() for row in image)
+
+    with tempfile.TemporaryDirectory() as root:
+        processor = BridgeProcessor()
+        processor.artifact_store = ArtifactStore(root)
+        preview = processor.process_excel_file(SAMPLE, project_name="P", preview_only=True, thumbnail_size=64)
+        path = processor.artifact_store.path_for(preview["design_key"], ".png")
+        assert preview["thumbnail_filename"] == os.path.basename(path)
+        assert open(path, "rb").read().startswith(b"\x89PNG")
+
+        # The thumbnail is drawn from the job's own geometry and not rendered again once stored
+        mtime = os.path.getmtime(path)
+        again = processor.process_excel_file(SAMPLE, project_name="P", thumbnail_size=64)
+        assert again["thumbnail_filename"] == preview["thumbnail_filename"]
+        assert os.path.getmtime(path) == mtime
+
+
+if __name__ == "__main__":
+    test_preview_only_writes_nothing_and_matches_full_preview()
+    test_preview_only_json_geometry()
+    test_svg_text_follows_horizontal_and_vertical_alignment()
+    test_tiles_are_clipped_and_level_of_detail_reduced()
+    test_thumbnail_png_round_trips_and_is_cached_next_to_the_artifact()
+    print("All tests passed.")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for smart_recenter_title on element lists and array-backed collections
+"""
+
+import sys
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+from smart_title import pack_elements, smart_recenter_title
+
+
+def make_elements():
+    return [
+        {"type": "RECTANGLE", "x": 0, "y": 0, "width": 100, "height": 10, "tag": "deck"},
+        {"type": "LWPOLYLINE", "points": [(0, 0), (5, 5), (10, 0)], "tag": "outline"},
+        {"type": "TEXT", "x": 10, "y": 20, "text": "T", "tag": "title_block"},
+    ]
+
+
+def test_list_elements_including_polylines_are_shifted():
+    """Every element and every polyline vertex moves by the title's offset"""
+    elements = make_elements()
+    assert smart_recenter_title(elements) == (40, 30)
+    assert (elements[0]["x"], elements[0]["y"]) == (40, 30)
+    assert elements[1]["points"] == [(40, 30), (45, 35), (50, 30)]
+    assert (elements[2]["x"], elements[2]["y"]) == (50, 50)
+
+
+def test_array_backed_collection_is_shifted_in_one_operation():
+    """Packed collections give the same result as the list version, for large drawings too"""
+    packed = pack_elements(make_elements())
+    smart_recenter_title(packed)
+    assert packed["xy"].tolist() == [[40, 30], [40, 30], [45, 35], [50, 30], [50, 50]]
+
+    big = {
+        "xy": np.random.default_rng(0).random((100000, 2)),
+        "start": np.arange(100000),
+        "tag": np.array(["line"] * 99999 + ["title_block"], dtype=object),
+    }
+    smart_recenter_title(big, target_origin=(0, 0))
+    assert np.allclose(big["xy"][-1], (0, 0))
+    assert smart_recenter_title({"xy": np.zeros((0, 2)), "start": np.zeros(0), "tag": np.zeros(0)}) is None
+
+
+def test_vertex_types_are_kept_and_empty_elements_are_safe():
+    """Shifted vertices keep their container and point types; empty and coordinate-less titles do not raise"""
+    elements = [
+        {"points": [[0, 0, 7], [1, 1, 7]], "tag": "lists"},
+        {"vertices": ((2, 2), (3, 3)), "tag": "tuples"},
+        {"points": np.array([[4.0, 4.0]]), "tag": "array"},
+        {"points": [], "tag": "empty"},
+        {"x": 10, "y": 20, "tag": "title_block"},
+    ]
+    assert smart_recenter_title(elements) == (40, 30)
+    assert elements[0]["points"] == [[40, 30, 7], [41, 31, 7]]
+    assert elements[1]["vertices"] == ((42, 32), (43, 33))
+    assert elements[2]["points"].tolist() == [[44, 34]] and elements[3]["points"] == []
+
+    assert smart_recenter_title([{"points": [], "x": 0, "y": 0, "tag": "title_block"}]) == (50, 50)
+    assert smart_recenter_title([{"points": [], "tag": "title_block"}, {"x": 1, "y": 1}]) is None
+
+    # A packed title without coordinates must not borrow the next element's first vertex
+    packed = pack_elements([{"tag": "title_block"}, {"x": 1, "y": 1, "tag": "deck"}])
+    assert smart_recenter_title(packed) is None and packed["xy"].tolist() == [[1, 1]]
+    assert smart_recenter_title(pack_elements([{"x": 1, "y": 1}, {"points": [], "tag": "title_block"}])) is None
+
+
+if __name__ == "__main__":
+    test_list_elements_including_polylines_are_shifted()
+    test_array_backed_collection_is_shifted_in_one_operation()
+    test_vertex_types_are_kept_and_empty_elements_are_safe()
+    print("All tests passed.")
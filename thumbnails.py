@@ -0,0 +1,56 @@
+import zlib
+import struct
+import numpy as np
+
+
+def rasterize_segments(segments, extents, size=256, padding=4):
+    """Draw (x1, y1, x2, y2) segments into a white grayscale image of at most `size` pixels per side"""
+    (min_x, min_y), (max_x, max_y) = extents
+    span_x = max(max_x - min_x, 1e-9)
+    span_y = max(max_y - min_y, 1e-9)
+    scale = (size - 2 * padding) / max(span_x, span_y)
+    width = max(1, int(round(span_x * scale)) + 2 * padding)
+    height = max(1, int(round(span_y * scale)) + 2 * padding)
+    image = np.full((height, width), 255, dtype=np.uint8)
+
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    if not len(segments):
+        return image
+    px = (segments[:, [0, 2]] - min_x) * scale + padding
+    py = (max_y - segments[:, [1, 3]]) * scale + padding
+
+    # Sample every segment once per pixel step, all segments in one vectorized pass
+    steps = np.maximum(np.abs(px[:, 1] - px[:, 0]), np.abs(py[:, 1] - py[:, 0])).astype(np.int64) + 1
+    owner = np.repeat(np.arange(len(segments)), steps)
+    t = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(
+        np.maximum(steps - 1, 1), steps
+    )
+    xs = np.rint(px[owner, 0] + (px[owner, 1] - px[owner, 0]) * t).astype(np.int64)
+    ys = np.rint(py[owner, 0] + (py[owner, 1] - py[owner, 0]) * t).astype(np.int64)
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    image[ys[inside], xs[inside]] = 40
+    return image
+
+
+def encode_png(image):
+    """Encode a 2D uint8 grayscale array as PNG bytes"""
+    height, width = image.shape
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    # Filter type 0 (None) in front of every scanline
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), image]).tobytes()
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 9))
+        + chunk(b"IEND", b"")
+    )
+
+
+def thumbnail_png(segments, extents, size=256):
+    """PNG bytes of `segments` rasterized at most `size` pixels per side, or None for an empty drawing"""
+    if extents is None:
+        return None
+    return encode_png(rasterize_segments(segments, extents, size))
@@ -0,0 +1,122 @@
+import json
+import time
+from bridge_processor import BridgeProcessor
+
+# One processor per worker process, built by warm_worker()
+processor = None
+# Queue shared with the parent process that stage progress is put on as (job_id, info)
+progress_channel = None
+
+
+def warm_worker(channel=None):
+    """Process pool initializer: build the worker's processor once, its imports (ezdxf) come with it"""
+    global processor, progress_channel
+    progress_channel = channel
+    processor = BridgeProcessor()
+
+
+def get_processor():
+    """The worker's processor, also built on first use outside a pool"""
+    if processor is None:
+        warm_worker(progress_channel)
+    return processor
+
+
+def stage_reporter(job_id):
+    """Progress callback forwarding the stages of `job_id` to the parent, or None without a channel"""
+    if progress_channel is None or job_id is None:
+        return None
+
+    def report(stage, info):
+        progress_channel.put((job_id, info))
+
+    return report
+
+
+def process_file(filepath, project_name=None, job_id=None, **options):
+    """Run `process_excel_file` in the worker, reporting its stages under `job_id`.
+
+    The stage reports are also returned as the result's `stages`, since the
+    live ones can arrive after the job has finished.
+    """
+    return report_stages(
+        job_id,
+        lambda worker_processor: worker_processor.process_excel_file(filepath, project_name=project_name, **options),
+    )
+
+
+def report_stages(job_id, run):
+    """Call `run(processor)` with the stages it reports forwarded under `job_id` and returned as its `stages`"""
+    worker_processor = get_processor()
+    forward = stage_reporter(job_id)
+    stages = []
+
+    def report(stage, info):
+        stages.append(info)
+        if forward is not None:
+            forward(stage, info)
+
+    worker_processor.progress = report
+    try:
+        results = run(worker_processor)
+    finally:
+        worker_processor.progress = None
+    results["stages"] = stages
+    return results
+
+
+def generate_file(filepath, project_name=None):
+    """Generate (or reuse) the DXF of a workbook in the worker and return its filename"""
+    worker_processor = get_processor()
+    variables, _ = worker_processor.prepare_variables(filepath, project_name)
+    dxf_filename, _ = worker_processor.generate_dxf(variables)
+    return dxf_filename
+
+
+def generate_parameters(parameters, project_name=None, terrain=None):
+    """Generate (or reuse) the DXF of a JSON parameter set in the worker and return its filename"""
+    worker_processor = get_processor()
+    variables, _ = worker_processor.prepare_parameters(parameters, project_name, terrain)
+    dxf_filename, _ = worker_processor.generate_dxf(variables)
+    return dxf_filename
+
+
+def process_parameters(
+    parameters, project_name=None, terrain=None, preview_format="svg", thumbnail_size=None, validation=None, job_id=None
+):
+    """Run `process_parameters` (JSON parameter sets) in the worker, reporting its stages under `job_id`"""
+    return report_stages(
+        job_id,
+        lambda worker_processor: worker_processor.process_parameters(
+            parameters, project_name, terrain, preview_format, thumbnail_size, validation
+        ),
+    )
+
+
+def process_batch_item(filepath, project_name=None, thumbnail_size=None):
+    """Generate the DXF (and thumbnail) of one workbook or JSON parameter file of a batch.
+
+    Never raises: returns the DXF filename and design key, or the error, with the seconds spent.
+    """
+    started = time.perf_counter()
+    item = {"dxf_filename": None, "design_key": None, "error": None}
+    try:
+        worker_processor = get_processor()
+        if filepath.lower().endswith(".json"):
+            with open(filepath, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            if not isinstance(data, dict) or "parameters" not in data:
+                raise ValueError("JSON file must be an object with a 'parameters' object")
+            variables, _ = worker_processor.prepare_parameters(
+                data["parameters"], data.get("project_name") or project_name, data.get("terrain")
+            )
+        else:
+            variables, _ = worker_processor.prepare_variables(filepath, project_name)
+        item["dxf_filename"], _, _ = worker_processor.draw_design(
+            variables, preview_format=None, thumbnail_size=thumbnail_size
+        )
+        item["design_key"] = worker_processor.design_key(variables)
+    except Exception as e:
+        item["error"] = str(e)
+    item["seconds"] = round(time.perf_counter() - started, 3)
+    return item